@@ -0,0 +1,256 @@
+"""Local stand-ins for BRouter, Nominatim and Overpass, to load-test the planning pipeline without the real services
+
+Run from the root of the project:
+    python -m benchmarks.fake_services --latency 0.05 --error-rate 0.02
+
+then point the program at them:
+    BROUTER_URL=http://127.0.0.1:17777/brouter
+    NOMINATIM_URL=http://127.0.0.1:17778/search
+    OVERPASS_URL=http://127.0.0.1:17779/api/interpreter
+
+Every service replays the responses recorded in --recordings if there are some (brouter.json, nominatim.json, overpass.json),
+otherwise it builds a deterministic synthetic response from the request: a winding track between the requested points,
+a position in Friuli-Venezia Giulia for every place name, restaurants inside the boxes and corridors of the Overpass query.
+"""
+import argparse, hashlib, json, os, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote_plus, urlparse
+
+import numpy as np
+
+
+BROUTER_PORT = 17777
+NOMINATIM_PORT = 17778
+OVERPASS_PORT = 17779
+POINT_SPACING = 20.0 # meters between two points of a synthetic BRouter track, as in the real output
+POIS_PER_AREA = 8 # synthetic nodes per box or corridor vertex of an Overpass query
+
+_BOX = re.compile(r'node\["([^"]+)"="([^"]+)"\](?:\[[^\]]*\])*\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)')
+_AROUND = re.compile(r'node\["([^"]+)"="([^"]+)"\](?:\[[^\]]*\])*\(around:(\d+),([-\d.,]+)\)')
+
+
+class FaultPolicy:
+    """Latency and errors added to every response of a fake service
+    Args:
+        latency (float): seconds waited before answering
+        jitter (float): extra seconds drawn uniformly between 0 and jitter
+        error_rate (float): probability of answering with error_status instead of the response
+        error_status (int): status of the injected errors, 503 is retried by the Transport, 500 is not
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.__random = random.Random(0)
+        self.__lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self.__lock:
+            return self.latency + self.__random.uniform(0.0, self.jitter)
+
+    def fails(self) -> bool:
+        with self.__lock:
+            return self.__random.random() < self.error_rate
+
+
+def _seed(*parts) -> int:
+    """Stable seed of a request, the same request always gets the same synthetic response"""
+    return int.from_bytes(hashlib.sha256(repr(parts).encode()).digest()[:8], "little")
+
+
+def synthetic_track(start: tuple[float, float], end: tuple[float, float], alternative: int, profile: str = "") -> list[list[float]]:
+    """A winding track of [lon, lat, elv] points between two [lon, lat] points, every alternative and profile bends on another side"""
+    meters = np.hypot((end[0] - start[0]) * 111320.0 * np.cos(np.radians((start[1] + end[1]) / 2)), (end[1] - start[1]) * 111132.0)
+    number_of_points = max(2, int(meters / POINT_SPACING))
+    t = np.linspace(0.0, 1.0, number_of_points)
+
+    rng = np.random.default_rng(_seed(start, end, alternative, profile))
+    bend = (alternative - 1.5) * 0.1 + rng.normal(0.0, 0.02)
+    lon = start[0] + (end[0] - start[0]) * t - bend * (end[1] - start[1]) * np.sin(np.pi * t)
+    lat = start[1] + (end[1] - start[1]) * t + bend * (end[0] - start[0]) * np.sin(np.pi * t)
+    elv = np.round(150.0 + 400.0 * np.sin(rng.uniform(2, 12) * t) ** 2 + 30.0 * np.sin(rng.uniform(50, 150) * t), 1)
+    return np.stack([lon, lat, elv], axis=1).round(6).tolist()
+
+
+def synthetic_geocoding(name: str) -> list[dict]:
+    """A Nominatim answer placing name somewhere in Friuli-Venezia Giulia"""
+    rng = random.Random(_seed(name))
+    return [{
+        "place_id": rng.randrange(10**8),
+        "display_name": f"{name}, Friuli-Venezia Giulia, Italia",
+        "lat": f"{rng.uniform(45.7, 46.5):.7f}",
+        "lon": f"{rng.uniform(12.4, 13.8):.7f}",
+    }]
+
+
+def synthetic_overpass(query: str) -> dict:
+    """An Overpass answer with a few nodes of the requested category in every box and around every corridor vertex"""
+    elements = []
+
+    def add(key: str, value: str, lat: float, lon: float) -> None:
+        node_id = _seed(key, value, round(lat, 5), round(lon, 5)) % 10**10
+        elements.append({
+            "type": "node", "id": node_id, "lat": round(lat, 7), "lon": round(lon, 7),
+            "tags": {key: value, "name": f"{value.capitalize()} {node_id % 1000}", "addr:city": f"Borgo {node_id % 97}"},
+        })
+
+    for key, value, south, west, north, east in _BOX.findall(query):
+        south, west, north, east = float(south), float(west), float(north), float(east)
+        rng = random.Random(_seed(key, value, south, west))
+        for _ in range(POIS_PER_AREA):
+            add(key, value, rng.uniform(south, north), rng.uniform(west, east))
+
+    for key, value, radius, vertices in _AROUND.findall(query):
+        coordinates = [float(c) for c in vertices.split(",")]
+        margin = float(radius) / 111132.0
+        for lat, lon in zip(coordinates[0::2], coordinates[1::2]):
+            rng = random.Random(_seed(key, value, lat, lon))
+            for _ in range(POIS_PER_AREA):
+                add(key, value, lat + rng.uniform(-margin, margin) * 0.7, lon + rng.uniform(-margin, margin) * 0.7)
+
+    return {"version": 0.6, "generator": "benchmarks.fake_services", "elements": elements}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    faults: FaultPolicy
+    recording: bytes | None
+    respond: staticmethod
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.__answer(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        self.__answer({"data": [unquote_plus(body[5:]) if body.startswith("data=") else body]})
+
+    def __answer(self, parameters: dict) -> None:
+        time.sleep(self.faults.delay())
+        if self.faults.fails():
+            return self.__send(self.faults.error_status, b"")
+        try:
+            body = self.recording if self.recording is not None else json.dumps(self.respond(parameters), separators=(",", ":")).encode()
+        except (KeyError, IndexError, ValueError):
+            return self.__send(400, b"")
+        self.__send(200, body)
+
+    def __send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _brouter(parameters: dict) -> dict:
+    start, end = [tuple(map(float, point.split(","))) for point in parameters["lonlats"][0].split("|")[:2]]
+    alternative = int(parameters.get("alternativeidx", ["0"])[0])
+    return {"type": "FeatureCollection", "features": [{
+        "type": "Feature",
+        "properties": {"creator": "benchmarks.fake_services", "name": f"brouter_{parameters['profile'][0]}_{alternative}"},
+        "geometry": {"type": "LineString", "coordinates": synthetic_track(start, end, alternative, parameters['profile'][0])},
+    }]}
+
+
+def _nominatim(parameters: dict) -> list[dict]:
+    return synthetic_geocoding(parameters["q"][0])
+
+
+def _overpass(parameters: dict) -> dict:
+    return synthetic_overpass(parameters["data"][0])
+
+
+class FakeServices:
+    """The three fake services, each one on its own port so that the Transport treats them as separate hosts
+    Args:
+        host (str): address the servers listen on
+        faults (FaultPolicy | None): latency and errors of every service, none by default
+        recordings (str | None): directory with recorded responses replayed as they are (brouter.json, nominatim.json, overpass.json)
+        ports (tuple[int, int, int]): ports of BRouter, Nominatim and Overpass, 0 picks free ones
+
+    Examples:
+        ```python
+        with FakeServices(faults=FaultPolicy(latency=0.05, error_rate=0.01)) as services:
+            os.environ.update(services.environment())
+            ...
+        ```
+    """
+    def __init__(self, host: str = "127.0.0.1", faults: FaultPolicy | None = None, recordings: str | None = None, ports: tuple[int, int, int] = (BROUTER_PORT, NOMINATIM_PORT, OVERPASS_PORT)) -> None:
+        faults = faults or FaultPolicy()
+        self.__servers = {}
+        for name, port, respond in zip(("brouter", "nominatim", "overpass"), ports, (_brouter, _nominatim, _overpass)):
+            recording = None
+            if recordings is not None and os.path.exists(os.path.join(recordings, f"{name}.json")):
+                with open(os.path.join(recordings, f"{name}.json"), "rb") as file:
+                    recording = file.read()
+            handler = type(f"{name.capitalize()}Handler", (_Handler,), {"faults": faults, "recording": recording, "respond": staticmethod(respond)})
+            self.__servers[name] = ThreadingHTTPServer((host, port), handler)
+            self.__servers[name].daemon_threads = True
+        self.__threads = []
+
+    def urls(self) -> dict[str, str]:
+        """Get the URL of every service"""
+        host, port = self.__servers["brouter"].server_address[:2]
+        urls = {"brouter": f"http://{host}:{port}/brouter"}
+        host, port = self.__servers["nominatim"].server_address[:2]
+        urls["nominatim"] = f"http://{host}:{port}/search"
+        host, port = self.__servers["overpass"].server_address[:2]
+        urls["overpass"] = f"http://{host}:{port}/api/interpreter"
+        return urls
+
+    def environment(self) -> dict[str, str]:
+        """Get the environment variables pointing the program at the fake services, to be set before importing datastructures"""
+        urls = self.urls()
+        return {"BROUTER_URL": urls["brouter"], "NOMINATIM_URL": urls["nominatim"], "OVERPASS_URL": urls["overpass"]}
+
+    def start(self) -> "FakeServices":
+        for server in self.__servers.values():
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        for server in self.__servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self) -> "FakeServices":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds waited before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds, between 0 and jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of the requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503, help="status of the injected errors")
+    parser.add_argument("--recordings", help="directory with recorded responses to replay")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for BRouter, Nominatim and Overpass")
+    parser.add_argument("--host", default="127.0.0.1")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    faults = FaultPolicy(args.latency, args.jitter, args.error_rate, args.error_status)
+    with FakeServices(args.host, faults, args.recordings) as services:
+        for name, value in services.environment().items():
+            print(f"{name}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time and peak memory of parsing a BRouter GeoJSON response, whole with json.loads and streamed with Route.from_geojson
+
+Run from the root of the project:
+    python -m benchmarks.geojson_parsing
+"""
+import json, time, tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_route
+from datastructures.Route import Route
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def brouter_body(number_of_points: int) -> bytes:
+    """A GeoJSON body shaped as the BRouter one, with the per-point messages BRouter adds to the properties"""
+    coordinates = np.round(synthetic_route(number_of_points), 6).tolist()
+    messages = [["Longitude", "Latitude", "Elevation", "Distance", "CostPerKm", "WayTags"]]
+    messages += [[str(int(lon * 1e6)), str(int(lat * 1e6)), str(int(elv)), "100", "1000", "highway=secondary surface=asphalt"] for lon, lat, elv in coordinates[::10]]
+    feature = {
+        "type": "Feature",
+        "properties": {"creator": "BRouter-1.7.7", "name": "brouter_trekking_0", "track-length": "480000", "messages": messages},
+        "geometry": {"type": "LineString", "coordinates": coordinates},
+    }
+    return json.dumps({"type": "FeatureCollection", "features": [feature]}).encode()
+
+
+def measure(parse, body: bytes) -> tuple[float, int, Route]:
+    """Seconds and peak bytes allocated while parsing the body, the body itself is not counted
+    The time is measured on a separate run, tracemalloc slows down the allocation of the Python objects
+    """
+    start = time.perf_counter()
+    route = parse(body)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, route
+
+
+def whole(body: bytes) -> Route:
+    return Route(json.loads(body)["features"][0]["geometry"]["coordinates"])
+
+
+def streamed(body: bytes) -> Route:
+    return Route.from_geojson(body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+
+
+def main() -> None:
+    for number_of_points in (10_000, 100_000, 400_000):
+        body = brouter_body(number_of_points)
+        whole_time, whole_peak, whole_route = measure(whole, body)
+        streamed_time, streamed_peak, streamed_route = measure(streamed, body)
+        assert whole_route == streamed_route
+
+        print(f"{number_of_points} points, {len(body) / 2**20:.1f} MiB body")
+        print(f"  json.loads + Route:  {whole_time * 1000:8.1f} ms, peak {whole_peak / 2**20:8.1f} MiB")
+        print(f"  Route.from_geojson:  {streamed_time * 1000:8.1f} ms, peak {streamed_peak / 2**20:8.1f} MiB ({whole_time / streamed_time:.1f}x faster, {whole_peak / streamed_peak:.1f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Time and peak memory of the route computations, on synthetic routes from 1e3 to 1e7 points
+
+Run from the root of the project:
+    python -m benchmarks.hot_paths --output results.json
+    python -m benchmarks.hot_paths --sizes 1000 100000 --baseline results.json
+
+The results are written as JSON, with --baseline the run is compared with a previous one and exits with status 1
+if a case got slower or used more memory than the tolerance allows.
+"""
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_route
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+MAX_JSON_POINTS = 1_000_000 # the JSON dump of larger routes takes several GiB of Python objects
+
+
+def _offline_store_path(pois_per_degree: int = 2000) -> str:
+    """Fill an offline store with synthetic restaurants around the synthetic routes, so the recommendations are found without network"""
+    from datastructures.OfflinePoiStore import OfflinePoiStore
+
+    path = os.path.join(tempfile.mkdtemp(prefix="benchmark-pois-"), "pois.sqlite")
+    rng = np.random.default_rng(0)
+    number_of_pois = int(pois_per_degree * 2.0 * 4.5)
+    lon = rng.uniform(12.8, 14.8, number_of_pois)
+    lat = rng.uniform(41.7, 46.2, number_of_pois)
+    OfflinePoiStore(path).ingest(
+        {"type": "node", "id": i, "lat": float(lat[i]), "lon": float(lon[i]), "tags": {"amenity": "restaurant", "name": f"Trattoria {i}", "addr:city": "Synthetic"}}
+        for i in range(number_of_pois)
+    )
+    return path
+
+
+def _cases(route, trip) -> dict:
+    """The measured functions, each one gets the same route"""
+    from datastructures.DistanceCalculation import DistanceCalculation
+    from datastructures.Recommendation import Recommendation
+    from datastructures.Snapshot import Snapshot
+
+    return {
+        "route_profile": lambda: DistanceCalculation.route_profile(route),
+        "plan_steps": lambda: trip.plan_steps(max_distance=100000.0, max_elevation=1500.0),
+        "find_route_recommendations": lambda: Recommendation().find_route_recommendations(route, {"restaurant": []}),
+        "snapshot_dump_and_load": lambda: Snapshot.loads(Snapshot.dumps(trip=trip)),
+        "model_dump_json": (lambda: trip.model_dump_json()) if len(route) <= MAX_JSON_POINTS else None,
+    }
+
+
+def measure(function, repetitions: int) -> dict:
+    """Median and minimum seconds over the repetitions, and peak bytes allocated by a separate traced run"""
+    times = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds_median": statistics.median(times), "seconds_min": min(times), "peak_bytes": peak}
+
+
+def run(sizes: list[int], repetitions: int) -> dict:
+    # The recommendations must come from the synthetic store, never from Overpass
+    os.environ["OFFLINE_POI_STORE"] = _offline_store_path()
+    from datastructures.Route import Route
+    from datastructures.TripDescriptor import TripDescriptor
+
+    results = []
+    for number_of_points in sizes:
+        route = Route(synthetic_route(number_of_points))
+        trip = TripDescriptor(candidate_routes=[route], selected_route=0, number_of_days=6)
+        for case, function in _cases(route, trip).items():
+            if function is None:
+                continue
+            result = {"case": case, "points": number_of_points, **measure(function, repetitions if number_of_points < 1_000_000 else 1)}
+            results.append(result)
+            print(f"{case:>28} {number_of_points:>10} points {result['seconds_median'] * 1000:>10.2f} ms {result['peak_bytes'] / 2**20:>10.1f} MiB", file=sys.stderr)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def regressions(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Get the cases slower or heavier than the baseline by more than tolerance (e.g. 0.2 for 20%)"""
+    previous = {(r["case"], r["points"]): r for r in baseline["results"]}
+    found = []
+    for result in current["results"]:
+        before = previous.get((result["case"], result["points"]))
+        if before is None:
+            continue
+        for metric in ("seconds_median", "peak_bytes"):
+            if before[metric] > 0 and result[metric] > before[metric] * (1 + tolerance):
+                found.append(f"{result['case']} with {result['points']} points: {metric} went from {before[metric]:.6g} to {result[metric]:.6g}")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the route computations on synthetic routes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="number of points of the routes")
+    parser.add_argument("--repetitions", type=int, default=5, help="timed runs per case, a single one from 1e6 points")
+    parser.add_argument("--output", help="file where the JSON results are written, stdout if not given")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown or memory growth accepted against the baseline")
+    args = parser.parse_args()
+
+    current = run(args.sizes, args.repetitions)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(current, json.load(file), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
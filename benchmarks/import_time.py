@@ -0,0 +1,71 @@
+"""Check that the entry points import within their time budget, so short-lived processes start fast
+
+Run from the root of the project:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --scale 2.0   # on a slower machine
+
+Every module is imported in a fresh interpreter, the time of an empty interpreter is subtracted.
+The run exits with status 1 if a module goes over its budget, the slowest imports are then listed with -X importtime.
+"""
+import argparse, statistics, subprocess, sys, time
+
+
+# Seconds above the interpreter startup, the measured times with a margin of about 30%
+# Before the agent was built lazily, importing main or crew.route_planner_agent took about 1.4 s
+# About 0.25 s of the datastructures is the pydantic plugin of logfire, loaded with the first model,
+# the workers that do not need it can set PYDANTIC_DISABLE_PLUGINS=logfire-plugin
+BUDGETS = {
+    "crew.route_planner_agent": 0.05, # the agent, pydantic_ai and logfire are built and imported on first use
+    "main": 0.8, # the datastructures: numpy, pydantic and requests
+    "datastructures.dependencies": 0.8,
+    "benchmarks.fake_services": 0.3,
+}
+
+
+def import_seconds(statement: str, repetitions: int) -> float:
+    """Median wall time of a fresh interpreter running the statement"""
+    times = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(module: str, count: int = 10) -> list[str]:
+    """The imports that take most of the time of module, from -X importtime"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return [f"{cumulative / 1e6:8.3f} s  {name}" for cumulative, name in sorted(rows, reverse=True)[:count]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the import time of the entry points against their budget")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of every budget, for slower machines")
+    args = parser.parse_args()
+
+    startup = import_seconds("pass", args.repetitions)
+    over = []
+    for module, budget in BUDGETS.items():
+        seconds = import_seconds(f"import {module}", args.repetitions) - startup
+        status = "ok" if seconds <= budget * args.scale else "OVER"
+        print(f"{module:>30} {seconds * 1000:8.1f} ms  budget {budget * args.scale * 1000:8.1f} ms  {status}")
+        if status == "OVER":
+            over.append(module)
+
+    for module in over:
+        print(f"\nslowest imports of {module}:", file=sys.stderr)
+        for line in slowest_imports(module):
+            print(line, file=sys.stderr)
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Run many planning pipelines at once against the fake services and report the throughput and the latency of every stage
+
+Run from the root of the project:
+    python -m benchmarks.load_test --pipelines 200 --concurrency 32 --latency 0.05 --error-rate 0.02
+
+A pipeline plans a trip as the agent does: geocode the places, route the candidates, plan the steps of the first one and
+find the restaurants along it. The fake services of benchmarks.fake_services are started in the process, unless --no-services
+is given and BROUTER_URL, NOMINATIM_URL and OVERPASS_URL already point at running ones.
+The caches are disabled by default so that every stage reaches the services, --caches keeps them in a temporary directory.
+"""
+import argparse, json, os, statistics, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_services import FakeServices, FaultPolicy, add_fault_arguments
+
+
+STAGES = ("geocode", "route", "steps", "recommendations")
+PLACES_PER_TRIP = 3
+
+
+def _configure_caches(enabled: bool) -> None:
+    """Point the caches at a temporary directory, or disable them, before the datastructures are imported"""
+    if enabled:
+        directory = tempfile.mkdtemp(prefix="load-test-")
+        os.environ["GEOCODING_CACHE_PATH"] = os.path.join(directory, "geocoding.sqlite")
+        os.environ["POI_CACHE_PATH"] = os.path.join(directory, "pois.sqlite")
+        os.environ["BROUTER_CACHE_PATH"] = os.path.join(directory, "routes.sqlite")
+    else:
+        os.environ["GEOCODING_CACHE_PATH"] = ""
+        os.environ["POI_CACHE_PATH"] = ""
+        os.environ["BROUTER_CACHE_PATH"] = ""
+    os.environ.pop("OFFLINE_POI_STORE", None)
+
+
+def run_pipeline(index: int, distinct_places: int) -> dict:
+    """Plan one trip, the seconds of every stage that completed and the stage that failed if any"""
+    from datastructures.Recommendation import Recommendation
+    from datastructures.TripDescriptor import TripDescriptor
+
+    trip = TripDescriptor()
+    places = [f"Paese {(index * PLACES_PER_TRIP + i) % distinct_places}" for i in range(PLACES_PER_TRIP)]
+    stages = (
+        ("geocode", lambda: trip.fill(bike_type="gravel", places=places, number_of_days=3)),
+        ("route", lambda: trip.plan_candidate_routes()),
+        ("steps", lambda: trip.fill(selected_route=0) or trip.plan_steps(max_distance=80000.0, max_elevation=1500.0)),
+        ("recommendations", lambda: Recommendation().find_route_recommendations(trip.get_full_resolution_route(0), {"restaurant": []})), # pyright: ignore[reportArgumentType]
+    )
+
+    result = {"seconds": {}, "failed": None}
+    for stage, function in stages:
+        start = time.perf_counter()
+        try:
+            error = function()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error is not None:
+            result["failed"] = stage
+            result["error"] = str(error).splitlines()[0]
+            return result
+        result["seconds"][stage] = time.perf_counter() - start
+    return result
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(results: list[dict], elapsed: float) -> dict:
+    completed = [r for r in results if r["failed"] is None]
+    stages = {}
+    for stage in STAGES:
+        seconds = [r["seconds"][stage] for r in results if stage in r["seconds"]]
+        stages[stage] = {
+            "completed": len(seconds),
+            "failed": sum(1 for r in results if r["failed"] == stage),
+            "p50_seconds": statistics.median(seconds) if seconds else None,
+            "p99_seconds": _percentile(seconds, 0.99) if seconds else None,
+        }
+    errors = {}
+    for r in results:
+        if r["failed"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "pipelines": len(results),
+        "completed": len(completed),
+        "elapsed_seconds": elapsed,
+        "pipelines_per_second": len(completed) / elapsed if elapsed > 0 else None,
+        "stages": stages,
+        "errors": errors,
+    }
+
+
+def run(pipelines: int, concurrency: int, distinct_places: int) -> dict:
+    from datastructures.Transport import Transport
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: run_pipeline(i, distinct_places), range(pipelines)))
+    summary = report(results, time.perf_counter() - start)
+    summary["transport"] = Transport.default().stats()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the planning pipeline against local stand-ins of the services")
+    parser.add_argument("--pipelines", type=int, default=100, help="number of trips planned")
+    parser.add_argument("--concurrency", type=int, default=16, help="trips planned at the same time")
+    parser.add_argument("--distinct-places", type=int, default=1000, help="size of the pool of place names the trips are drawn from")
+    parser.add_argument("--caches", action="store_true", help="keep the geocoding, route and poi caches enabled")
+    parser.add_argument("--no-services", action="store_true", help="use the services already set in BROUTER_URL, NOMINATIM_URL and OVERPASS_URL")
+    parser.add_argument("--output", help="file where the JSON report is written, stdout if not given")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    _configure_caches(args.caches)
+    services = None
+    if not args.no_services:
+        services = FakeServices(faults=FaultPolicy(args.latency, args.jitter, args.error_rate, args.error_status), recordings=args.recordings, ports=(0, 0, 0)).start()
+        # The endpoint URLs are read when the datastructures are imported, which happens after this point
+        os.environ.update(services.environment())
+
+    try:
+        summary = run(args.pipelines, args.concurrency, args.distinct_places)
+    finally:
+        if services is not None:
+            services.stop()
+
+    for stage, values in summary["stages"].items():
+        if values["completed"]:
+            print(f"{stage:>16} p50 {values['p50_seconds'] * 1000:>9.1f} ms  p99 {values['p99_seconds'] * 1000:>9.1f} ms  failed {values['failed']}", file=sys.stderr)
+    print(f"{summary['completed']}/{summary['pipelines']} pipelines in {summary['elapsed_seconds']:.2f} s, {summary['pipelines_per_second'] or 0:.2f} pipelines/s", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
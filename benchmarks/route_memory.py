@@ -0,0 +1,46 @@
+"""Memory used by a long route stored as nested lists and as a Route buffer
+
+Run from the root of the project:
+    python -m benchmarks.route_memory
+"""
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_route
+from datastructures.Route import Route
+
+
+def measure(build) -> int:
+    """Peak memory in bytes allocated while building the object"""
+    tracemalloc.start()
+    obj = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return peak
+
+
+def main(number_of_points: int = 400_000, number_of_alternatives: int = 4) -> None:
+    source = synthetic_route(number_of_points)
+
+    as_lists = measure(lambda: [source.tolist() for _ in range(number_of_alternatives)])
+    as_float64 = measure(lambda: [Route(source.copy()) for _ in range(number_of_alternatives)])
+    as_float32 = measure(lambda: [Route(source, dtype=np.float32) for _ in range(number_of_alternatives)])
+
+    print(f"{number_of_alternatives} routes of {number_of_points} points")
+    print(f"list[list[float]]: {as_lists / 2**20:8.1f} MiB")
+    print(f"Route float64:     {as_float64 / 2**20:8.1f} MiB ({as_lists / as_float64:.1f}x smaller)")
+    print(f"Route float32:     {as_float32 / 2**20:8.1f} MiB ({as_lists / as_float32:.1f}x smaller)")
+
+    # The steps of a route are views of its buffer, whatever its dtype
+    for dtype in (np.float64, np.float32):
+        route = Route(source, dtype=dtype)
+        for step in (route.view(2, number_of_points // 2), route[number_of_points // 2:]):
+            assert step.dtype == dtype, f"A step of a {np.dtype(dtype)} route is {step.dtype}"
+            assert np.shares_memory(np.asarray(step), np.asarray(route)), f"A step of a {np.dtype(dtype)} route is a copy"
+    print("Steps of float64 and float32 routes share the buffer of the route")
+
+
+if __name__ == "__main__":
+    main()
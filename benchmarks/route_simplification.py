@@ -0,0 +1,48 @@
+"""Speedup and error of the route simplification done after the routing
+
+Run from the root of the project:
+    python -m benchmarks.route_simplification
+"""
+import time
+
+from benchmarks.synthetic import synthetic_route
+from datastructures.Route import Route
+from datastructures.StepPlanner import StepPlanner
+from datastructures.TripDescriptor import TripDescriptor
+
+
+def downstream_time(route: Route, repetitions: int = 5) -> float:
+    """Seconds spent by what follows the routing: profile, steps and serialization of the trip"""
+    trip = TripDescriptor(candidate_routes=[route], selected_route=0)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        profile = route.profile()
+        StepPlanner.balanced_cut_points(profile.cumulative_distance, profile.cumulative_ascent, 6, 100000.0, 1500.0)
+        trip.model_dump_json()
+    return (time.perf_counter() - start) / repetitions
+
+
+def main(number_of_points: int = 400_000) -> None:
+    full = Route(synthetic_route(number_of_points))
+    full_profile = full.profile()
+    full_length = full_profile.cumulative_distance[-1]
+    full_ascent = full_profile.cumulative_ascent[-1]
+    full_time = downstream_time(full)
+
+    print(f"full resolution: {len(full)} points, {full_length / 1000:.1f} km, {full_ascent:.0f} m of ascent, downstream {full_time * 1000:.1f} ms")
+    print(f"{'tolerance':>9} {'points':>8} {'simplify':>9} {'downstream':>10} {'speedup':>8} {'length error':>13} {'ascent error':>13}")
+    for tolerance in (1.0, 2.0, 5.0, 10.0):
+        start = time.perf_counter()
+        simplified = full.simplify(tolerance)
+        simplify_time = time.perf_counter() - start
+
+        profile = simplified.profile()
+        length_error = (profile.cumulative_distance[-1] - full_length) / full_length
+        ascent_error = (profile.cumulative_ascent[-1] - full_ascent) / full_ascent
+        simplified_time = downstream_time(simplified)
+
+        print(f"{tolerance:>8.0f}m {len(simplified):>8} {simplify_time * 1000:>7.0f}ms {simplified_time * 1000:>8.1f}ms {full_time / simplified_time:>7.0f}x {length_error:>13.4%} {ascent_error:>13.4%}")
+
+
+if __name__ == "__main__":
+    main()
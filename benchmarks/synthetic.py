@@ -0,0 +1,25 @@
+"""Synthetic routes for the benchmarks"""
+import numpy as np
+
+
+def synthetic_route(number_of_points: int, length: float = 480000.0, seed: int = 0) -> np.ndarray:
+    """A winding route of [lon, lat, elv] points with the density of a BRouter track
+    Args:
+        number_of_points (int): number of points of the route
+        length (float): approximate length of the route in meter
+        seed (int): seed of the small random wiggles of the road
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, number_of_points)
+    scale = length / 480000.0
+
+    # A main direction, bends of a few kilometers and hairpins of a few hundred meters
+    lon = 13.0 + scale * (1.5 * t + 0.05 * np.sin(40 * t) + 0.004 * np.sin(900 * t))
+    lat = 46.0 - scale * (4.0 * t - 0.05 * np.cos(40 * t) - 0.003 * np.cos(700 * t))
+    lon += rng.normal(0.0, 2e-7, number_of_points)
+    lat += rng.normal(0.0, 2e-7, number_of_points)
+
+    # Hills and climbs, rounded to a decimeter as in the BRouter output
+    elv = np.round(200.0 + 300.0 * np.sin(25 * t) ** 2 + 40.0 * np.sin(300 * t), 1)
+
+    return np.stack([lon, lat, elv], axis=1)
@@ -1,55 +1,103 @@
-import yaml, logfire
-from dotenv import load_dotenv
-
-from pydantic_ai import Agent, RunContext, Tool
-
-from datastructures.dependencies import MyDeps
-
-from tools.route_planner_tools import say_to_the_user, get_trip_information, get_user_information, get_recommendations, generate_the_candidate_routes, divide_the_route_in_steps, find_the_recommendations
-from tools.filler import fill_trip_description, fill_user_preferences, fill_user_performance, fill_user_additional_note
-
-
-load_dotenv()
-
-
-with open("./crew/crew.yaml", "r") as file:
-    try:
-        crew_info = yaml.safe_load(file)
-    except yaml.YAMLError as e:
-        logfire.log("error", f"Error loading crew.yaml: {e}")
-        raise e
-
-
-logfire.log("info", "Creation of: \troute_planner_agent")
-route_planner = Agent(
-    model=crew_info["route_planner"]["llm"],
-    deps_type=MyDeps,
-    system_prompt=crew_info["route_planner"]["system_prompt"],
-    tools=[
-        Tool(say_to_the_user, takes_ctx=False, docstring_format="google", max_retries=3),
-        Tool(fill_trip_description, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(fill_user_preferences, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(fill_user_performance, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(fill_user_additional_note, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(get_trip_information, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(get_user_information, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(get_recommendations, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(generate_the_candidate_routes, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(divide_the_route_in_steps, takes_ctx=True, docstring_format="google", max_retries=3),
-        Tool(find_the_recommendations, takes_ctx=True, docstring_format="google", max_retries=3),
-    ]
-)
-
-# ========== Add additional context to LLM ===========
-@route_planner.system_prompt()
-def add_descriptors_structure_to_system_prompt(ctx: RunContext[MyDeps]) -> str:
-    return f"""The trip is described by the following class:\n{str(ctx.deps.trip.get_class_description())}
-The user is described by the following class:\n{str(ctx.deps.user.get_class_description())}
+"""The route planner agent, built on first use by get_route_planner()
+
+Importing this module is cheap: yaml, pydantic_ai, logfire and the tools are imported when the agent is built,
+so processes that never run the agent (workers, scripts, benchmarks) do not pay for them.
 """
+import os
+from functools import lru_cache
+
+
+CREW_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crew.yaml")
+
+_logfire = None # set by configure_instrumentation
+
+
+@lru_cache(maxsize=None)
+def load_crew_config(path: str = CREW_CONFIG_PATH) -> dict:
+    """Get the parsed crew.yaml, it is read once per process"""
+    import yaml
+
+    with open(path, "r") as file:
+        try:
+            return yaml.safe_load(file)
+        except yaml.YAMLError as e:
+            log("error", f"Error loading crew.yaml: {e}")
+            raise e
+
+
+def configure_instrumentation() -> None:
+    """Send the traces of the agent and of the tools to logfire, optional: without it nothing is traced outside the process"""
+    global _logfire
+    import logfire
+    from pydantic_ai import Agent
+
+    from datastructures.Telemetry import Telemetry
+
+    logfire.configure()
+    logfire.instrument_pydantic_ai()
+    Agent.instrument_all()
+    Telemetry.default().send_to_logfire()
+    _logfire = logfire
 
 
-@route_planner.system_prompt(dynamic=True)
-def add_current_descriptions_to_system_prompt(ctx: RunContext[MyDeps]) -> str:
-    return f"""Current trip informations are: {str(ctx.deps.trip.get_description())}
+@lru_cache(maxsize=None)
+def get_route_planner():
+    """Get the route planner agent, it is built on the first call and shared by the process"""
+    from dotenv import load_dotenv
+    from pydantic_ai import Agent, RunContext, Tool
+
+    from datastructures.dependencies import MyDeps
+    from tools.route_planner_tools import say_to_the_user, get_trip_information, get_user_information, get_recommendations, generate_the_candidate_routes, generate_the_candidate_routes_for_every_bike_type, divide_the_route_in_steps, find_the_recommendations
+    from tools.filler import fill_trip_description, fill_user_preferences, fill_user_performance, fill_user_additional_note
+
+    load_dotenv()
+    crew_info = load_crew_config()
+
+    log("info", "Creation of: \troute_planner_agent")
+    route_planner = Agent(
+        model=crew_info["route_planner"]["llm"],
+        deps_type=MyDeps,
+        system_prompt=crew_info["route_planner"]["system_prompt"],
+        tools=[
+            Tool(say_to_the_user, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(fill_trip_description, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(fill_user_preferences, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(fill_user_performance, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(fill_user_additional_note, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(get_trip_information, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(get_user_information, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(get_recommendations, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(generate_the_candidate_routes, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(generate_the_candidate_routes_for_every_bike_type, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(divide_the_route_in_steps, takes_ctx=True, docstring_format="google", max_retries=3),
+            Tool(find_the_recommendations, takes_ctx=True, docstring_format="google", max_retries=3),
+        ]
+    )
+
+    # ========== Add additional context to LLM ===========
+    @route_planner.system_prompt()
+    def add_descriptors_structure_to_system_prompt(ctx: RunContext[MyDeps]) -> str:
+        return f"""The trip is described by the following class:\n{str(ctx.deps.trip.get_class_description())}
+The user is described by the following class:\n{str(ctx.deps.user.get_class_description())}
+"""
+
+    @route_planner.system_prompt(dynamic=True)
+    def add_current_descriptions_to_system_prompt(ctx: RunContext[MyDeps]) -> str:
+        return f"""Current trip informations are: {str(ctx.deps.trip.get_description())}
 Current user informations are: {str(ctx.deps.user.get_description())}
 """
+
+    return route_planner
+
+
+def log(level: str, message: str) -> None:
+    """Log to logfire if the instrumentation is configured, the agent works the same without"""
+    if _logfire is not None:
+        _logfire.log(level, message)
+
+
+def __getattr__(name: str):
+    # `from crew.route_planner_agent import route_planner` keeps working, the agent is built at that moment
+    if name == "route_planner":
+        return get_route_planner()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
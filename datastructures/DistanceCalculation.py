@@ -1,30 +1,144 @@
 import math
+from typing import NamedTuple
+
+import numpy as np
+
+
+class RouteProfile(NamedTuple):
+    """Per-point geometry of a route, computed in a single vectorized pass
+    Attributes:
+        segment_lengths (np.ndarray): length in meter of each segment, n - 1 values for a route of n points
+        cumulative_distance (np.ndarray): distance in meter from the first point, n values starting at 0
+        cumulative_ascent (np.ndarray): positive height difference in meter from the first point, n values starting at 0
+    """
+    segment_lengths: np.ndarray
+    cumulative_distance: np.ndarray
+    cumulative_ascent: np.ndarray
+
 
 class DistanceCalculation:
+    """Geographical distances, all the points are expressed as [lon, lat, elv], the same axis order used by BRouter"""
+
     @classmethod
     def fcc_distance(cls, a: list[float], b: list[float]) -> float:
         """Calculate the geographical distance (in meter) between two points using the Federal Communication Commission formula (for distances under 475 km)"""
-        lat_a, lon_a, _ = a
-        lat_b, lon_b, _ = b
+        lon_a, lat_a = a[0], a[1]
+        lon_b, lat_b = b[0], b[1]
 
         difference_in_lon = lon_a - lon_b
         difference_in_lat = lat_a - lat_b
 
-        mean_latitude = (lat_a + lat_b) / 2
+        mean_latitude = math.radians((lat_a + lat_b) / 2)
 
         K1 = 111.13209 - 0.56605 * math.cos(2 * mean_latitude) + 0.00120 * math.cos(4 * mean_latitude)
         K2 = 111.41513 * math.cos(mean_latitude) - 0.09455 * math.cos(3 * mean_latitude) + 0.00012 * math.cos(5 * mean_latitude)
 
         D = math.sqrt(math.pow(K1 * difference_in_lat, 2) + math.pow(K2 * difference_in_lon, 2))
-        
+
         return D * 1000
-    
+
+    @classmethod
+    def fcc_distances(cls, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Calculate the length (in meter) of every segment of a polyline using the Federal Communication Commission formula"""
+        mean_latitude = np.radians((lat[1:] + lat[:-1]) * 0.5)
+
+        K1 = 111.13209 - 0.56605 * np.cos(2 * mean_latitude) + 0.00120 * np.cos(4 * mean_latitude)
+        K2 = 111.41513 * np.cos(mean_latitude) - 0.09455 * np.cos(3 * mean_latitude) + 0.00012 * np.cos(5 * mean_latitude)
+
+        return np.hypot(K1 * np.diff(lat), K2 * np.diff(lon)) * 1000
+
+    @classmethod
+    def route_profile(cls, route) -> RouteProfile:
+        """Calculate segment lengths, cumulative distance and cumulative positive ascent of a whole route at once
+        Args:
+            route (array like): the route as a sequence of [lon, lat, elv] points, elv is optional
+
+        Returns:
+            RouteProfile: the arrays describing the route
+
+        Examples:
+            ```python
+            profile = DistanceCalculation.route_profile([[13.23, 46.06, 110.0], [13.31, 45.90, 28.0]])
+            total_length = profile.cumulative_distance[-1]
+            ```
+        """
+        coordinates = np.asarray(route, dtype=np.float64)
+        if coordinates.ndim != 2 or len(coordinates) == 0:
+            empty = np.zeros(0, dtype=np.float64)
+            return RouteProfile(empty, empty, empty)
+
+        segment_lengths = cls.fcc_distances(coordinates[:, 0], coordinates[:, 1])
+
+        if coordinates.shape[1] > 2:
+            ascent = np.maximum(np.diff(coordinates[:, 2]), 0.0)
+        else:
+            ascent = np.zeros(len(segment_lengths), dtype=np.float64)
+
+        cumulative_distance = np.empty(len(coordinates), dtype=np.float64)
+        cumulative_distance[0] = 0.0
+        np.cumsum(segment_lengths, out=cumulative_distance[1:])
+
+        cumulative_ascent = np.empty(len(coordinates), dtype=np.float64)
+        cumulative_ascent[0] = 0.0
+        np.cumsum(ascent, out=cumulative_ascent[1:])
+
+        return RouteProfile(segment_lengths, cumulative_distance, cumulative_ascent)
+
     @classmethod
-    def __euclidian_distance(cls, a: list[float], b: list[float]) -> float:
-        """Calculate the elevation distance between two geographical points"""
-        squared_distances_sum = 0
+    def local_metric_projection(cls, lon: np.ndarray, lat: np.ndarray, reference_latitude: float | None = None) -> np.ndarray:
+        """Project [lon, lat] points on a plane, in meter, accurate enough for distances of a few hundred kilometers
+        Args:
+            lon (np.ndarray): longitudes of the points
+            lat (np.ndarray): latitudes of the points
+            reference_latitude (float | None): latitude where the scale is exact, the mean latitude of the points if None
+        """
+        if reference_latitude is None:
+            reference_latitude = float(np.mean(lat)) if len(lat) > 0 else 0.0
+        mean_latitude = math.radians(reference_latitude)
+
+        K1 = 111.13209 - 0.56605 * math.cos(2 * mean_latitude) + 0.00120 * math.cos(4 * mean_latitude)
+        K2 = 111.41513 * math.cos(mean_latitude) - 0.09455 * math.cos(3 * mean_latitude) + 0.00012 * math.cos(5 * mean_latitude)
+
+        return np.column_stack([np.asarray(lon, dtype=np.float64) * K2 * 1000, np.asarray(lat, dtype=np.float64) * K1 * 1000])
+
+    @classmethod
+    def douglas_peucker(cls, points: np.ndarray, tolerance: float) -> np.ndarray:
+        """Get the indexes of the points kept by the Douglas-Peucker simplification
+        Args:
+            points (np.ndarray): (n, k) array of points in a metric space, e.g. the output of local_metric_projection
+            tolerance (float): maximum distance, in the unit of the points, between the dropped points and the simplified line
+
+        Returns:
+            np.ndarray: increasing indexes of the kept points, the first and the last point are always kept
+        """
+        number_of_points = len(points)
+        if number_of_points < 3:
+            return np.arange(number_of_points)
+
+        keep = np.zeros(number_of_points, dtype=bool)
+        keep[0] = keep[-1] = True
+        stack = [(0, number_of_points - 1)]
+
+        while stack:
+            start, end = stack.pop()
+            if end - start < 2:
+                continue
+
+            a = points[start]
+            ab = points[end] - a
+            inner = points[start + 1:end] - a
+            squared_length = float(ab @ ab)
+            if squared_length == 0.0:
+                distances = np.linalg.norm(inner, axis=1)
+            else:
+                t = np.clip(inner @ ab / squared_length, 0.0, 1.0)
+                distances = np.linalg.norm(inner - t[:, None] * ab, axis=1)
 
-        for i in range(len(a)):
-            squared_distances_sum += (a[i] - b[i])**2
+            farthest = int(np.argmax(distances))
+            if distances[farthest] > tolerance:
+                split = start + 1 + farthest
+                keep[split] = True
+                stack.append((start, split))
+                stack.append((split, end))
 
-        return math.sqrt(squared_distances_sum)
\ No newline at end of file
+        return np.flatnonzero(keep)
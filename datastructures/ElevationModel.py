@@ -0,0 +1,148 @@
+import math, os
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from datastructures.Route import Route
+
+
+HGT_VOID = -32768 # value of the SRTM samples without data
+HGT_SIZES = {1201 * 1201 * 2: 1201, 3601 * 3601 * 2: 3601} # file size in bytes -> samples per side, SRTM3 (3") and SRTM1 (1")
+
+
+class ElevationModel:
+    """Elevation of any point from local SRTM tiles, the .hgt files are memory mapped so only the read pages are loaded
+    Args:
+        directory (str): folder containing the tiles, named as SRTM does (e.g. N46E013.hgt)
+        max_open_tiles (int): maximum number of tiles kept mapped, the least recently used are closed
+
+    The elevation is bilinearly interpolated between the 4 samples around the point, the void samples are left out.
+    Points outside the available tiles get NaN.
+
+    Examples:
+        ```python
+        model = ElevationModel("~/srtm")
+        elevations = model.elevations(np.array([13.2346, 13.7768]), np.array([46.0649, 45.6495]))
+        route = model.enrich(route)
+        ```
+    """
+    __default: "ElevationModel | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, directory: str, max_open_tiles: int = 16) -> None:
+        self.directory = os.path.expanduser(directory)
+        self.max_open_tiles = max_open_tiles
+        self.__tiles: OrderedDict[tuple[int, int], np.ndarray | None] = OrderedDict()
+        self.__lock = Lock()
+
+    @classmethod
+    def default(cls) -> "ElevationModel | None":
+        """Get the model reading the tiles in DEM_DIRECTORY, None if it is not set or the folder does not exist"""
+        directory = os.path.expanduser(os.environ.get("DEM_DIRECTORY", ""))
+        if directory == "" or not os.path.isdir(directory):
+            return None
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(directory)
+            return cls.__default
+
+    @staticmethod
+    def tile_name(lon: int, lat: int) -> str:
+        """Get the SRTM name of the tile whose south west corner is (lon, lat), e.g. N46E013"""
+        return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}"
+
+    def elevations(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Get the elevation in meter of every point, NaN where there is no tile or only void samples
+        Args:
+            lon (np.ndarray): longitudes of the points
+            lat (np.ndarray): latitudes of the points
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        elevations = np.full(lon.shape, np.nan)
+        if lon.size == 0:
+            return elevations
+
+        # Every point is grouped by its tile, with a single integer key per tile
+        tile_keys = (np.floor(lon).astype(np.int64) + 180) * 180 + (np.floor(lat).astype(np.int64) + 90)
+        keys, inverse = np.unique(tile_keys, return_inverse=True)
+
+        for k, key in enumerate(keys.tolist()):
+            tile_lon, tile_lat = key // 180 - 180, key % 180 - 90
+            tile = self.__tile(tile_lon, tile_lat)
+            if tile is None:
+                continue
+            mask = inverse == k
+            elevations[mask] = self.__interpolate(tile, lon[mask] - tile_lon, lat[mask] - tile_lat)
+
+        return elevations
+
+    def elevation(self, lon: float, lat: float) -> float | None:
+        """Get the elevation in meter of a single point, None if it is not available"""
+        value = float(self.elevations(np.array([lon]), np.array([lat]))[0])
+        return None if math.isnan(value) else value
+
+    def enrich(self, route: Route, overwrite: bool = False) -> Route:
+        """Get a copy of the route with the elevations read from the tiles
+        Args:
+            route (Route): the route to enrich
+            overwrite (bool): if False only the points at 0.0 m, the value a Route gives to the points without elevation, are changed
+
+        The points outside the tiles keep their elevation.
+        """
+        coordinates = np.array(route.coordinates)
+        if len(coordinates) == 0:
+            return Route(coordinates, dtype=route.dtype)
+
+        elevations = self.elevations(coordinates[:, 0], coordinates[:, 1])
+        update = ~np.isnan(elevations)
+        if not overwrite:
+            update &= coordinates[:, 2] == 0.0
+        coordinates[update, 2] = elevations[update]
+        return Route(coordinates, dtype=route.dtype)
+
+    def __tile(self, lon: int, lat: int) -> np.ndarray | None:
+        """Get the memory mapped samples of a tile, None if the tile is not available"""
+        with self.__lock:
+            if (lon, lat) in self.__tiles:
+                self.__tiles.move_to_end((lon, lat))
+                return self.__tiles[(lon, lat)]
+
+            tile = None
+            for name in (self.tile_name(lon, lat) + ".hgt", self.tile_name(lon, lat).lower() + ".hgt"):
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    size = HGT_SIZES.get(os.path.getsize(path))
+                    if size is not None:
+                        tile = np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+                    break
+
+            # A missing tile is remembered too, so the folder is not searched again for every point of the route
+            self.__tiles[(lon, lat)] = tile
+            if len(self.__tiles) > self.max_open_tiles:
+                self.__tiles.popitem(last=False)
+            return tile
+
+    @staticmethod
+    def __interpolate(tile: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Bilinear interpolation inside a tile, x and y are the offsets in degree from its south west corner"""
+        last = tile.shape[0] - 1
+        # The first row of the file is the north edge of the tile
+        column = np.clip(x, 0.0, 1.0) * last
+        row = (1.0 - np.clip(y, 0.0, 1.0)) * last
+        column_0 = np.minimum(np.floor(column).astype(np.int64), last - 1)
+        row_0 = np.minimum(np.floor(row).astype(np.int64), last - 1)
+        dx = column - column_0
+        dy = row - row_0
+
+        samples = np.stack([tile[row_0, column_0], tile[row_0, column_0 + 1], tile[row_0 + 1, column_0], tile[row_0 + 1, column_0 + 1]], axis=-1).astype(np.float64)
+        weights = np.stack([(1 - dx) * (1 - dy), dx * (1 - dy), (1 - dx) * dy, dx * dy], axis=-1)
+
+        # The void samples are left out, if the valid ones have no weight (the point is on a void sample) they are averaged
+        valid = samples != HGT_VOID
+        weights = np.where(valid, weights, 0.0)
+        weights = np.where((weights.sum(axis=-1) > 0)[:, None], weights, valid.astype(np.float64))
+        total = weights.sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, (np.where(valid, samples, 0.0) * weights).sum(axis=-1) / total, np.nan)
@@ -0,0 +1,139 @@
+import json, os, sqlite3, time, unicodedata
+from collections import OrderedDict
+from threading import Lock
+
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "cycling-trip-agency")
+
+
+class GeocodingCache:
+    """Cache of the geocoding results, an in-process LRU in front of a SQLite file
+    Args:
+        path (str): path of the SQLite file, ":memory:" keeps the cache in memory only
+        ttl (float): seconds after which a found place is geocoded again
+        negative_ttl (float): seconds after which a place that was not found is geocoded again
+        max_entries (int): maximum number of entries kept on disk, the least recently used are evicted
+        memory_entries (int): maximum number of entries kept in the in-process LRU
+
+    A cached value is either a dict with display_name, lat and lon, or None when the place was not found.
+
+    Examples:
+        ```python
+        cache = GeocodingCache.default()
+        found, result = cache.get("Udine")
+        if not found:
+            cache.put("Udine", {"display_name": "Udine, Friuli-Venezia Giulia, Italia", "lat": 46.06, "lon": 13.23})
+        ```
+    """
+    __default: "GeocodingCache | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, negative_ttl: float = 24 * 3600, max_entries: int = 100_000, memory_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.__memory: OrderedDict[str, tuple[float, dict | None]] = OrderedDict()
+        self.__lock = Lock()
+        self.__puts_since_eviction = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """CREATE TABLE IF NOT EXISTS geocoding (
+                query TEXT PRIMARY KEY,
+                result TEXT,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS geocoding_accessed_at ON geocoding (accessed_at)")
+
+    @classmethod
+    def default(cls) -> "GeocodingCache | None":
+        """Get the cache shared by the process, its file is GEOCODING_CACHE_PATH or ~/.cache/cycling-trip-agency/geocoding.sqlite
+        Returns None if GEOCODING_CACHE_PATH is set to an empty string, i.e. the cache is disabled
+        """
+        path = os.environ.get("GEOCODING_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIRECTORY, "geocoding.sqlite"))
+        if path == "":
+            return None
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(path)
+            return cls.__default
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query so that "  Udine ,Italy" and "udine, italy" share the same entry"""
+        query = unicodedata.normalize("NFKC", query).casefold()
+        parts = [" ".join(part.split()) for part in query.split(",")]
+        return ", ".join(part for part in parts if part)
+
+    def get(self, query: str) -> tuple[bool, dict | None]:
+        """Get the cached result of a query
+        Returns:
+            - (True, dict): the place was found
+            - (True, None): the place was looked up and not found
+            - (False, None): the query is not cached or is expired
+        """
+        key = self.normalize(query)
+        now = time.time()
+
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self.__memory.move_to_end(key)
+                    return True, result
+                del self.__memory[key]
+
+            row = self.__connection.execute("SELECT result, expires_at FROM geocoding WHERE query = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return False, None
+
+            self.__connection.execute("UPDATE geocoding SET accessed_at = ? WHERE query = ?", (now, key))
+            result = json.loads(row[0]) if row[0] is not None else None
+            self.__remember(key, row[1], result)
+            return True, result
+
+    def put(self, query: str, result: dict | None) -> None:
+        """Store the result of a query, None means that the place was not found"""
+        key = self.normalize(query)
+        now = time.time()
+        expires_at = now + (self.ttl if result is not None else self.negative_ttl)
+
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO geocoding (query, result, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result) if result is not None else None, expires_at, now),
+            )
+            self.__remember(key, expires_at, result)
+
+            self.__puts_since_eviction += 1
+            if self.__puts_since_eviction >= max(1, self.max_entries // 100):
+                self.__evict(now)
+                self.__puts_since_eviction = 0
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__memory.clear()
+            self.__connection.execute("DELETE FROM geocoding")
+
+    def __remember(self, key: str, expires_at: float, result: dict | None) -> None:
+        self.__memory[key] = (expires_at, result)
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.memory_entries:
+            self.__memory.popitem(last=False)
+
+    def __evict(self, now: float) -> None:
+        """Drop the expired entries, then the least recently used ones above max_entries"""
+        self.__connection.execute("DELETE FROM geocoding WHERE expires_at <= ?", (now,))
+        (count,) = self.__connection.execute("SELECT COUNT(*) FROM geocoding").fetchone()
+        if count > self.max_entries:
+            self.__connection.execute(
+                "DELETE FROM geocoding WHERE query IN (SELECT query FROM geocoding ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
@@ -0,0 +1,193 @@
+import json, os, re, sqlite3
+from threading import Lock
+
+
+POI_KEYS = ("amenity", "tourism", "historic", "building", "natural", "water", "leisure", "man_made")
+INSERT_BATCH_SIZE = 10000
+MAX_BOXES_PER_STATEMENT = 200
+
+
+class OfflinePoiStore:
+    """Local store of the OpenStreetMap pois of a region, spatially indexed with a SQLite R*Tree
+    Args:
+        path (str): path of the SQLite file
+
+    The store is filled once from an OSM extract with `ingest_pois.py`, then answers the same tag and name filters as Overpass,
+    returning the pois as Overpass elements ({"type", "id", "lat", "lon", "tags"}).
+
+    Examples:
+        ```python
+        store = OfflinePoiStore("friuli.sqlite")
+        store.ingest_overpass_json("friuli.json")
+        elements = store.query([(45.9, 13.1, 46.1, 13.3)], "amenity=restaurant", "Pizzeria|Trattoria")
+        ```
+    """
+    __default: "OfflinePoiStore | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, path: str) -> None:
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.create_function("REGEXP", 2, self.__regexp, deterministic=True)
+        self.__connection.execute(
+            """CREATE TABLE IF NOT EXISTS pois (
+                id INTEGER PRIMARY KEY,
+                osm_type TEXT NOT NULL,
+                osm_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                name TEXT,
+                lon REAL NOT NULL,
+                lat REAL NOT NULL,
+                tags TEXT NOT NULL
+            )"""
+        )
+        self.__connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pois_index USING rtree(id, min_lon, max_lon, min_lat, max_lat)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS pois_category ON pois (category)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS coverage (min_lon REAL, min_lat REAL, max_lon REAL, max_lat REAL)")
+
+    @classmethod
+    def default(cls) -> "OfflinePoiStore | None":
+        """Get the store set by OFFLINE_POI_STORE, None if it is not set or the file does not exist"""
+        path = os.environ.get("OFFLINE_POI_STORE", "")
+        if path == "" or not os.path.exists(path):
+            return None
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(path)
+            return cls.__default
+
+    def covers(self, south: float, west: float, north: float, east: float) -> bool:
+        """Check if the box is inside one of the ingested regions"""
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT 1 FROM coverage WHERE min_lat <= ? AND min_lon <= ? AND max_lat >= ? AND max_lon >= ? LIMIT 1",
+                (south, west, north, east),
+            ).fetchone()
+        return row is not None
+
+    def query(self, boxes: list[tuple[float, float, float, float]], category: str, name_pattern: str | None = None) -> list[dict]:
+        """Get the pois of a category (e.g. "amenity=restaurant") inside any of the (south, west, north, east) boxes
+        Args:
+            boxes (list[tuple[float, float, float, float]]): the boxes to search
+            category (str): the tag of the pois, as key=value
+            name_pattern (str | None): regular expression the name must match, as the Overpass ["name"~"..."] filter
+        """
+        elements = {}
+        with self.__lock:
+            # The boxes of a chunk are merged in a single statement, so a poi inside overlapping boxes is filtered once
+            for start in range(0, len(boxes), MAX_BOXES_PER_STATEMENT):
+                chunk = boxes[start:start + MAX_BOXES_PER_STATEMENT]
+                box_queries = " UNION ".join("SELECT id FROM pois_index WHERE min_lon <= ? AND max_lon >= ? AND min_lat <= ? AND max_lat >= ?" for _ in chunk)
+                rows = self.__connection.execute(
+                    f"""SELECT osm_type, osm_id, lon, lat, tags FROM pois
+                    WHERE id IN ({box_queries})
+                    AND category = ? AND (? IS NULL OR name REGEXP ?)""",
+                    (*(value for south, west, north, east in chunk for value in (east, west, north, south)), category, name_pattern, name_pattern),
+                )
+                for osm_type, osm_id, lon, lat, tags in rows:
+                    elements[(osm_type, osm_id)] = {"type": osm_type, "id": osm_id, "lat": lat, "lon": lon, "tags": json.loads(tags)}
+        return list(elements.values())
+
+    def ingest(self, elements) -> int:
+        """Store the pois of an iterable of Overpass-like elements, the elements without a poi tag are skipped
+        Returns:
+            int: the number of stored pois
+        """
+        count = 0
+        bounds = [180.0, 90.0, -180.0, -90.0]
+        batch = []
+
+        with self.__lock:
+            self.__connection.execute("BEGIN")
+            (next_id,) = self.__connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM pois").fetchone()
+
+            for element in elements:
+                tags = element.get("tags") or {}
+                lat = element.get("lat", (element.get("center") or {}).get("lat"))
+                lon = element.get("lon", (element.get("center") or {}).get("lon"))
+                if lat is None or lon is None:
+                    continue
+
+                serialized_tags = None
+                for key in POI_KEYS:
+                    if key not in tags:
+                        continue
+                    if serialized_tags is None:
+                        serialized_tags = json.dumps(tags, separators=(",", ":"))
+                    batch.append((next_id, element.get("type", "node"), int(element["id"]), f"{key}={tags[key]}", tags.get("name"), float(lon), float(lat), serialized_tags))
+                    next_id += 1
+                    count += 1
+
+                if serialized_tags is not None:
+                    bounds = [min(bounds[0], float(lon)), min(bounds[1], float(lat)), max(bounds[2], float(lon)), max(bounds[3], float(lat))]
+
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    self.__insert(batch)
+                    batch = []
+
+            self.__insert(batch)
+            if count > 0:
+                self.__connection.execute("INSERT INTO coverage VALUES (?, ?, ?, ?)", bounds)
+            self.__connection.execute("COMMIT")
+
+        return count
+
+    def ingest_overpass_json(self, path: str) -> int:
+        """Store the pois of an Overpass JSON dump, the file is streamed so its size is not bounded by the memory"""
+        return self.ingest(self.__stream_overpass_elements(path))
+
+    def ingest_pbf(self, path: str) -> int:
+        """Store the pois of an OSM PBF extract, requires the optional `osmium` package"""
+        try:
+            import osmium
+        except ImportError as e:
+            raise ImportError("Reading OSM PBF extracts requires the osmium package: pip install osmium") from e
+
+        def elements():
+            for obj in osmium.FileProcessor(path).with_locations().with_filter(osmium.filter.KeyFilter(*POI_KEYS)):
+                if obj.is_node():
+                    yield {"type": "node", "id": obj.id, "lat": obj.location.lat, "lon": obj.location.lon, "tags": dict(obj.tags)}
+
+        return self.ingest(elements())
+
+    def __insert(self, batch: list[tuple]) -> None:
+        self.__connection.executemany("INSERT INTO pois VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        self.__connection.executemany("INSERT INTO pois_index VALUES (?, ?, ?, ?, ?)", [(row[0], row[5], row[5], row[6], row[6]) for row in batch])
+
+    @staticmethod
+    def __regexp(pattern: str, name: str | None) -> bool:
+        if name is None:
+            return False
+        try:
+            return re.search(pattern, name) is not None
+        except re.error:
+            return pattern in name
+
+    @staticmethod
+    def __stream_overpass_elements(path: str, chunk_size: int = 1 << 20):
+        """Yield the objects of the "elements" array of an Overpass JSON file, one at a time"""
+        decoder = json.JSONDecoder()
+        with open(path, "r", encoding="utf-8") as file:
+            buffer = ""
+            while '"elements"' not in buffer:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    return
+                buffer += chunk
+            position = buffer.index("[", buffer.index('"elements"')) + 1
+
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if buffer.startswith("]", position):
+                    return
+                try:
+                    element, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    chunk = file.read(chunk_size)
+                    if not chunk:
+                        return
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                yield element
@@ -1,10 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class PerformanceDescriptor(BaseModel):
     """Description of the user cycling performance"""
     kilometer_per_day: int = 0 #Field(default=0, description="the maximum amout of kilometers the user is able to ride in a day")
     positive_height_difference_per_day: int = 0 #Field(default=0, description="the maximum difference of height in meter the user is ablo do in a day")
+    _description: str | None = PrivateAttr(default=None)
 
     def get_kilometer_per_day(self) -> int:
         return self.kilometer_per_day
@@ -22,6 +23,9 @@ class PerformanceDescriptor(BaseModel):
 """
 
     def get_description(self) -> str:
+        if self._description is not None:
+            return self._description
+
         description = ""
         
         if self.kilometer_per_day > 0:
@@ -30,8 +34,9 @@ class PerformanceDescriptor(BaseModel):
             description += f"Difference in height per day: {self.positive_height_difference_per_day}\n"
             
         if description == "":
-            return "No performance set."
+            description = "No performance set."
 
+        self._description = description
         return description
     
     def __set_kilometer_per_day(self, kilometer_per_day: int) -> None | str:
@@ -56,6 +61,8 @@ class PerformanceDescriptor(BaseModel):
             performance.fill(kilometer_per_day=100, positive_height_difference_per_day=500)
             ```
         """
+        self._description = None
+
         if kilometer_per_day is not None:
             res = self.__set_kilometer_per_day(kilometer_per_day)
             if res is not None:
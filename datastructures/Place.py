@@ -1,19 +1,41 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
 from pydantic import BaseModel
+from datastructures.GeocodingCache import GeocodingCache
+from datastructures.ElevationModel import ElevationModel
+from datastructures.Transport import Transport
+from datastructures.Telemetry import Telemetry
+
+
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+_deferred_resolution: ContextVar[bool] = ContextVar("deferred_resolution", default=False)
 
 
 class Place(BaseModel):
     """Represent a place
     Args:
         name (str): name of the place, it can be a city, a street, a point of interest, etc.
-        osm_name (str): name of the 
+        osm_name (str): name of the place on OpenStreetMap, set automatically
         lat (float | None): latitude of the place, if None, it will be set automatically
         lon (float | None): longitude of the place, if None, it will be set automatically
-        elv (float | None): elevation of the place, if None, it will be set automatically
+        elv (float | None): elevation of the place, if None, it will be set automatically from the local SRTM tiles (see ElevationModel)
+
+    A place built with lat and lon never calls the geocoding service.
+    Inside `Place.deferred_resolution()` the places are not geocoded when built, `Place.resolve_all` geocodes them later in a single pass.
 
     Examples:
         ```python
         udine = Place(name="Udine")
         louis_pordenone = Place(name="Louis, Pordenone")
+        castle = Place(name="Castello di Udine", lat=46.0649, lon=13.2346)
+
+        with Place.deferred_resolution():
+            places = [Place(name=name) for name in ["Udine", "Palmanova", "Trieste"]]
+        Place.resolve_all(places)
         ```
     """
     name: str
@@ -21,35 +43,107 @@ class Place(BaseModel):
     lat: float | None = None
     lon: float | None = None
     elv: float | None = None
-    
+
     def model_post_init(self, __context__=None) -> None:
-        self.__set_coordinates()
+        if self.is_resolved():
+            if self.osm_name == "":
+                self.osm_name = self.name
+            self.fill_elevations([self])
+            return
+        if not _deferred_resolution.get():
+            self.__set_coordinates()
+            self.fill_elevations([self])
+
+    @classmethod
+    @contextmanager
+    def deferred_resolution(cls):
+        """Build the places without geocoding them, they can be resolved later with `Place.resolve_all`"""
+        token = _deferred_resolution.set(True)
+        try:
+            yield
+        finally:
+            _deferred_resolution.reset(token)
+
+    @classmethod
+    def resolve_all(cls, places: list["Place"]) -> None:
+        """Geocode every unresolved place, each distinct name is looked up once and the requests are spaced following the Nominatim usage policy"""
+        unresolved: dict[str, list[Place]] = {}
+        for place in places:
+            if not place.is_resolved():
+                unresolved.setdefault(GeocodingCache.normalize(place.name), []).append(place)
+
+        for same_name_places in unresolved.values():
+            result = cls.__geocode(same_name_places[0].name)
+            for place in same_name_places:
+                place.__apply(result)
+
+        cls.fill_elevations(places)
+
+    @classmethod
+    def fill_elevations(cls, places: list["Place"]) -> None:
+        """Set the elevation of the resolved places that have none, with a single lookup in the local SRTM tiles, no network is used"""
+        model = ElevationModel.default()
+        missing = [place for place in places if place.elv is None and place.is_resolved()]
+        if model is None or len(missing) == 0:
+            return
+
+        elevations = model.elevations(np.array([place.lon for place in missing]), np.array([place.lat for place in missing]))
+        for place, elevation in zip(missing, elevations.tolist()):
+            if not np.isnan(elevation):
+                place.elv = elevation
+
+    @classmethod
+    def __geocode(cls, name: str) -> dict | None:
+        """Get the display_name, lat and lon of a place, from the cache if possible"""
+        cache = GeocodingCache.default()
+        found, result = cache.get(name) if cache is not None else (False, None)
+        if cache is not None:
+            Telemetry.default().increment("cache_requests_total", cache="geocoding", result="hit" if found else "miss")
+        if found:
+            return result
 
-    def __set_coordinates(self) -> None | str:
-        import requests
-        
         params = {
-            "q": self.name,
-            "format": "json"
+            "q": name,
+            "format": "json",
+            "limit": 1 # only the best match is used
         }
         headers = {
-            "User-Agent": "cycling-trip-acency, Place class"  
+            "User-Agent": "cycling-trip-acency, Place class"
         }
-        url = f"https://nominatim.openstreetmap.org/search"
-
-        response = requests.get(url, params=params, headers=headers)
+        # The Transport spaces the requests to Nominatim following its usage policy
+        response = Transport.default().get(NOMINATIM_URL, params=params, headers=headers)
         response.raise_for_status()
 
-        if response.json():
-            json_response = response.json()[0]
-            self.osm_name = str(json_response["display_name"])
-            self.lat = float(json_response["lat"])
-            self.lon = float(json_response["lon"])
+        json_response = response.json()
+        result = None
+        if json_response:
+            result = {
+                "display_name": str(json_response[0]["display_name"]),
+                "lat": float(json_response[0]["lat"]),
+                "lon": float(json_response[0]["lon"]),
+            }
+        if cache is not None:
+            cache.put(name, result)
+
+        return result
+
+    def __apply(self, result: dict | None) -> None:
+        if result is not None:
+            self.osm_name = result["display_name"]
+            self.lat = result["lat"]
+            self.lon = result["lon"]
+
+    def __set_coordinates(self) -> None | str:
+        self.__apply(self.__geocode(self.name))
+
+    def is_resolved(self) -> bool:
+        """Check if the coordinates of the place are known"""
+        return self.lat is not None and self.lon is not None
 
     def get_name(self) -> str:
         """Get the name of the place"""
         return self.osm_name
-    
+
     def get_users_name(self) -> str:
         """get the user's name"""
         return self.name
@@ -58,4 +152,4 @@ class Place(BaseModel):
         """Get the coordinates of the place"""
         if self.lat is None or self.lon is None:
             return []
-        return [self.lat, self.lon, self.elv] if self.elv is not None else [self.lat, self.lon, 0.0]
\ No newline at end of file
+        return [self.lat, self.lon, self.elv] if self.elv is not None else [self.lat, self.lon, 0.0]
@@ -0,0 +1,196 @@
+import json, math, os, sqlite3, time, zlib
+from threading import Lock
+
+import numpy as np
+
+from datastructures.GeocodingCache import DEFAULT_CACHE_DIRECTORY
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+class PoiCache:
+    """Persistent cache of the Overpass pois, split in geohash tiles and tag categories
+    Args:
+        path (str): path of the SQLite file, ":memory:" keeps the cache in memory only
+        precision (int): geohash precision of the tiles, 5 gives tiles of ~4.9 x 4.9 km
+        ttl (float): seconds after which a tile is fetched again
+
+    A tile of a category (e.g. "amenity=restaurant") stores every node of that category inside the tile, without name filters,
+    so the same tile answers every later query, whatever the names the user is looking for.
+
+    Examples:
+        ```python
+        cache = PoiCache.default()
+        tiles = cache.tiles_around(route.coordinates, route.profile().cumulative_distance, 10000)
+        elements, missing_tiles = cache.get(tiles, "amenity=restaurant")
+        ```
+    """
+    __default: "PoiCache | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, path: str, precision: int = 5, ttl: float = 7 * 24 * 3600) -> None:
+        self.precision = precision
+        self.ttl = ttl
+        self.__lon_bits = math.ceil(5 * precision / 2)
+        self.__lat_bits = 5 * precision // 2
+        self.__tile_width = 360.0 / 2**self.__lon_bits
+        self.__tile_height = 180.0 / 2**self.__lat_bits
+        self.__lock = Lock()
+        self.__stats = {"tile_hits": 0, "tile_misses": 0, "bytes_saved": 0, "bytes_fetched": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """CREATE TABLE IF NOT EXISTS pois (
+                tile TEXT NOT NULL,
+                category TEXT NOT NULL,
+                elements BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (tile, category)
+            )"""
+        )
+
+    @classmethod
+    def default(cls) -> "PoiCache | None":
+        """Get the cache shared by the process, its file is POI_CACHE_PATH or ~/.cache/cycling-trip-agency/pois.sqlite
+        Returns None if POI_CACHE_PATH is set to an empty string, i.e. the cache is disabled
+        """
+        path = os.environ.get("POI_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIRECTORY, "pois.sqlite"))
+        if path == "":
+            return None
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(path)
+            return cls.__default
+
+    def geohash(self, tile: tuple[int, int]) -> str:
+        """Get the geohash of a tile given as (column, row) in the grid of the cache precision"""
+        column, row = tile
+        bits = 0
+        for i in range(5 * self.precision):
+            # Geohash interleaves the bits starting from the longitude
+            if i % 2 == 0:
+                bits = (bits << 1) | ((column >> (self.__lon_bits - 1 - i // 2)) & 1)
+            else:
+                bits = (bits << 1) | ((row >> (self.__lat_bits - 1 - i // 2)) & 1)
+        return "".join(GEOHASH_ALPHABET[(bits >> (5 * (self.precision - 1 - i))) & 31] for i in range(self.precision))
+
+    def tile_of(self, lon: float, lat: float) -> tuple[int, int]:
+        """Get the (column, row) of the tile containing a point"""
+        column = min(int((lon + 180.0) // self.__tile_width), 2**self.__lon_bits - 1)
+        row = min(int((lat + 90.0) // self.__tile_height), 2**self.__lat_bits - 1)
+        return column, row
+
+    def tiles_around(self, coordinates: np.ndarray, cumulative_distance: np.ndarray, radius: float) -> set[tuple[int, int]]:
+        """Get the tiles that intersect the corridor of the given radius (in meter) around a route of [lon, lat, ...] points"""
+        if len(coordinates) == 0:
+            return set()
+
+        tile_size = self.__tile_height * 111132.0
+        step = max(min(tile_size, radius) / 2, 1.0)
+        samples = np.unique(np.searchsorted(cumulative_distance, np.arange(0.0, cumulative_distance[-1] + step, step)).clip(0, len(coordinates) - 1))
+        lon = coordinates[samples, 0]
+        lat = coordinates[samples, 1]
+
+        # Bounding box of the circle around every sample, widened by half a step to cover the points between samples
+        margin = radius + step / 2
+        delta_lat = margin / 111132.0
+        delta_lon = margin / (111320.0 * np.maximum(np.cos(np.radians(lat)), 1e-6))
+        first_columns = np.floor((lon - delta_lon + 180.0) / self.__tile_width).astype(np.int64)
+        last_columns = np.floor((lon + delta_lon + 180.0) / self.__tile_width).astype(np.int64)
+        first_rows = np.floor((lat - delta_lat + 90.0) / self.__tile_height).astype(np.int64)
+        last_rows = np.floor((lat + delta_lat + 90.0) / self.__tile_height).astype(np.int64)
+
+        tiles = set()
+        for first_column, last_column, first_row, last_row in zip(first_columns, last_columns, first_rows, last_rows):
+            for column in range(first_column, last_column + 1):
+                for row in range(first_row, last_row + 1):
+                    tiles.add((column, row))
+        return tiles
+
+    def bounding_boxes(self, tiles: set[tuple[int, int]]) -> list[tuple[float, float, float, float]]:
+        """Get the (south, west, north, east) boxes covering the tiles, consecutive tiles of the same row are merged"""
+        boxes = []
+        for row in sorted({row for _, row in tiles}):
+            columns = sorted(column for column, r in tiles if r == row)
+            run_start = previous = columns[0]
+            for column in columns[1:] + [None]:
+                if column is not None and column == previous + 1:
+                    previous = column
+                    continue
+                boxes.append((
+                    row * self.__tile_height - 90.0,
+                    run_start * self.__tile_width - 180.0,
+                    (row + 1) * self.__tile_height - 90.0,
+                    (previous + 1) * self.__tile_width - 180.0,
+                ))
+                if column is not None:
+                    run_start = previous = column
+        return boxes
+
+    def get(self, tiles: set[tuple[int, int]], category: str) -> tuple[list[dict], set[tuple[int, int]]]:
+        """Get the cached elements of a category inside the tiles
+        Returns:
+            - list[dict]: the Overpass elements of the tiles found in the cache
+            - set[tuple[int, int]]: the tiles that are missing or expired
+        """
+        elements = []
+        missing = set()
+        now = time.time()
+
+        with self.__lock:
+            for tile in tiles:
+                row = self.__connection.execute(
+                    "SELECT elements, size, expires_at FROM pois WHERE tile = ? AND category = ?", (self.geohash(tile), category)
+                ).fetchone()
+                if row is None or row[2] <= now:
+                    missing.add(tile)
+                    self.__stats["tile_misses"] += 1
+                    continue
+                elements.extend(json.loads(zlib.decompress(row[0])))
+                self.__stats["tile_hits"] += 1
+                self.__stats["bytes_saved"] += row[1]
+
+        return elements, missing
+
+    def put(self, tiles: set[tuple[int, int]], category: str, elements: list[dict]) -> None:
+        """Store the elements of a category fetched for the given tiles, the tiles without elements are stored empty"""
+        per_tile: dict[tuple[int, int], list[dict]] = {tile: [] for tile in tiles}
+        for element in elements:
+            if element.get("lat") is None or element.get("lon") is None:
+                continue
+            tile = self.tile_of(float(element["lon"]), float(element["lat"]))
+            if tile in per_tile:
+                per_tile[tile].append(element)
+
+        now = time.time()
+        with self.__lock:
+            self.__connection.execute("BEGIN")
+            for tile, tile_elements in per_tile.items():
+                payload = json.dumps(tile_elements, separators=(",", ":")).encode()
+                self.__connection.execute(
+                    "INSERT OR REPLACE INTO pois (tile, category, elements, size, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.geohash(tile), category, zlib.compress(payload), len(payload), now + self.ttl),
+                )
+            self.__connection.execute("DELETE FROM pois WHERE expires_at <= ?", (now,))
+            self.__connection.execute("COMMIT")
+
+    def record_fetched_bytes(self, size: int) -> None:
+        with self.__lock:
+            self.__stats["bytes_fetched"] += size
+
+    def stats(self) -> dict:
+        """Get the counters of the cache: tile_hits, tile_misses, hit_rate, bytes_saved and bytes_fetched"""
+        with self.__lock:
+            stats = dict(self.__stats)
+        lookups = stats["tile_hits"] + stats["tile_misses"]
+        stats["hit_rate"] = stats["tile_hits"] / lookups if lookups > 0 else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__connection.execute("DELETE FROM pois")
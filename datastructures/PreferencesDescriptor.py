@@ -1,4 +1,35 @@
-from pydantic import BaseModel
+from functools import lru_cache
+from pydantic import BaseModel, PrivateAttr
+
+
+@lru_cache(maxsize=8)
+def _class_description(possible_amenity: tuple, possible_tourism: tuple, possible_historic: tuple, possible_building: tuple, possible_natural: tuple, possible_water: tuple, possible_leisure: tuple, possible_man_made: tuple) -> str:
+    return f"""## PreferencesDescriptor:
+- amenity: dict | None = None
+    - the list of amenities the user prefers
+    - can be one or more of the following: {', '.join(possible_amenity)}
+- tourism: dict | None = None
+    - the list of tourism points the user prefers
+    - can be one or more of the following: {', '.join(possible_tourism)}
+- historic: dict | None = None
+    - the list of historic points the user prefers
+    - can be one or more of the following: {', '.join(possible_historic)}
+- building: dict | None = None
+    - the list of buildings the user prefers
+    - can be one or more of the following: {', '.join(possible_building)}
+- natural: dict | None = None
+    - the list of natural points the user prefers
+    - can be one or more of the following: {', '.join(possible_natural)}
+- water: dict | None = None
+    - the list of water points the user prefers
+    - can be one or more of the following: {', '.join(possible_water)}
+- leisure: dict | None = None
+    - the list of leisure points the user prefers
+    - can be one or more of the following: {', '.join(possible_leisure)}
+- man_made: dict | None = None
+    - the list of man-made points the user prefers
+    - can be one or more of the following: {', '.join(possible_man_made)}
+"""
 
 
 class  PreferencesDescriptor(BaseModel):
@@ -19,6 +50,7 @@ class  PreferencesDescriptor(BaseModel):
     water: dict | None = None
     leisure: dict | None = None
     man_made: dict | None = None
+    _description: str | None = PrivateAttr(default=None)
 
     def get_amenity(self) -> dict | None:
         return self.amenity
@@ -45,35 +77,22 @@ class  PreferencesDescriptor(BaseModel):
         return self.man_made
     
     def get_class_description(self) -> str:
-        """Get a string description of the class"""
-        return f"""## PreferencesDescriptor:
-- amenity: dict | None = None
-    - the list of amenities the user prefers
-    - can be one or more of the following: {', '.join(self.possible_amenity)}
-- tourism: dict | None = None
-    - the list of tourism points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_tourism)}
-- historic: dict | None = None
-    - the list of historic points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_historic)}
-- building: dict | None = None
-    - the list of buildings the user prefers
-    - can be one or more of the following: {', '.join(self.possible_building)}
-- natural: dict | None = None
-    - the list of natural points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_natural)}
-- water: dict | None = None
-    - the list of water points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_water)}
-- leisure: dict | None = None
-    - the list of leisure points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_leisure)}
-- man_made: dict | None = None
-    - the list of man-made points the user prefers
-    - can be one or more of the following: {', '.join(self.possible_man_made)}
-"""
+        """Get a string description of the class, built once and byte-stable across processes so the prompt can be cached by the provider"""
+        return _class_description(
+            tuple(sorted(self.possible_amenity)),
+            tuple(sorted(self.possible_tourism)),
+            tuple(sorted(self.possible_historic)),
+            tuple(sorted(self.possible_building)),
+            tuple(sorted(self.possible_natural)),
+            tuple(sorted(self.possible_water)),
+            tuple(sorted(self.possible_leisure)),
+            tuple(sorted(self.possible_man_made)),
+        )
 
     def get_description(self) -> str:
+        if self._description is not None:
+            return self._description
+
         description = ""
 
         if self.amenity:
@@ -94,8 +113,9 @@ class  PreferencesDescriptor(BaseModel):
             description += f"Man-made: {', '.join([man_made for man_made in self.man_made])}\n"
 
         if description == "":
-            return "No preferences set."
-        
+            description = "No preferences set."
+
+        self._description = description
         return description
 
     def __set_amenity(self, amenity: dict) -> None | str:
@@ -173,6 +193,8 @@ class  PreferencesDescriptor(BaseModel):
             )
             ```
         """
+        self._description = None
+
         if amenity is not None:
             res = self.__set_amenity(amenity)
             if res is not None:
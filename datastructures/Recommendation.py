@@ -1,7 +1,19 @@
-import requests, time
+import os, re, requests
+import numpy as np
 from pydantic import BaseModel
 from datastructures.Place import Place
+from datastructures.Route import Route
 from datastructures.DistanceCalculation import DistanceCalculation
+from datastructures.PoiCache import PoiCache
+from datastructures.OfflinePoiStore import OfflinePoiStore
+from datastructures.Transport import Transport
+from datastructures.Telemetry import Telemetry
+
+
+OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+MAX_POIS_PER_SEARCH_WINDOW = 3
+MAX_CORRIDOR_VERTICES = 400 # vertices of the simplified route sent in a single query
+CORRIDOR_TOLERANCE_RATIO = 0.1 # simplification tolerance of the corridor, as a fraction of the search radius
 
 
 class Recommendation(BaseModel):
@@ -10,61 +22,208 @@ class Recommendation(BaseModel):
     def get_recommended_places(self) -> list[Place]:
         return self.recommended_places
 
-    def __query_overpass(self, query: str, max_retries: int = 3) -> requests.Response | None:
-        url = "https://overpass-api.de/api/interpreter"
-
-        for i in range(max_retries):
-            try:
-                response = requests.post(url, data=query, headers={'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8'})
-                if response.status_code != 200:
-                    time.sleep(2**i)
-                    continue
-                return response
-            except:
-                if i == max_retries - 1:
-                    return None
-
-    def __get_amenity_pois(self, search_center: list[float], search_radius: int, amenityes: dict) -> list[Place]:
-        lon, lat, _ = search_center
-
-        query = "[out:json][timeout:25];("
+    def __query_overpass(self, query: str) -> tuple[dict, int] | None:
+        """Send a query to Overpass, get the parsed answer and its size in bytes, None if it fails, the retries on a busy server are made by the Transport
+        An answer with a remark was cut short by a timeout or a runtime error of the server, its elements are incomplete so it is a failure too
+        """
+        try:
+            response = Transport.default().post(OVERPASS_URL, data=query, headers={'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8'})
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or "remark" in data:
+            return None
+        return data, len(response.content)
+
+    def __corridor_query(self, polyline: np.ndarray, search_radius: int, amenityes: dict) -> str:
+        """Build the query of the pois around a polyline of [lon, lat] points"""
+        around = ",".join(f"{lat:.6f},{lon:.6f}" for lon, lat in polyline)
+
+        query = "[out:json][timeout:90];("
 
         for key in amenityes.keys():
             a = amenityes.get(key)
             if a is not None:
-                query += f'node["amenity"="{key}"]["name"~"{"".join(v+"|" for v in a[:len(a)-1])}{a[-1]}"](around:{search_radius},{lat},{lon});' # pyright: ignore[reportOptionalIterable]
+                name_filter = f'["name"~"{"|".join(a)}"]' if len(a) > 0 else ""
+                query += f'node["amenity"="{key}"]{name_filter}(around:{search_radius},{around});'
 
-        query += ");out geom qt 10;"
+        query += ");out qt;"
 
-        data = self.__query_overpass(query)
+        return query
 
-        recommended_places = []
+    def __get_corridor_elements(self, route: Route, search_radius: int, amenityes: dict) -> list[dict]:
+        """Get the Overpass elements within search_radius meters from the route, with one query every MAX_CORRIDOR_VERTICES vertices of the simplified route"""
+        coordinates = route.coordinates
+        projected = DistanceCalculation.local_metric_projection(coordinates[:, 0], coordinates[:, 1])
+        polyline = coordinates[DistanceCalculation.douglas_peucker(projected, search_radius * CORRIDOR_TOLERANCE_RATIO), :2]
 
-        if data:
-            data = data.json()
-            
-            i = 0
-            for d in data.get("elements"):
-                if i == 3: # Limit the pois to 3 results
-                    break
-                name = d.get("tags").get("name")
-                addr_city = d.get("tags").get("addr:city")
+        elements = {}
+        for start in range(0, max(len(polyline) - 1, 1), MAX_CORRIDOR_VERTICES - 1):
+            answer = self.__query_overpass(self.__corridor_query(polyline[start:start + MAX_CORRIDOR_VERTICES], search_radius, amenityes))
+            if answer is not None:
+                for element in answer[0].get("elements", []):
+                    elements[(element.get("type"), element.get("id"))] = element
 
-                if name and addr_city:
-                    place = Place(name=f"{name}, {addr_city}")
-                    if place.get_name():
-                        recommended_places.append(place)
-                        i += 1
+        return list(elements.values())
 
-        return recommended_places
+    def __get_tiled_elements(self, cache: PoiCache, route: Route, search_radius: int, amenityes: dict) -> list[dict]:
+        """Get the Overpass elements of the tiles around the route, only the tiles missing from the cache are fetched, with a single query"""
+        tiles = cache.tiles_around(route.coordinates, route.profile().cumulative_distance, search_radius)
 
-    def find_route_recommendations(self, route: list[list[float]], amenity: dict, search_radius: int = 10000) -> None:
+        elements = {}
+        missing_per_category = {}
+        name_filters = {}
+        for key in amenityes.keys():
+            a = amenityes.get(key)
+            if a is None:
+                continue
+            category = f"amenity={key}"
+            name_filters[category] = self.__name_pattern(a)
+            cached, missing = cache.get(tiles, category)
+            Telemetry.default().increment("cache_requests_total", len(tiles) - len(missing), cache="poi", result="hit")
+            Telemetry.default().increment("cache_requests_total", len(missing), cache="poi", result="miss")
+            for element in cached:
+                elements[(element.get("type"), element.get("id"))] = element
+            if missing:
+                missing_per_category[category] = missing
+
+        if missing_per_category:
+            query = "[out:json][timeout:90];("
+            for category, missing in missing_per_category.items():
+                key, value = category.split("=", 1)
+                for south, west, north, east in cache.bounding_boxes(missing):
+                    query += f'node["{key}"="{value}"]({south:.6f},{west:.6f},{north:.6f},{east:.6f});'
+            query += ");out qt;"
+
+            answer = self.__query_overpass(query)
+            # A failed or incomplete answer is not cached, the missing tiles are fetched again by the next search
+            if answer is not None:
+                data, size = answer
+                cache.record_fetched_bytes(size)
+                fetched = data.get("elements", [])
+                for category, missing in missing_per_category.items():
+                    key, value = category.split("=", 1)
+                    cache.put(missing, category, [e for e in fetched if e.get("tags", {}).get(key) == value])
+                for element in fetched:
+                    elements[(element.get("type"), element.get("id"))] = element
+
+        # The tiles hold every node of the category, the name filters of the user are applied here
+        return self.__filter_by_name(list(elements.values()), name_filters)
+
+    def __get_offline_elements(self, store: OfflinePoiStore, route: Route, search_radius: int, amenityes: dict) -> list[dict] | None:
+        """Get the elements around the route from the offline store, None if the store does not cover the route"""
+        coordinates = route.coordinates
+        margin_lat = search_radius / 111132.0
+        margin_lon = search_radius / (111320.0 * max(float(np.cos(np.radians(np.max(np.abs(coordinates[:, 1]))))), 1e-6))
+        if not store.covers(
+            float(coordinates[:, 1].min()) - margin_lat, float(coordinates[:, 0].min()) - margin_lon,
+            float(coordinates[:, 1].max()) + margin_lat, float(coordinates[:, 0].max()) + margin_lon,
+        ):
+            return None
+
+        # A box around a route sample every search_radius meters, the corridor is then refined by __assign_to_route
+        cumulative_distance = route.profile().cumulative_distance
+        samples = np.unique(np.searchsorted(cumulative_distance, np.arange(0.0, cumulative_distance[-1] + search_radius, search_radius)).clip(0, len(coordinates) - 1))
+        boxes = []
+        for lon, lat in coordinates[samples, :2]:
+            box_margin_lon = 1.5 * search_radius / (111320.0 * max(float(np.cos(np.radians(lat))), 1e-6))
+            boxes.append((lat - 1.5 * margin_lat, lon - box_margin_lon, lat + 1.5 * margin_lat, lon + box_margin_lon))
+
+        elements = []
+        for key in amenityes.keys():
+            a = amenityes.get(key)
+            if a is not None:
+                elements.extend(store.query(boxes, f"amenity={key}", "|".join(a) if len(a) > 0 else None))
+        return elements
+
+    def __filter_by_name(self, elements: list[dict], name_filters: dict[str, re.Pattern | None]) -> list[dict]:
+        """Keep the elements of the given categories whose name matches the pattern of the category"""
+        filtered = []
+        for element in elements:
+            tags = element.get("tags", {})
+            for category, pattern in name_filters.items():
+                key, value = category.split("=", 1)
+                if tags.get(key) == value and (pattern is None or pattern.search(tags.get("name", ""))):
+                    filtered.append(element)
+                    break
+        return filtered
+
+    def __name_pattern(self, names: list[str]) -> re.Pattern | None:
+        """Get the pattern equivalent to the Overpass name filter, None if any name is accepted"""
+        if len(names) == 0:
+            return None
+        try:
+            return re.compile("|".join(names))
+        except re.error:
+            return re.compile("|".join(re.escape(name) for name in names))
+
+    def __assign_to_route(self, elements: list[dict], route: Route, cumulative_distance: np.ndarray, search_radius: int) -> list[Place]:
+        """Place the pois along the route, keeping the MAX_POIS_PER_SEARCH_WINDOW closest to the route every 2*search_radius meters"""
+        candidates = []
+        for d in elements:
+            tags = d.get("tags", {})
+            name = tags.get("name")
+            addr_city = tags.get("addr:city")
+            if name and addr_city and d.get("lat") is not None and d.get("lon") is not None:
+                candidates.append((f"{name}, {addr_city}", float(d["lon"]), float(d["lat"])))
+
+        if len(candidates) == 0:
+            return []
+
+        # The route is sampled every few hundred meters, the position of a poi is the one of its closest sample
+        coordinates = route.coordinates
+        sampling_step = max(search_radius / 20, 1.0)
+        samples = np.unique(np.searchsorted(cumulative_distance, np.arange(0.0, cumulative_distance[-1] + sampling_step, sampling_step)).clip(0, len(coordinates) - 1))
+        reference_latitude = float(np.mean(coordinates[:, 1]))
+        route_points = DistanceCalculation.local_metric_projection(coordinates[samples, 0], coordinates[samples, 1], reference_latitude)
+        pois = DistanceCalculation.local_metric_projection(np.array([c[1] for c in candidates]), np.array([c[2] for c in candidates]), reference_latitude)
+
+        closest_sample = np.empty(len(pois), dtype=np.intp)
+        distance_from_route = np.empty(len(pois), dtype=np.float64)
+        for block in range(0, len(pois), 256):
+            squared = ((pois[block:block + 256, None, :] - route_points[None, :, :]) ** 2).sum(axis=2)
+            closest_sample[block:block + 256] = np.argmin(squared, axis=1)
+            distance_from_route[block:block + 256] = np.sqrt(squared[np.arange(len(squared)), closest_sample[block:block + 256]])
+
+        position = cumulative_distance[samples[closest_sample]]
+        window = np.floor(position / (2*search_radius)).astype(np.int64)
+
+        recommended_places = []
+        taken_per_window: dict[int, int] = {}
+        for i in np.lexsort((distance_from_route, window)):
+            if distance_from_route[i] > search_radius + sampling_step:
+                continue
+            if taken_per_window.get(int(window[i]), 0) == MAX_POIS_PER_SEARCH_WINDOW:
+                continue
+            taken_per_window[int(window[i])] = taken_per_window.get(int(window[i]), 0) + 1
+            name, lon, lat = candidates[i]
+            # Overpass already returns the position of the node, no geocoding is needed
+            recommended_places.append((position[i], Place(name=name, lat=lat, lon=lon)))
+
+        recommended_places.sort(key=lambda p: p[0])
+        return [place for _, place in recommended_places]
+
+    def find_route_recommendations(self, route: Route, amenity: dict, search_radius: int = 10000) -> None:
+        """Find the pois within search_radius meters from the route, at most MAX_POIS_PER_SEARCH_WINDOW every 2*search_radius meters, in the order they are met"""
         self.recommended_places = []
-        distance_from_previous_search_point = search_radius
-
-        for i in range(1, len(route)):
-            distance_from_previous_search_point += DistanceCalculation.fcc_distance(route[i-1], route[i])
-            if distance_from_previous_search_point >= 2*search_radius:
-                pois = self.__get_amenity_pois(route[i], search_radius, amenity)
-                self.recommended_places.extend(pois)
-                distance_from_previous_search_point = 0.0
+        if len(route) == 0:
+            return
+
+        elements = None
+        store = OfflinePoiStore.default()
+        if store is not None:
+            elements = self.__get_offline_elements(store, route, search_radius, amenity)
+
+        if elements is None:
+            # The remote Overpass endpoint is the fallback for the regions that are not in the offline store
+            cache = PoiCache.default()
+            if cache is not None:
+                elements = self.__get_tiled_elements(cache, route, search_radius, amenity)
+            else:
+                elements = self.__get_corridor_elements(route, search_radius, amenity)
+        self.recommended_places = self.__assign_to_route(elements, route, route.profile().cumulative_distance, search_radius)
@@ -0,0 +1,220 @@
+import numpy as np
+from pydantic import GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic.json_schema import JsonSchemaValue
+from pydantic_core import core_schema
+
+from datastructures.DistanceCalculation import DistanceCalculation, RouteProfile
+
+
+_SEPARATORS_TO_SPACES = bytes.maketrans(b"[],:\r\n\t", b"       ")
+
+
+class Route:
+    """A route stored as a contiguous (n, 3) buffer of [lon, lat, elv] points
+    Args:
+        coordinates (array like): the points of the route, as returned by BRouter. Points without elevation get 0.0
+        dtype (np.dtype): either np.float64 (default) or np.float32, float32 halves the memory at the cost of ~1 m of precision
+
+    Slicing a route (or calling `view`) returns a new Route sharing the same buffer, no point is copied.
+    Inside a pydantic model the route is serialized as a list of [lon, lat, elv] lists.
+
+    Examples:
+        ```python
+        route = Route([[13.23, 46.06, 110.0], [13.24, 46.05, 112.0], [13.25, 46.04, 109.0]])
+        first_step = route.view(0, 2)
+        route.to_list()
+        ```
+    """
+    __slots__ = ("_coordinates",)
+
+    def __init__(self, coordinates=(), dtype=np.float64) -> None:
+        array = np.asarray(coordinates, dtype=dtype)
+        if array.size == 0:
+            array = np.zeros((0, 3), dtype=dtype)
+        if array.ndim != 2 or array.shape[1] not in (2, 3):
+            raise ValueError(f"A route must be a sequence of [lon, lat] or [lon, lat, elv] points, an array of shape {array.shape} was provided")
+        if array.shape[1] == 2:
+            array = np.hstack([array, np.zeros((len(array), 1), dtype=dtype)])
+
+        self._coordinates = np.ascontiguousarray(array)
+
+    @classmethod
+    def concatenate(cls, routes: list["Route"]) -> "Route":
+        """Join several routes (e.g. the legs of a trip) in a single buffer"""
+        if len(routes) == 0:
+            return cls()
+        # The buffer keeps the dtype of the routes, float32 legs give a float32 route
+        return cls(np.concatenate([route.coordinates for route in routes]), dtype=np.result_type(*(route.dtype for route in routes)))
+
+    @classmethod
+    def from_geojson(cls, chunks, dtype=np.float64) -> "Route":
+        """Build a route from the chunks of a GeoJSON body (e.g. response.iter_content()), parsing only the first "coordinates" array
+        Args:
+            chunks (Iterable[bytes]): the body of the response, in pieces of any size
+            dtype (np.dtype): dtype of the route buffer
+
+        The properties, the messages and everything after the coordinates are skipped without being decoded,
+        the numbers are converted a chunk at a time so the memory used is the route buffer plus one chunk.
+
+        Raises:
+            ValueError: if the body has no "coordinates" array
+        """
+        key = b'"coordinates"'
+        pending = b""
+        found = False
+        numbers_per_point = None
+        parts = []
+
+        for chunk in chunks:
+            pending += chunk
+            if not found:
+                start = pending.find(key)
+                if start < 0:
+                    # The key may be split between two chunks
+                    pending = pending[-(len(key) - 1):]
+                    continue
+                found = True
+                pending = pending[start + len(key):]
+
+            # Numbers, brackets, commas and spaces are the only bytes of the array, the next quote or brace ends it
+            end = min((index for index in (pending.find(b"}"), pending.find(b'"')) if index >= 0), default=-1)
+            if numbers_per_point is None:
+                # The first closing bracket ends the first point, the numbers before it are its coordinates
+                first_point = pending.find(b"]") if end < 0 else pending.find(b"]", 0, end)
+                if first_point >= 0:
+                    numbers_per_point = sum(len(part) for part in parts) + len(cls.__parse_numbers(pending[:first_point]))
+            if end >= 0:
+                parts.append(cls.__parse_numbers(pending[:end]))
+                break
+
+            # The last number may continue in the next chunk
+            split = max(pending.rfind(b","), pending.rfind(b"]"), pending.rfind(b"["))
+            parts.append(cls.__parse_numbers(pending[:split + 1]))
+            pending = pending[split + 1:]
+        else:
+            if not found:
+                raise ValueError("The GeoJSON body has no coordinates")
+            parts.append(cls.__parse_numbers(pending))
+
+        numbers = np.concatenate(parts) if len(parts) > 0 else np.zeros(0)
+        if numbers_per_point is None or len(numbers) == 0:
+            return cls(dtype=dtype)
+        return cls(numbers.reshape(-1, numbers_per_point), dtype=dtype)
+
+    @staticmethod
+    def __parse_numbers(text: bytes) -> np.ndarray:
+        text = text.translate(_SEPARATORS_TO_SPACES).strip()
+        # np.fromstring reads a blank string as [-1.0]
+        if len(text) == 0:
+            return np.zeros(0)
+        return np.fromstring(text.decode("ascii"), dtype=np.float64, sep=" ")
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """The (n, 3) array of [lon, lat, elv] points, read only"""
+        view = self._coordinates.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._coordinates.dtype
+
+    @property
+    def nbytes(self) -> int:
+        """Size in bytes of the points, for a view it is the size of the viewed points"""
+        return self._coordinates.nbytes
+
+    def view(self, start: int, stop: int) -> "Route":
+        """Get the points between start and stop (excluded) without copying them"""
+        return Route(self._coordinates[start:stop], dtype=self._coordinates.dtype)
+
+    def profile(self) -> RouteProfile:
+        """Get the segment lengths, cumulative distance and cumulative ascent of the route"""
+        return DistanceCalculation.route_profile(self._coordinates)
+
+    def simplify(self, tolerance: float) -> "Route":
+        """Get a copy of the route without the points closer than tolerance meters to the simplified line, elevation included
+        Args:
+            tolerance (float): maximum distance in meter, horizontal or vertical, between a dropped point and the simplified route
+        """
+        if len(self) < 3 or tolerance <= 0:
+            return Route(self._coordinates.copy(), dtype=self._coordinates.dtype)
+
+        points = np.empty((len(self), 3), dtype=np.float64)
+        points[:, :2] = DistanceCalculation.local_metric_projection(self._coordinates[:, 0], self._coordinates[:, 1])
+        points[:, 2] = self._coordinates[:, 2]
+
+        return Route(self._coordinates[DistanceCalculation.douglas_peucker(points, tolerance)], dtype=self._coordinates.dtype)
+
+    def bounding_box(self) -> tuple[float, float, float, float] | None:
+        """Get the (south, west, north, east) box of the route, None if the route is empty"""
+        if len(self) == 0:
+            return None
+        lon = self._coordinates[:, 0]
+        lat = self._coordinates[:, 1]
+        return float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max())
+
+    def encoded_polyline(self, precision: int = 5) -> str:
+        """Get the route as an encoded polyline (the Google polyline algorithm, lat before lon), elevation is dropped"""
+        if len(self) == 0:
+            return ""
+        scaled = np.round(self._coordinates[:, [1, 0]] * 10**precision).astype(np.int64)
+        deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+        values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+        chunks = []
+        for value in values.tolist():
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        return "".join(chunks)
+
+    def to_list(self) -> list[list[float]]:
+        return self._coordinates.tolist()
+
+    def __len__(self) -> int:
+        return len(self._coordinates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Route(self._coordinates[index], dtype=self._coordinates.dtype)
+        return self._coordinates[index].tolist()
+
+    def __iter__(self):
+        return iter(self._coordinates.tolist())
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if dtype is None or dtype == self._coordinates.dtype:
+            # Without a copy the points are read only, as through coordinates
+            return self._coordinates.copy() if copy else self.coordinates
+        return self._coordinates.astype(dtype)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Route):
+            return NotImplemented
+        return np.array_equal(self._coordinates, other._coordinates)
+
+    def __repr__(self) -> str:
+        return f"Route(points={len(self)}, dtype={self.dtype})"
+
+    def __str__(self) -> str:
+        return str(self.to_list())
+
+    @classmethod
+    def __validate(cls, value) -> "Route":
+        if isinstance(value, Route):
+            return value
+        return cls(value)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls.__validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda route: route.to_list()),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler) -> JsonSchemaValue:
+        return handler(core_schema.list_schema(core_schema.list_schema(core_schema.float_schema())))
@@ -0,0 +1,173 @@
+import glob, hashlib, logging, os, sqlite3, time, zlib
+from threading import Lock
+
+import numpy as np
+
+from datastructures.GeocodingCache import DEFAULT_CACHE_DIRECTORY
+from datastructures.Route import Route
+
+
+COORDINATE_PRECISION = 5 # decimals of the leg ends in the key, ~1 m
+UNKNOWN_DATA_PERIOD = 7 * 24 * 3600 # seconds the legs are kept when the version of the routing data is unknown
+VERSION_CHECK_INTERVAL = 60.0 # seconds between two checks of the version of the routing data by a running cache
+
+logger = logging.getLogger(__name__)
+_unknown_version_logged = False # the fallback version is logged once per process, it is checked again while the cache runs
+
+
+class RouteCache:
+    """Persistent cache of the BRouter legs, addressed by the content of the request
+    Args:
+        path (str): path of the SQLite file, ":memory:" keeps the cache in memory only
+        version (str | None): version of the routing data, None to follow data_version(), checked again every VERSION_CHECK_INTERVAL
+        max_bytes (int): maximum size of the compressed legs, the least recently used are evicted above it
+
+    The key of a leg is the hash of the version, the profile, the alternativeidx and the leg ends rounded to COORDINATE_PRECISION decimals.
+    The points are stored as zlib compressed float64 [lon, lat, elv] triples.
+    Only the legs of the current version are served. The legs of other versions are not deleted, the file may be shared by
+    processes running on different routing data: the legs nobody reads anymore are the first evicted above max_bytes.
+
+    Examples:
+        ```python
+        cache = RouteCache.default()
+        leg = cache.get([46.06, 13.23], [45.65, 13.77], "trekking", 0)
+        if leg is None:
+            leg = fetch_leg(...)
+            cache.put([46.06, 13.23], [45.65, 13.77], "trekking", 0, leg)
+        ```
+    """
+    __default: "RouteCache | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, path: str, version: str | None = "", max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.__fixed_version = version
+        self.__version = version if version is not None else self.data_version()
+        self.__version_checked_at = time.monotonic()
+        self.__lock = Lock()
+        self.__stats = {"hits": 0, "misses": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """CREATE TABLE IF NOT EXISTS legs (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                points BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS legs_accessed_at ON legs (accessed_at)")
+        (self.__total_size,) = self.__connection.execute("SELECT COALESCE(SUM(size), 0) FROM legs").fetchone()
+
+    @classmethod
+    def default(cls) -> "RouteCache | None":
+        """Get the cache shared by the process, its file is BROUTER_CACHE_PATH or ~/.cache/cycling-trip-agency/brouter.sqlite
+        Returns None if BROUTER_CACHE_PATH is set to an empty string, i.e. the cache is disabled
+        """
+        path = os.environ.get("BROUTER_CACHE_PATH", os.path.join(DEFAULT_CACHE_DIRECTORY, "brouter.sqlite"))
+        if path == "":
+            return None
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(path, version=None)
+            return cls.__default
+
+    @staticmethod
+    def data_version() -> str:
+        """Get the version of the BRouter routing data
+        BROUTER_DATA_VERSION is used if set, otherwise the name, size and modification time of the .rd5 files in BROUTER_SEGMENTS_DIRECTORY.
+        Updating the segments changes the version, so the legs routed on the old data are not served anymore.
+        Without either of them the version is the current week, the legs are routed again every UNKNOWN_DATA_PERIOD.
+        """
+        version = os.environ.get("BROUTER_DATA_VERSION")
+        if version is not None:
+            return version
+
+        digest = hashlib.sha256()
+        directory = os.environ.get("BROUTER_SEGMENTS_DIRECTORY")
+        paths = sorted(glob.glob(os.path.join(directory, "*.rd5"))) if directory else []
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        if len(paths) == 0:
+            digest.update(f"period:{int(time.time() // UNKNOWN_DATA_PERIOD)};".encode())
+            global _unknown_version_logged
+            if not _unknown_version_logged:
+                _unknown_version_logged = True
+                logger.warning(
+                    "The version of the BRouter data is unknown, set BROUTER_DATA_VERSION or BROUTER_SEGMENTS_DIRECTORY: "
+                    "the cached legs are not invalidated when the data changes, they expire every %d days instead", UNKNOWN_DATA_PERIOD // (24 * 3600)
+                )
+        return digest.hexdigest()[:16]
+
+    @property
+    def version(self) -> str:
+        """The version of the routing data the legs are read and written with, a long running process follows its changes"""
+        if self.__fixed_version is None and time.monotonic() - self.__version_checked_at >= VERSION_CHECK_INTERVAL:
+            self.__version = self.data_version()
+            self.__version_checked_at = time.monotonic()
+        return self.__version
+
+    def key(self, start: list[float], end: list[float], profile: str, alternative: int, version: str | None = None) -> str:
+        """Get the key of a leg, start and end are [lat, lon, ...] as returned by Place.get_coordinates"""
+        ends = ",".join(f"{value:.{COORDINATE_PRECISION}f}" for value in (start[0], start[1], end[0], end[1]))
+        return hashlib.sha256(f"{version if version is not None else self.version}|{profile}|{alternative}|{ends}".encode()).hexdigest()
+
+    def get(self, start: list[float], end: list[float], profile: str, alternative: int) -> Route | None:
+        """Get the cached leg, None if it is not cached with the current version"""
+        version = self.version
+        key = self.key(start, end, profile, alternative, version)
+        with self.__lock:
+            row = self.__connection.execute("SELECT points FROM legs WHERE key = ? AND version = ?", (key, version)).fetchone()
+            if row is None:
+                self.__stats["misses"] += 1
+                return None
+            self.__connection.execute("UPDATE legs SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.__stats["hits"] += 1
+
+        return Route(np.frombuffer(zlib.decompress(row[0]), dtype=np.float64).reshape(-1, 3))
+
+    def put(self, start: list[float], end: list[float], profile: str, alternative: int, leg: Route) -> None:
+        """Store a leg, then evict the least recently used legs if the cache is larger than max_bytes"""
+        version = self.version
+        key = self.key(start, end, profile, alternative, version)
+        points = zlib.compress(np.ascontiguousarray(leg.coordinates, dtype=np.float64).tobytes())
+
+        with self.__lock:
+            previous = self.__connection.execute("SELECT size FROM legs WHERE key = ?", (key,)).fetchone()
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO legs (key, version, points, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, version, points, len(points), time.time()),
+            )
+            self.__total_size += len(points) - (previous[0] if previous is not None else 0)
+            if self.__total_size > self.max_bytes:
+                self.__evict()
+
+    def stats(self) -> dict:
+        """Get the counters of the cache: hits, misses, hit_rate and size in bytes"""
+        with self.__lock:
+            stats = dict(self.__stats, size=self.__total_size)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups > 0 else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__connection.execute("DELETE FROM legs")
+            self.__total_size = 0
+
+    def __evict(self) -> None:
+        """Drop the least recently used legs until the cache is back under 90% of max_bytes, so the eviction does not run at every put"""
+        target = self.max_bytes * 0.9
+        rows = self.__connection.execute("SELECT key, size FROM legs ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.__total_size <= target:
+                break
+            evicted.append((key,))
+            self.__total_size -= size
+        self.__connection.executemany("DELETE FROM legs WHERE key = ?", evicted)
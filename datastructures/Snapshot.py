@@ -0,0 +1,103 @@
+import json, struct, zlib
+
+import numpy as np
+
+from datastructures.Place import Place
+from datastructures.TripDescriptor import TripDescriptor
+from datastructures.UserDescriptor import UserDescriptor
+from datastructures.Recommendation import Recommendation
+from datastructures.dependencies import MyDeps
+
+
+MAGIC = b"CTAS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI") # magic, format version, length of the compressed JSON part
+ARRAY_ALIGNMENT = 8
+
+
+class Snapshot:
+    """Compact binary snapshot of the descriptors of a planning session
+
+    A snapshot is a fixed header, the zlib compressed JSON of the descriptor fields, then the raw bytes of the route arrays.
+    The JSON refers to a route by the index of its array, so the points are never converted to text.
+    Loading a snapshot makes no network call: the places keep their coordinates and the routes their points.
+
+    Examples:
+        ```python
+        data = Snapshot.dump_session(deps)
+        deps = Snapshot.load_session(data)
+
+        data = Snapshot.dumps(user=user)
+        user = Snapshot.loads(data)["user"]
+        ```
+    """
+
+    @classmethod
+    def dumps(cls, trip: TripDescriptor | None = None, user: UserDescriptor | None = None, recommendation: Recommendation | None = None) -> bytes:
+        """Get the snapshot of the given descriptors, the missing ones are stored as None"""
+        arrays: list[np.ndarray] = []
+        document = {
+            "trip": trip.to_snapshot(arrays) if trip is not None else None,
+            "user": user.model_dump(mode="json") if user is not None else None,
+            "recommendation": recommendation.model_dump(mode="json") if recommendation is not None else None,
+        }
+
+        offset = 0
+        layout = []
+        for array in arrays:
+            layout.append({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+            offset += -(-array.nbytes // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+        document["arrays"] = layout
+
+        header = zlib.compress(json.dumps(document, separators=(",", ":")).encode())
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(header)), header]
+        for array in arrays:
+            # The arrays are joined straight from their buffers, the snapshot is the only copy of the points
+            parts.append(memoryview(np.ascontiguousarray(array)).cast("B"))
+            parts.append(bytes(-array.nbytes % ARRAY_ALIGNMENT))
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data: bytes) -> dict:
+        """Get the descriptors of a snapshot, as a dict with the keys trip, user and recommendation (None if they were not stored)
+        The route arrays are read only views on data, no point is copied
+
+        Raises:
+            ValueError: if data is not a snapshot or was written by a newer format version
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("The data is too short to be a snapshot")
+        magic, version, header_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("The data is not a snapshot")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"The snapshot has format version {version}, only versions up to {FORMAT_VERSION} can be read")
+
+        document = json.loads(zlib.decompress(data[HEADER.size:HEADER.size + header_length]))
+        body_start = HEADER.size + header_length
+        arrays = [
+            np.frombuffer(data, dtype=np.dtype(layout["dtype"]), count=int(np.prod(layout["shape"])), offset=body_start + layout["offset"]).reshape(layout["shape"])
+            for layout in document["arrays"]
+        ]
+
+        with Place.deferred_resolution():
+            return {
+                "trip": TripDescriptor.from_snapshot(document["trip"], arrays) if document["trip"] is not None else None,
+                "user": UserDescriptor.model_validate(document["user"]) if document["user"] is not None else None,
+                "recommendation": Recommendation.model_validate(document["recommendation"]) if document["recommendation"] is not None else None,
+            }
+
+    @classmethod
+    def dump_session(cls, deps: MyDeps) -> bytes:
+        """Get the snapshot of the descriptors of a session, the channel to the user is not stored"""
+        return cls.dumps(deps.trip, deps.user, deps.recommendation)
+
+    @classmethod
+    def load_session(cls, data: bytes) -> MyDeps:
+        """Build the descriptors of a session from its snapshot, the descriptors that were not stored are empty"""
+        descriptors = cls.loads(data)
+        return MyDeps(
+            descriptors["trip"] or TripDescriptor(),
+            descriptors["user"] or UserDescriptor(),
+            descriptors["recommendation"] or Recommendation(),
+        )
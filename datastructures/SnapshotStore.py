@@ -0,0 +1,84 @@
+import os, sqlite3, time
+from threading import Lock
+
+from datastructures.GeocodingCache import DEFAULT_CACHE_DIRECTORY
+from datastructures.Snapshot import Snapshot
+from datastructures.UserDescriptor import UserDescriptor
+from datastructures.dependencies import MyDeps
+
+
+class SnapshotStore:
+    """Persistent store of the snapshots of the planning sessions and of the users, in a SQLite file
+    Args:
+        path (str): path of the SQLite file, ":memory:" keeps the store in memory only
+
+    A session is saved under the id chosen by the caller (e.g. the one of a WebSocket connection), a user under its user_id.
+
+    Examples:
+        ```python
+        store = SnapshotStore.default()
+        store.save_session("a1b2", deps)
+        deps = store.load_session("a1b2")
+
+        store.save_user("mario", user)
+        user = store.load_user("mario")
+        ```
+    """
+    __default: "SnapshotStore | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, path: str) -> None:
+        self.__lock = Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )"""
+        )
+
+    @classmethod
+    def default(cls) -> "SnapshotStore":
+        """Get the store shared by the process, its file is SNAPSHOT_STORE_PATH or ~/.cache/cycling-trip-agency/snapshots.sqlite"""
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(os.environ.get("SNAPSHOT_STORE_PATH", os.path.join(DEFAULT_CACHE_DIRECTORY, "snapshots.sqlite")))
+            return cls.__default
+
+    def save_session(self, session_id: str, deps: MyDeps) -> None:
+        self.__put("session", session_id, Snapshot.dump_session(deps))
+
+    def load_session(self, session_id: str) -> MyDeps | None:
+        """Get the descriptors of a saved session, None if the session was never saved"""
+        data = self.__get("session", session_id)
+        return Snapshot.load_session(data) if data is not None else None
+
+    def delete_session(self, session_id: str) -> None:
+        with self.__lock:
+            self.__connection.execute("DELETE FROM snapshots WHERE kind = 'session' AND key = ?", (session_id,))
+
+    def save_user(self, user_id: str, user: UserDescriptor) -> None:
+        self.__put("user", user_id, Snapshot.dumps(user=user))
+
+    def load_user(self, user_id: str) -> UserDescriptor | None:
+        """Get a saved user, None if the user was never saved"""
+        data = self.__get("user", user_id)
+        return Snapshot.loads(data)["user"] if data is not None else None
+
+    def __put(self, kind: str, key: str, data: bytes) -> None:
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO snapshots (kind, key, data, updated_at) VALUES (?, ?, ?, ?)",
+                (kind, key, data, time.time()),
+            )
+
+    def __get(self, kind: str, key: str) -> bytes | None:
+        with self.__lock:
+            row = self.__connection.execute("SELECT data FROM snapshots WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return bytes(row[0]) if row is not None else None
@@ -0,0 +1,159 @@
+import math
+
+import numpy as np
+
+
+class StepPlanner:
+    """Division of a route in daily steps, working on the cumulative distance and ascent of the route
+
+    The effort of a step is the largest fraction of the daily limits it uses, max(distance / max_distance, ascent / max_elevation).
+    Every cut is found with a binary search on the cumulative arrays, so a plan costs O(days * log n) once the arrays are known.
+
+    Examples:
+        ```python
+        profile = route.profile()
+        cut_points = StepPlanner.balanced_cut_points(profile.cumulative_distance, profile.cumulative_ascent, number_of_days=4, max_distance=80000, max_elevation=1200)
+        steps = [(first, last) for first, last in zip(cut_points[:-1], cut_points[1:])]
+        ```
+    """
+    BINARY_SEARCH_ITERATIONS = 50
+
+    @classmethod
+    def greedy_cut_points(cls, cumulative_distance: np.ndarray, cumulative_ascent: np.ndarray, max_distance: float, max_elevation: float) -> list[int]:
+        """Get the indexes where the route is cut, every step is filled up to the limits"""
+        last_index = len(cumulative_distance) - 1
+        cut_points = [0]
+        start = 0
+
+        while start < last_index:
+            end_by_distance = int(cumulative_distance.searchsorted(cumulative_distance[start] + max_distance, side="right")) - 1
+            end_by_elevation = int(cumulative_ascent.searchsorted(cumulative_ascent[start] + max_elevation, side="right")) - 1
+            # A single segment longer than the limits still has to be ridden
+            start = max(start + 1, min(end_by_distance, end_by_elevation))
+            cut_points.append(start)
+
+        return cut_points
+
+    @classmethod
+    def minimum_number_of_days(cls, cumulative_distance: np.ndarray, cumulative_ascent: np.ndarray, max_distance: float, max_elevation: float) -> int:
+        """Get the number of days needed to ride the route without exceeding the daily limits"""
+        return max(len(cls.greedy_cut_points(cumulative_distance, cumulative_ascent, max_distance, max_elevation)) - 1, 1)
+
+    @classmethod
+    def balanced_cut_points(cls, cumulative_distance: np.ndarray, cumulative_ascent: np.ndarray, number_of_days: int | None = None, max_distance: float = math.inf, max_elevation: float = math.inf) -> list[int] | None:
+        """Get the indexes where the route is cut so that the effort is balanced across the days
+        Args:
+            cumulative_distance (np.ndarray): distance in meter from the first point of the route
+            cumulative_ascent (np.ndarray): positive height difference in meter from the first point of the route
+            number_of_days (int | None): the number of steps to plan, if None the minimum number of days allowed by the limits
+            max_distance (float): maximum distance in meter per day, math.inf if there is no limit
+            max_elevation (float): maximum positive height difference in meter per day, math.inf if there is no limit
+
+        Returns:
+            - list[int]: the indexes of the first point of every step followed by the last point of the route
+            - None: if the route can not be ridden in number_of_days without exceeding the limits
+        """
+        last_index = len(cumulative_distance) - 1
+        if last_index < 1:
+            return [0]
+
+        if math.isinf(max_distance) and math.isinf(max_elevation):
+            # Without limits the distance is shared equally, a single day may hold the whole route
+            number_of_days = number_of_days or 1
+            max_distance = max(float(cumulative_distance[-1]) / number_of_days, 1.0)
+            high = float(number_of_days)
+        else:
+            high = 1.0
+
+        # The arrays are never rescaled, the limits scale the targets of the binary searches instead: a plan does not touch every point
+        limits = (cumulative_distance, cumulative_ascent, max_distance, max_elevation)
+
+        if number_of_days is None:
+            number_of_days = cls.minimum_number_of_days(cumulative_distance, cumulative_ascent, max_distance, max_elevation)
+        number_of_days = min(number_of_days, last_index)
+        if not cls.__fits(limits, high, number_of_days):
+            return None
+
+        # Smallest fraction of the limits that still fits the route in number_of_days, the greedy walk at that fraction minimizes the hardest day
+        low = 0.0
+        for _ in range(cls.BINARY_SEARCH_ITERATIONS):
+            middle = (low + high) / 2
+            if cls.__fits(limits, middle, number_of_days):
+                high = middle
+            else:
+                low = middle
+        cut_points = cls.greedy_cut_points(cumulative_distance, cumulative_ascent, high * max_distance, high * max_elevation)
+
+        # The greedy walk may end early, the hardest steps are halved until every day has its step
+        while len(cut_points) - 1 < number_of_days:
+            efforts = [cls.__effort(limits, first, last) if last - first > 1 else -1.0 for first, last in zip(cut_points[:-1], cut_points[1:])]
+            hardest = int(np.argmax(efforts))
+            if efforts[hardest] < 0:
+                break
+            first, last = cut_points[hardest], cut_points[hardest + 1]
+            cut_points.insert(hardest + 1, cls.__balanced_split(limits, first, last))
+
+        return cut_points
+
+    @classmethod
+    def rank_routes(cls, lengths: np.ndarray, ascents: np.ndarray, number_of_days: int | None = None, max_distance: float = math.inf, max_elevation: float = math.inf) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rank routes by how well they fit the daily limits, from their total length and ascent only
+        Args:
+            lengths (np.ndarray): length in meter of every route
+            ascents (np.ndarray): positive height difference in meter of every route
+            number_of_days (int | None): the days of the trip, if None every route is ridden in the days it needs
+            max_distance (float): maximum distance in meter per day, math.inf if there is no limit
+            max_elevation (float): maximum positive height difference in meter per day, math.inf if there is no limit
+
+        The total effort of a route, max(length / max_distance, ascent / max_elevation), is a lower bound of the days it needs:
+        the actual steps are cut at route points, so a route may need one more day than this estimate.
+
+        Returns:
+            - np.ndarray: indexes of the routes, best first: the ones that fit number_of_days, then the fewest days, then the lowest daily effort, then the shortest
+            - np.ndarray: days needed by every route
+            - np.ndarray: daily effort of every route, the fraction of the daily limits used on average, above 1 the route does not fit number_of_days
+        """
+        lengths = np.asarray(lengths, dtype=np.float64)
+        ascents = np.asarray(ascents, dtype=np.float64)
+
+        effort = np.maximum(lengths / max_distance, ascents / max_elevation)
+        days_needed = np.maximum(np.ceil(effort - 1e-9), 1).astype(np.int64)
+        daily_effort = effort / (number_of_days if number_of_days else days_needed)
+        order = np.lexsort((lengths, daily_effort, days_needed, daily_effort > 1.0))
+        return order, days_needed, daily_effort
+
+    @classmethod
+    def __fits(cls, limits: tuple, fraction: float, number_of_days: int) -> bool:
+        """Check if the greedy walk with the given fraction of the limits ends within number_of_days, the walk stops as soon as it exceeds them"""
+        cumulative_distance, cumulative_ascent, max_distance, max_elevation = limits
+        last_index = len(cumulative_distance) - 1
+        start = 0
+        for _ in range(number_of_days):
+            end_by_distance = int(cumulative_distance.searchsorted(cumulative_distance[start] + fraction * max_distance, side="right")) - 1
+            end_by_elevation = int(cumulative_ascent.searchsorted(cumulative_ascent[start] + fraction * max_elevation, side="right")) - 1
+            start = max(start + 1, min(end_by_distance, end_by_elevation))
+            if start >= last_index:
+                return True
+        return False
+
+    @classmethod
+    def __effort(cls, limits: tuple, first: int, last: int) -> float:
+        cumulative_distance, cumulative_ascent, max_distance, max_elevation = limits
+        return max(float(cumulative_distance[last] - cumulative_distance[first]) / max_distance, float(cumulative_ascent[last] - cumulative_ascent[first]) / max_elevation)
+
+    @classmethod
+    def __balanced_split(cls, limits: tuple, first: int, last: int) -> int:
+        """Get the cut between first and last (both excluded) that makes the two halves as even as possible"""
+        low, high = first + 1, last - 1
+        while low < high:
+            middle = (low + high) // 2
+            if cls.__effort(limits, first, middle) < cls.__effort(limits, middle, last):
+                low = middle + 1
+            else:
+                high = middle
+        if low - 1 > first:
+            worse_after = max(cls.__effort(limits, first, low), cls.__effort(limits, low, last))
+            worse_before = max(cls.__effort(limits, first, low - 1), cls.__effort(limits, low - 1, last))
+            if worse_before < worse_after:
+                return low - 1
+        return low
@@ -0,0 +1,204 @@
+import atexit, functools, inspect, json, os, time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Callable, Iterator
+
+
+# Upper bounds of the histogram buckets, chosen by the suffix of the metric name
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = tuple(float(2**exponent) for exponent in range(10, 28, 2)) # 1 KiB to 64 MiB
+COUNT_BUCKETS = (10.0, 100.0, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+
+def _buckets(metric: str) -> tuple[float, ...]:
+    if metric.endswith("_seconds"):
+        return SECONDS_BUCKETS
+    if metric.endswith("_bytes"):
+        return BYTES_BUCKETS
+    return COUNT_BUCKETS
+
+
+class Telemetry:
+    """Spans and metrics of the tools, of the outbound requests and of the caches
+    Args:
+        export_path (str | None): local file the telemetry is written to, None to keep it in memory only.
+            A path ending in .prom gets the metrics in the Prometheus text format, rewritten by export().
+            Any other path gets one JSON line per finished span, and one with all the metrics on every export().
+
+    After send_to_logfire() the spans are also sent to logfire, so they show up next to the agent runs.
+    Before it logfire is not imported, it takes longer to load than the rest of the datastructures.
+    The metrics are counters and histograms identified by a name and labels:
+        - tool_duration_seconds {tool, outcome}: the run of every tool of the agent
+        - http_request_duration_seconds {host, method, status}: every attempt of an outbound request
+        - http_response_bytes {host}: the body size of every response
+        - http_retries_total {host}: the attempts that were retried
+        - cache_requests_total {cache, result}: the lookups of the geocoding, route and poi caches, result is hit or miss
+        - route_points {stage}: the points of every leg fetched and of every candidate route, full and simplified
+        - route_alternatives_dropped_total {profile, error}: the alternative routes dropped because one of their legs failed
+
+    Examples:
+        ```python
+        telemetry = Telemetry.default()
+        with telemetry.span("brouter.leg", profile="gravel") as attributes:
+            ...
+            attributes["points"] = len(leg)
+        telemetry.increment("cache_requests_total", cache="geocoding", result="hit")
+        telemetry.observe("route_points", len(route), stage="candidate")
+        print(telemetry.prometheus_text())
+        ```
+    """
+    __default: "Telemetry | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, export_path: str | None = None) -> None:
+        self.export_path = export_path
+        self.__counters: dict[tuple[str, tuple], float] = {}
+        self.__histograms: dict[tuple[str, tuple], dict] = {}
+        self.__lock = Lock()
+        self.__file_lock = Lock()
+        self.__logfire = None
+        if export_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(export_path)), exist_ok=True)
+
+    @classmethod
+    def default(cls) -> "Telemetry":
+        """Get the telemetry shared by the process, exported to TELEMETRY_EXPORT_PATH if set, also when the process exits"""
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls(os.environ.get("TELEMETRY_EXPORT_PATH") or None)
+                if cls.__default.export_path is not None:
+                    atexit.register(cls.__default.export)
+            return cls.__default
+
+    def send_to_logfire(self) -> None:
+        """Send the next spans to logfire too, it should be configured by the caller"""
+        import logfire
+
+        self.__logfire = logfire
+
+    @classmethod
+    def tool(cls, function: Callable) -> Callable:
+        """Decorate a tool of the agent so every run is a span and is counted in tool_duration_seconds
+        The signature and the docstring are kept, the agent sees the same tool
+        """
+        name = function.__name__
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def run_async(*args, **kwargs):
+                with cls.default().span(f"tool.{name}", tool=name) as attributes:
+                    result = await function(*args, **kwargs)
+                    attributes["response_characters"] = len(result) if isinstance(result, str) else 0
+                    return result
+            return run_async
+
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            with cls.default().span(f"tool.{name}", tool=name) as attributes:
+                result = function(*args, **kwargs)
+                attributes["response_characters"] = len(result) if isinstance(result, str) else 0
+                return result
+        return run
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """Time a block of code, the attributes yielded can be completed inside the block
+        A span named tool.* is counted in tool_duration_seconds, with outcome exception if the block raised
+        """
+        start = time.perf_counter()
+        started_at = time.time()
+        outcome = "ok"
+        with self.__logfire.span(name, **attributes) if self.__logfire is not None else nullcontext() as span:
+            try:
+                yield attributes
+            except BaseException as e:
+                outcome = "exception"
+                attributes["exception"] = type(e).__name__
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                if span is not None:
+                    for key, value in attributes.items():
+                        span.set_attribute(key, value)
+                if name.startswith("tool."):
+                    self.observe("tool_duration_seconds", duration, tool=name[len("tool."):], outcome=outcome)
+                self.__write_line({"type": "span", "name": name, "start": started_at, "duration": duration, "outcome": outcome, "attributes": attributes})
+
+    def increment(self, metric: str, amount: float = 1.0, **labels) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0.0) + amount
+
+    def observe(self, metric: str, value: float, **labels) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                bounds = _buckets(metric)
+                histogram = self.__histograms[key] = {"bounds": bounds, "counts": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0}
+            histogram["counts"][bisect_left(histogram["bounds"], value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def metrics(self) -> dict:
+        """Get the counters and the histograms, each one as a list of {labels, value} or {labels, buckets, sum, count}
+        The buckets are cumulative, as in Prometheus: the count of the values up to every bound, the last bound is "+Inf"
+        """
+        with self.__lock:
+            counters = dict(self.__counters)
+            histograms = {key: dict(histogram, counts=list(histogram["counts"])) for key, histogram in self.__histograms.items()}
+
+        result = {"counters": {}, "histograms": {}}
+        for (metric, labels), value in sorted(counters.items(), key=lambda item: repr(item[0])):
+            result["counters"].setdefault(metric, []).append({"labels": dict(labels), "value": value})
+        for (metric, labels), histogram in sorted(histograms.items(), key=lambda item: repr(item[0])):
+            cumulative, buckets = 0, []
+            for bound, count in zip((*histogram["bounds"], "+Inf"), histogram["counts"]):
+                cumulative += count
+                buckets.append([bound, cumulative])
+            result["histograms"].setdefault(metric, []).append({"labels": dict(labels), "buckets": buckets, "sum": histogram["sum"], "count": histogram["count"]})
+        return result
+
+    def prometheus_text(self) -> str:
+        """Get the metrics in the Prometheus text exposition format"""
+        def format_labels(labels: dict, **extra) -> str:
+            labels = {**labels, **extra}
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels.items()) + "}"
+
+        metrics = self.metrics()
+        lines = []
+        for metric, series in metrics["counters"].items():
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{format_labels(s['labels'])} {s['value']!r}" for s in series)
+        for metric, series in metrics["histograms"].items():
+            lines.append(f"# TYPE {metric} histogram")
+            for s in series:
+                for bound, count in s["buckets"]:
+                    lines.append(f"{metric}_bucket{format_labels(s['labels'], le=bound if isinstance(bound, str) else f'{bound:g}')} {count}")
+                lines.append(f"{metric}_sum{format_labels(s['labels'])} {s['sum']!r}")
+                lines.append(f"{metric}_count{format_labels(s['labels'])} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """Write the metrics to export_path, nothing is done if it is not set"""
+        if self.export_path is None:
+            return
+        if self.export_path.endswith(".prom"):
+            # Written aside and renamed, a scraper never reads a half written file
+            temporary = f"{self.export_path}.tmp"
+            with open(temporary, "w") as file:
+                file.write(self.prometheus_text())
+            os.replace(temporary, self.export_path)
+        else:
+            self.__write_line({"type": "metrics", "time": time.time(), **self.metrics()})
+
+    def __write_line(self, record: dict) -> None:
+        if self.export_path is None or self.export_path.endswith(".prom"):
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self.__file_lock:
+            with open(self.export_path, "a") as file:
+                file.write(line)
@@ -0,0 +1,288 @@
+import random, time
+from collections import deque
+from threading import Lock
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from datastructures.Telemetry import Telemetry
+
+
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+LATENCY_SAMPLES = 1024 # latencies kept per host for the percentiles
+
+
+class HostPolicy(NamedTuple):
+    """How the requests to a host are made
+    Attributes:
+        timeout (tuple[float, float]): connect and read timeouts, in seconds
+        rate (float | None): maximum requests per second, None for no limit
+        burst (int): requests that can be made at once before the rate applies
+        max_retries (int): retries after a connection error or a 429, 502, 503, 504 status
+        backoff (float): base of the exponential backoff between retries, in seconds
+        max_backoff (float): maximum wait between two retries, in seconds
+        pool_size (int): keep-alive connections kept open to the host
+        failure_threshold (int): consecutive failures that open the circuit, the requests then fail at once
+        cooldown (float): seconds the circuit stays open before a trial request is let through
+    """
+    timeout: tuple[float, float] = (3.05, 30.0)
+    rate: float | None = None
+    burst: int = 1
+    max_retries: int = 2
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    pool_size: int = 10
+    failure_threshold: int = 5
+    cooldown: float = 30.0
+
+
+# Nominatim usage policy: at most 1 request per second. Overpass answers 429 and 504 when busy, it is worth waiting longer
+HOST_POLICIES = {
+    "nominatim.openstreetmap.org": HostPolicy(timeout=(3.05, 10.0), rate=1.0, burst=1),
+    "overpass-api.de": HostPolicy(timeout=(3.05, 120.0), max_retries=3, backoff=2.0),
+}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without contacting the host, after too many consecutive failures"""
+
+
+class TokenBucket:
+    """Rate limiter, a request takes a token and the tokens are refilled at a constant rate
+    Args:
+        rate (float): tokens added per second
+        burst (int): maximum number of tokens
+    """
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__updated_at = time.monotonic()
+        self.__lock = Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed
+        Returns:
+            float: the seconds waited
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated_at) * self.rate)
+            self.__updated_at = now
+            # The token is reserved before waiting, so the concurrent callers queue up in order
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """Stop calling a host that keeps failing
+    Args:
+        failure_threshold (int): consecutive failures that open the circuit
+        cooldown (float): seconds after which, with the circuit open, a single trial request is let through
+    """
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.__failures = 0
+        self.__opened_at: float | None = None
+        self.__trial_running = False
+        self.__lock = Lock()
+
+    @property
+    def state(self) -> str:
+        """Either closed, open or half-open"""
+        with self.__lock:
+            if self.__opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.__opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        """Check if a request can be made"""
+        with self.__lock:
+            if self.__opened_at is None:
+                return True
+            if time.monotonic() - self.__opened_at < self.cooldown or self.__trial_running:
+                return False
+            self.__trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial_running = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            self.__trial_running = False
+            if self.__failures >= self.failure_threshold or self.__opened_at is not None:
+                self.__opened_at = time.monotonic()
+
+
+class Transport:
+    """HTTP client shared by the whole program, one keep-alive pool, rate limiter and circuit breaker per host
+    Args:
+        policies (dict[str, HostPolicy] | None): policy of each host, by default HOST_POLICIES, the other hosts get HostPolicy()
+
+    Every request gets the timeouts of its host unless given explicitly, and is retried with a jittered exponential backoff
+    after a connection error or a 429, 502, 503, 504 status. Other statuses are returned to the caller as they are.
+
+    Examples:
+        ```python
+        transport = Transport.default()
+        response = transport.get("https://nominatim.openstreetmap.org/search", params={"q": "Udine", "format": "json"})
+        transport.stats()["nominatim.openstreetmap.org"]["p50_latency"]
+        ```
+    """
+    __default: "Transport | None" = None
+    __default_lock = Lock()
+
+    def __init__(self, policies: dict[str, HostPolicy] | None = None) -> None:
+        self.__policies = dict(HOST_POLICIES if policies is None else policies)
+        self.__hosts: dict[str, dict] = {}
+        self.__lock = Lock()
+
+    @classmethod
+    def default(cls) -> "Transport":
+        """Get the transport shared by the process"""
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    def configure(self, host: str, policy: HostPolicy) -> None:
+        """Set the policy of a host (e.g. "localhost:17777"), the pool of the host is rebuilt"""
+        with self.__lock:
+            self.__policies[host] = policy
+            self.__hosts.pop(host, None)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Make a request following the policy of the host, the arguments are the ones of requests.Session.request
+        Raises:
+            CircuitOpenError: if the host failed too many times in a row
+            requests.RequestException: if the request still fails after the retries
+        """
+        host = urlparse(url).netloc
+        state = self.__host(host)
+        policy: HostPolicy = state["policy"]
+        kwargs.setdefault("timeout", policy.timeout)
+
+        telemetry = Telemetry.default()
+        with telemetry.span("http.request", host=host, method=method) as attributes:
+            for attempt in range(policy.max_retries + 1):
+                attributes["attempts"] = attempt + 1
+                if not state["breaker"].allow():
+                    self.__count(state, "rejected")
+                    attributes["status"] = "circuit_open"
+                    raise CircuitOpenError(f"Too many consecutive failures from {host}, the requests are suspended for {policy.cooldown} seconds")
+                if state["bucket"] is not None:
+                    state["bucket"].acquire()
+
+                retry_after = None
+                start = time.perf_counter()
+                try:
+                    response = state["session"].request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    telemetry.observe("http_request_duration_seconds", time.perf_counter() - start, host=host, method=method, status=type(e).__name__)
+                    state["breaker"].record_failure()
+                    self.__count(state, "errors")
+                    if attempt == policy.max_retries:
+                        attributes["status"] = type(e).__name__
+                        raise
+                else:
+                    latency = time.perf_counter() - start
+                    received = self.__record(state, latency, response, kwargs.get("stream", False))
+                    telemetry.observe("http_request_duration_seconds", latency, host=host, method=method, status=str(response.status_code))
+                    telemetry.observe("http_response_bytes", received, host=host)
+                    attributes["status"] = response.status_code
+                    attributes["response_bytes"] = received
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        state["breaker"].record_success()
+                        return response
+                    state["breaker"].record_failure()
+                    if attempt == policy.max_retries:
+                        return response
+                    retry_after = response.headers.get("Retry-After")
+                    response.close()
+
+                self.__count(state, "retries")
+                telemetry.increment("http_retries_total", host=host)
+                time.sleep(self.__backoff(policy, attempt, retry_after))
+
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, dict]:
+        """Get the counters of every host: requests, errors, retries, rejected, bytes_sent, bytes_received, p50_latency, p99_latency (seconds) and circuit"""
+        with self.__lock:
+            hosts = dict(self.__hosts)
+
+        stats = {}
+        for host, state in hosts.items():
+            with state["lock"]:
+                counters = dict(state["counters"])
+                latencies = sorted(state["latencies"])
+            counters["p50_latency"] = latencies[len(latencies) // 2] if latencies else 0.0
+            counters["p99_latency"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+            counters["circuit"] = state["breaker"].state
+            stats[host] = counters
+        return stats
+
+    def __host(self, host: str) -> dict:
+        with self.__lock:
+            state = self.__hosts.get(host)
+            if state is None:
+                policy = self.__policies.get(host, HostPolicy())
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                state = {
+                    "policy": policy,
+                    "session": session,
+                    "bucket": TokenBucket(policy.rate, policy.burst) if policy.rate is not None else None,
+                    "breaker": CircuitBreaker(policy.failure_threshold, policy.cooldown),
+                    "lock": Lock(),
+                    "latencies": deque(maxlen=LATENCY_SAMPLES),
+                    "counters": {"requests": 0, "errors": 0, "retries": 0, "rejected": 0, "bytes_sent": 0, "bytes_received": 0},
+                }
+                self.__hosts[host] = state
+            return state
+
+    def __record(self, state: dict, latency: float, response: requests.Response, streamed: bool) -> int:
+        """Count a response and get the bytes received, a streamed body is not read yet so it is counted from its Content-Length"""
+        body = response.request.body
+        if isinstance(body, str):
+            body = body.encode()
+        received = int(response.headers.get("Content-Length", 0)) if streamed else len(response.content)
+        with state["lock"]:
+            state["counters"]["requests"] += 1
+            state["counters"]["bytes_sent"] += len(body) if body is not None else 0
+            state["counters"]["bytes_received"] += received
+            state["latencies"].append(latency)
+        return received
+
+    def __count(self, state: dict, counter: str) -> None:
+        with state["lock"]:
+            state["counters"][counter] += 1
+
+    @staticmethod
+    def __backoff(policy: HostPolicy, attempt: int, retry_after: str | None) -> float:
+        """Seconds to wait before the next attempt, the Retry-After of the host if given, otherwise a full jitter exponential backoff"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), policy.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0.0, min(policy.max_backoff, policy.backoff * 2**attempt))
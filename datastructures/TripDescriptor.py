@@ -1,8 +1,34 @@
+import logging
 import math
-from pydantic import BaseModel
+import os
+import numpy as np
+import requests
+from pydantic import BaseModel, PrivateAttr
 from datetime import date, timedelta
 from datastructures.Place import Place
-from datastructures.DistanceCalculation import DistanceCalculation
+from datastructures.GeocodingCache import GeocodingCache
+from datastructures.Route import Route
+from datastructures.ElevationModel import ElevationModel
+from datastructures.RouteCache import RouteCache
+from datastructures.DistanceCalculation import DistanceCalculation, RouteProfile
+from datastructures.StepPlanner import StepPlanner
+from datastructures.Transport import Transport
+from datastructures.Telemetry import Telemetry
+from concurrent.futures import ThreadPoolExecutor
+
+
+BROUTER_URL = os.environ.get("BROUTER_URL", "http://localhost:17777/brouter")
+BROUTER_TIMEOUT = (3.05, 60) # connect and read timeouts, in seconds
+BROUTER_CHUNK_SIZE = 64 * 1024 # bytes of the response parsed at a time
+NUMBER_OF_ALTERNATIVES = 4
+BIKE_PROFILES = {"road": "fastbike", "gravel": "gravel", "mtb": "mtb"} # BRouter profile of every bike_type
+SHORTLIST_SIZE = 4 # candidate routes kept when every bike type is planned
+MAX_PARALLEL_BROUTER_REQUESTS = 8
+SIMPLIFICATION_TOLERANCE = 2.0 # meters, see benchmarks/route_simplification.py for the error it introduces
+SUMMARY_POLYLINE_TOLERANCE = 250.0 # meters, resolution of the polylines in the route summaries
+PLACE_MATCHING_DISTANCE = 2000.0 # meters, a route point this close to a trip place is named after it
+
+logger = logging.getLogger(__name__)
 
 
 class TripDescriptor(BaseModel):
@@ -12,9 +38,11 @@ class TripDescriptor(BaseModel):
         places (list[Place] | None): list of places, the first is the starting point, the last is the ending point
         number_of_days (int | None): the number of days the trip will last
         dates (list[date] | None): starting and ending date of the trip
-        candidate_routes (list[list[list[float]]] | None): list of candidate raw routes, each route is a list of geopoints, each geopoint is a list of 3 coordinates (lat, lon, elv)
+        candidate_routes (list[Route] | None): list of candidate routes, simplified after the routing, each route is a buffer of geopoints, each geopoint has 3 coordinates (lon, lat, elv)
+        candidate_bike_types (list[str] | None): bike type of every candidate route, only when every bike type was planned
+        candidate_days_needed (list[int] | None): estimated days every candidate route needs within the daily limits, only when every bike type was planned
         selected_route (int | None): index of the selected raw route
-        stepped_route (list[list[list[float]]] | None): division of the trip as segments, list of geographical positions
+        stepped_route (list[tuple[int, int]] | None): division of the selected route in steps, each step is the (first, last) index of its points in the selected route
         length (float | None): length of the route in meters
 
     Examples:
@@ -35,12 +63,18 @@ class TripDescriptor(BaseModel):
     places: list[Place] | None = None
     number_of_days: int | None = None
     dates: list[date] | None = None
-    candidate_routes: list[list[list[float]]] | None = None
+    candidate_routes: list[Route] | None = None
+    candidate_bike_types: list[str] | None = None
+    candidate_days_needed: list[int] | None = None
     selected_route: int | None = None
-    stepped_route: list[list[list[float]]] | None = None 
+    stepped_route: list[tuple[int, int]] | None = None
     length: float | None = None
     positive_height_difference: float | None = None
-    
+    _full_resolution_routes: list[Route] | None = PrivateAttr(default=None)
+    _description: str | None = PrivateAttr(default=None)
+    _legs: dict[tuple, tuple[Route, Route]] = PrivateAttr(default_factory=dict) # legs of the last planning, reused when the places change
+    _selected_profile: tuple[Route, RouteProfile] | None = PrivateAttr(default=None) # cumulative arrays of the selected route, computed once
+
     def get_bike_type(self) -> str | None:
         return self.bike_type
     
@@ -53,14 +87,53 @@ class TripDescriptor(BaseModel):
     def get_dates(self) -> list[date] | None:
         return self.dates
     
-    def get_candidate_routes(self) -> list[list[list[float]]] | None:
+    def get_candidate_routes(self) -> list[Route] | None:
         return self.candidate_routes
     
     def get_selected_route(self) -> int | None:
         return self.selected_route
 
-    def get_stepped_route(self) -> list[list[list[float]]] | None:
-        return self.stepped_route
+    def get_full_resolution_route(self, index: int) -> Route | None:
+        """Get the index-th candidate route with every point returned by BRouter, None if it is not available (e.g. the trip was loaded from a dump)"""
+        if self._full_resolution_routes is None or not 0 <= index < len(self._full_resolution_routes):
+            return None
+        return self._full_resolution_routes[index]
+
+    def to_snapshot(self, arrays: list[np.ndarray]) -> dict:
+        """Get the fields of the trip as JSON values, the routes are appended to arrays and replaced by their index (see Snapshot)"""
+        def store(routes: list[Route] | None) -> list[int] | None:
+            if routes is None:
+                return None
+            indexes = []
+            for route in routes:
+                indexes.append(len(arrays))
+                arrays.append(route.coordinates)
+            return indexes
+
+        fields = self.model_dump(mode="json", exclude={"candidate_routes"})
+        fields["candidate_routes"] = store(self.candidate_routes)
+        fields["full_resolution_routes"] = store(self._full_resolution_routes)
+        return fields
+
+    @classmethod
+    def from_snapshot(cls, fields: dict, arrays: list[np.ndarray]) -> "TripDescriptor":
+        """Build the trip saved by to_snapshot, the places are not geocoded and the routes are not planned again"""
+        fields = dict(fields)
+        full_resolution_routes = fields.pop("full_resolution_routes", None)
+        if fields.get("candidate_routes") is not None:
+            fields["candidate_routes"] = [Route(arrays[i], dtype=arrays[i].dtype) for i in fields["candidate_routes"]]
+        with Place.deferred_resolution():
+            trip = cls.model_validate(fields)
+        if full_resolution_routes is not None:
+            trip._full_resolution_routes = [Route(arrays[i], dtype=arrays[i].dtype) for i in full_resolution_routes]
+        return trip
+
+    def get_stepped_route(self) -> list[Route] | None:
+        """Get the steps of the selected route, each step is a view on the points of the selected route"""
+        if self.stepped_route is None or self.candidate_routes is None or self.selected_route is None:
+            return None
+        choosen_raw_route = self.candidate_routes[self.selected_route]
+        return [choosen_raw_route.view(first, last + 1) for first, last in self.stepped_route]
     
     def get_length(self) -> float | None:
         return self.length
@@ -79,12 +152,18 @@ class TripDescriptor(BaseModel):
     - the length in days of the trip
 - dates: list[date] | None = None
     - the starting and ending date of the trip
-- candidate_routes: list[list[list[float]]] | None = None
+- candidate_routes: list[Route] | None = None
     - possible routes (based on places) to choose from
+- candidate_bike_types: list[str] | None = None
+    - the bike type of every candidate route, when the routes of every bike type were compared
+    - set automatically, selecting a route sets its bike_type
+- candidate_days_needed: list[int] | None = None
+    - the estimated days every candidate route needs within the daily limits of the user, when the routes of every bike type were compared
+    - set automatically
 - selected_route: int | None = None
     - the index of the route choosen (among candidate_routes)
-- stepped_route: list[list[list[float]]] | None = None
-    - the final route divided in step
+- stepped_route: list[tuple[int, int]] | None = None
+    - the final route divided in step, as (first, last) point indexes in the selected route
 - length: float | None = None
     - the length of the trip
     - set automatically
@@ -93,8 +172,47 @@ class TripDescriptor(BaseModel):
     - set automatically
 """
 
+    def __nearest_place_name(self, point: list[float]) -> str:
+        """Get the name of the trip place closest to the point if it is within PLACE_MATCHING_DISTANCE meters, the coordinates otherwise"""
+        for place in self.places or []:
+            if place.is_resolved() and DistanceCalculation.fcc_distance([place.lon, place.lat], point) <= PLACE_MATCHING_DISTANCE: # pyright: ignore[reportArgumentType]
+                return place.get_name()
+        return f"({point[1]:.4f}, {point[0]:.4f})"
+
+    def __route_summary(self, route: Route, include_polyline: bool) -> str:
+        """Get a short description of a route: length, ascent, bounding box, start and end, and optionally a coarse encoded polyline"""
+        if len(route) == 0:
+            return "empty"
+        profile = route.profile()
+        south, west, north, east = route.bounding_box() # pyright: ignore[reportGeneralTypeIssues]
+        summary = f"{profile.cumulative_distance[-1] / 1000:.1f} km, {profile.cumulative_ascent[-1]:.0f} m of positive height difference, from {self.__nearest_place_name(route[0])} to {self.__nearest_place_name(route[-1])}, bounding box (south, west, north, east): ({south:.4f}, {west:.4f}, {north:.4f}, {east:.4f})"
+        if include_polyline:
+            summary += f", encoded polyline: {route.simplify(SUMMARY_POLYLINE_TOLERANCE).encoded_polyline()}"
+        return summary
+
+    def get_candidate_routes_summary(self, include_polyline: bool = False) -> str | None:
+        """Get a short description of every candidate route, instead of their points"""
+        if self.candidate_routes is None:
+            return None
+        if self.candidate_bike_types is None or self.candidate_days_needed is None:
+            return "".join(f"Route {i}: {self.__route_summary(route, include_polyline)}\n" for i, route in enumerate(self.candidate_routes))
+        return "".join(
+            f"Route {i} ({bike_type} bike, at least {days} days within the daily limits): {self.__route_summary(route, include_polyline)}\n"
+            for i, (route, bike_type, days) in enumerate(zip(self.candidate_routes, self.candidate_bike_types, self.candidate_days_needed))
+        )
+
+    def get_stepped_route_summary(self, include_polyline: bool = False) -> str | None:
+        """Get a short description of every step of the selected route, instead of their points"""
+        steps = self.get_stepped_route()
+        if steps is None:
+            return None
+        return "".join(f"Step {i + 1}: {self.__route_summary(step, include_polyline)}\n" for i, step in enumerate(steps))
+
     def get_description(self) -> str:
-        """Get a description of the trip"""
+        """Get a description of the trip, it is rebuilt only after the trip changes"""
+        if self._description is not None:
+            return self._description
+
         description = ""
         
         if self.bike_type:
@@ -118,7 +236,8 @@ class TripDescriptor(BaseModel):
 
         if description == "":
             description += "No trip information available."
-        
+
+        self._description = description
         return description
     
     def __set_bike_type(self, bike_type: str) -> None | str:
@@ -127,7 +246,11 @@ class TripDescriptor(BaseModel):
 
     def __set_places(self, places: list[str]) -> None | str:  
         if not len(places) > 1: return f"Error in TripDescriptor.__set_places()\nThe given places must contain at least 2 elements, the starting and ending point of the trip\n{len(places)} were provided"
-        self.places = [Place(name=plc) for plc in places]
+        # The places already resolved are kept as they are, only the new names are geocoded
+        previous = {GeocodingCache.normalize(place.get_users_name()): place for place in self.places or [] if place.is_resolved()}
+        with Place.deferred_resolution():
+            self.places = [previous.get(GeocodingCache.normalize(plc)) or Place(name=plc) for plc in places]
+        Place.resolve_all(self.places)
 
         not_found = ""
         for place in self.places:
@@ -148,6 +271,17 @@ class TripDescriptor(BaseModel):
         if self.candidate_routes is None: return f"Error in RouteDescriptor.__set_selected_route()\nBefore selecting one of the candidate routes they must be created, please fill the route descriptor with places first\n"
         if not 0 <= selected_route < len(self.candidate_routes): return f"Error in RouteDescriptor.__set_selected_route()\nThe given selected_route must be between 0 and {len(self.candidate_routes)}\n{selected_route} was provided"
         self.selected_route = selected_route
+        if self.candidate_bike_types is not None:
+            self.bike_type = self.candidate_bike_types[selected_route]
+        # The steps are planned again every time the daily limits change, they only need the cumulative arrays
+        self.__selected_profile()
+
+    def __selected_profile(self) -> RouteProfile:
+        """Get the cumulative distance and ascent of the selected route, computed once per selected route"""
+        route = self.candidate_routes[self.selected_route] # pyright: ignore[reportOptionalSubscript, reportCallIssue, reportArgumentType]
+        if self._selected_profile is None or self._selected_profile[0] is not route:
+            self._selected_profile = (route, route.profile())
+        return self._selected_profile[1]
 
     def fill(self, bike_type: None | str = None, places: None | list[str] = None, number_of_days: None | int = None, dates: None | list[str] = None, selected_route: None | int = None) -> None | str:
         """Fill the TripDescriptor with the given info
@@ -174,6 +308,8 @@ class TripDescriptor(BaseModel):
             trip.fill(dates = ["2023-10-1", "2023-10-5"])
             ```
         """
+        self._description = None
+
         if bike_type is not None:
             ret = self.__set_bike_type(bike_type) # pyright: ignore[reportArgumentType]
             if ret is not None:
@@ -210,40 +346,160 @@ class TripDescriptor(BaseModel):
             if (self.dates[1] - self.dates[0]).days + 1 != self.number_of_days:
                 self.dates[1] = self.dates[0] + timedelta(days=self.number_of_days - 1)
 
-    def __plan_route(self, idx: int) -> list[list[float]]:
-        """Get a route that goes through the places provided"""
-        import requests
+    def __fetch_leg(self, start: list[float], end: list[float], bike_profile: str, idx: int) -> Route:
+        """Get the idx-th alternative route between two places, from the cache if possible
+        The points without elevation get it from the local SRTM tiles if available
+        """
+        telemetry = Telemetry.default()
+        with telemetry.span("brouter.leg", profile=bike_profile, alternative=idx) as attributes:
+            cache = RouteCache.default()
+            leg = cache.get(start, end, bike_profile, idx) if cache is not None else None
+            if cache is not None:
+                telemetry.increment("cache_requests_total", cache="route", result="hit" if leg is not None else "miss")
+            attributes["cached"] = leg is not None
+            if leg is None:
+                lonlats_string = f"{start[1]},{start[0]}|{end[1]},{end[0]}"
+                url = f"{BROUTER_URL}?lonlats={lonlats_string}&profile={bike_profile}&alternativeidx={idx}&format=geojson"
+                # The body is streamed, only the coordinates are parsed and the properties of the route are skipped
+                with Transport.default().get(url, timeout=BROUTER_TIMEOUT, stream=True) as response:
+                    response.raise_for_status()
+                    leg = Route.from_geojson(response.iter_content(chunk_size=BROUTER_CHUNK_SIZE))
+                if cache is not None:
+                    cache.put(start, end, bike_profile, idx, leg)
+
+            elevation_model = ElevationModel.default()
+            if elevation_model is not None:
+                leg = elevation_model.enrich(leg)
+            attributes["points"] = len(leg)
+            telemetry.observe("route_points", len(leg), stage="leg")
+        return leg
 
-        bike_profile = self.bike_type
-        if self.bike_type == "road":
-            bike_profile = "fastbike"
-        
+    def __fetch_and_simplify_leg(self, start: list[float], end: list[float], bike_profile: str, idx: int, simplification_tolerance: float) -> tuple[Route, Route]:
+        """Get the full resolution and the simplified idx-th alternative route between two places"""
+        leg = self.__fetch_leg(start, end, bike_profile, idx)
+        return leg, leg.simplify(simplification_tolerance) if simplification_tolerance > 0 else leg
+
+    def __plan_routes(self, bike_profiles: list[str], simplification_tolerance: float) -> list[tuple[str, Route, Route]]:
+        """Get the BRouter profile, the full resolution and the simplified alternative routes that go through the places provided, for every profile
+        Every leg of every alternative of every profile is requested and simplified concurrently, an alternative is dropped if any of its legs fails
+        """
         locations_coordinates = [place.get_coordinates() for place in self.places] # pyright: ignore[reportOptionalIterable]
-        route = []
-        for i in range(1, len(locations_coordinates)):
-            lonlats_string = f"{locations_coordinates[i-1][1]},{locations_coordinates[i-1][0]}|{locations_coordinates[i][1]},{locations_coordinates[i][0]}"
-            url = f"http://localhost:17777/brouter?lonlats={lonlats_string}&profile={bike_profile}&alternativeidx={idx}&format=geojson"
-            response = requests.get(url)
-            response.raise_for_status()
+        number_of_legs = len(locations_coordinates) - 1
+        keys = {
+            (bike_profile, idx, i): self.__leg_key(locations_coordinates[i], locations_coordinates[i + 1], bike_profile, idx, simplification_tolerance)
+            for bike_profile in bike_profiles
+            for idx in range(NUMBER_OF_ALTERNATIVES)
+            for i in range(number_of_legs)
+        }
+        # The legs between places that did not change since the last planning are reused, only the others are requested
+        reused = {leg: self._legs[key] for leg, key in keys.items() if key in self._legs}
+        missing = [leg for leg in keys if leg not in reused]
+        Telemetry.default().increment("cache_requests_total", len(reused), cache="leg", result="hit")
+        Telemetry.default().increment("cache_requests_total", len(missing), cache="leg", result="miss")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_BROUTER_REQUESTS, len(missing)))) as executor:
+            futures = {
+                (bike_profile, idx, i): executor.submit(self.__fetch_and_simplify_leg, locations_coordinates[i], locations_coordinates[i + 1], bike_profile, idx, simplification_tolerance)
+                for bike_profile, idx, i in missing
+            }
 
-            route.extend(response.json()["features"][0]["geometry"]["coordinates"])
+            routes = []
+            legs_used = {}
+            for bike_profile in bike_profiles:
+                for idx in range(NUMBER_OF_ALTERNATIVES):
+                    try:
+                        legs = [reused[(bike_profile, idx, i)] if (bike_profile, idx, i) in reused else futures[(bike_profile, idx, i)].result() for i in range(number_of_legs)]
+                    except (requests.RequestException, ValueError, KeyError) as e:
+                        # A failed request or an unreadable GeoJSON drops the alternative, any other error is a bug and is raised
+                        logger.warning("Alternative %d of the %s route dropped, a leg failed: %r", idx, bike_profile, e)
+                        Telemetry.default().increment("route_alternatives_dropped_total", profile=bike_profile, error=type(e).__name__)
+                        for i in range(number_of_legs):
+                            if (bike_profile, idx, i) in futures:
+                                futures[(bike_profile, idx, i)].cancel()
+                        continue
+                    for i, leg in enumerate(legs):
+                        legs_used[keys[(bike_profile, idx, i)]] = leg
+                    routes.append((bike_profile, Route.concatenate([full for full, _ in legs]), Route.concatenate([simplified for _, simplified in legs])))
 
-        return route
+        self._legs = legs_used
+        return routes
+
+    @staticmethod
+    def __leg_key(start: list[float], end: list[float], bike_profile: str, idx: int, simplification_tolerance: float) -> tuple:
+        """Identify a leg by its ends rounded to about 10 cm, its profile, its alternative and its simplification"""
+        return (round(start[0], 6), round(start[1], 6), round(end[0], 6), round(end[1], 6), bike_profile, idx, simplification_tolerance)
     
-    def plan_candidate_routes(self) -> None | str:
-        """Get 4 different routes that goes through the places provided"""
+    def plan_candidate_routes(self, simplification_tolerance: float = SIMPLIFICATION_TOLERANCE) -> None | str:
+        """Get 4 different routes that goes through the places provided
+        Args:
+            - simplification_tolerance (float) : the routes are simplified with Douglas-Peucker, dropping the points closer than this many meters to the simplified route (elevation included). 0 keeps every point
+
+        The simplified routes are the candidate_routes, the full resolution ones are available with get_full_resolution_route
+        """
         if self.places is None or len(self.places) < 2:
             return "Error in RouteDescriptor.plan_candidate_routes()\nThe places are not set, please fill the route descriptor with places first\n"
         if self.bike_type is None or self.bike_type not in ["road", "gravel", "mtb"]:
             return "Error in RouteDescriptor.plan_candidate_routes()\nThe bike_type is not set, please fill the route descriptor with a valid bicycle profile first\n"
 
-        self.candidate_routes = []
-        route = []
-        for i in range(4):
-            route = self.__plan_route(i)
-            if len(route) > 0:
-                self.candidate_routes.append(route)
-    
+        self._description = None
+        routes = [(full, simplified) for _, full, simplified in self.__plan_routes([BIKE_PROFILES[self.bike_type]], simplification_tolerance) if len(full) > 0]
+        self.candidate_bike_types = None
+        self.candidate_days_needed = None
+        self.candidate_routes = [simplified for _, simplified in routes]
+        self._full_resolution_routes = [full for full, _ in routes]
+        for full, simplified in routes:
+            Telemetry.default().observe("route_points", len(full), stage="candidate_full")
+            Telemetry.default().observe("route_points", len(simplified), stage="candidate_simplified")
+        if len(self.candidate_routes) == 0:
+            return "Error in RouteDescriptor.plan_candidate_routes()\nNo route was found between the given places, the routing service may be unavailable\n"
+
+    def plan_candidate_routes_for_every_bike_type(self, max_distance: float = 0.0, max_elevation: float = 0.0, bike_types: list[str] | None = None, shortlist_size: int = SHORTLIST_SIZE, simplification_tolerance: float = SIMPLIFICATION_TOLERANCE) -> None | str:
+        """Plan the alternative routes of every bike type at once and keep the ones that best fit the daily limits
+        Args:
+            - max_distance (float) : maximum distance in meters per day, 0 or less means no limit
+            - max_elevation (float) : maximum positive height difference in meters per day, 0 or less means no limit
+            - bike_types (list[str]) | None : the bike types compared, road, gravel and mtb if None
+            - shortlist_size (int) : number of candidate routes kept
+            - simplification_tolerance (float) : see plan_candidate_routes
+
+        The candidate_routes are ranked with StepPlanner.rank_routes: first the ones that fit number_of_days (if set), then the fewest days, the lowest daily effort and the shortest.
+        candidate_bike_types and candidate_days_needed describe every candidate, selecting a route sets the bike_type to its own.
+        """
+        if self.places is None or len(self.places) < 2:
+            return "Error in RouteDescriptor.plan_candidate_routes_for_every_bike_type()\nThe places are not set, please fill the route descriptor with places first\n"
+        bike_types = bike_types if bike_types is not None else list(BIKE_PROFILES)
+        unknown = [bike_type for bike_type in bike_types if bike_type not in BIKE_PROFILES]
+        if len(bike_types) == 0 or unknown:
+            return f"Error in RouteDescriptor.plan_candidate_routes_for_every_bike_type()\nThe bike_types must be some of {list(BIKE_PROFILES)}\n{bike_types} were provided\n"
+
+        self._description = None
+        bike_type_of_profile = {BIKE_PROFILES[bike_type]: bike_type for bike_type in bike_types}
+        routes = [(bike_type_of_profile[profile], full, simplified) for profile, full, simplified in self.__plan_routes(list(bike_type_of_profile), simplification_tolerance) if len(full) > 0]
+        for _, full, simplified in routes:
+            Telemetry.default().observe("route_points", len(full), stage="candidate_full")
+            Telemetry.default().observe("route_points", len(simplified), stage="candidate_simplified")
+        if len(routes) == 0:
+            self.candidate_routes = []
+            self._full_resolution_routes = []
+            self.candidate_bike_types = []
+            self.candidate_days_needed = []
+            return "Error in RouteDescriptor.plan_candidate_routes_for_every_bike_type()\nNo route was found between the given places, the routing service may be unavailable\n"
+
+        # Ranked on the simplified routes, the candidate_routes plan_steps divides, so the days estimated are the ones of the steps
+        lengths = np.array([simplified.profile().cumulative_distance[-1] for _, _, simplified in routes])
+        ascents = np.array([simplified.profile().cumulative_ascent[-1] for _, _, simplified in routes])
+        order, days_needed, _ = StepPlanner.rank_routes(
+            lengths, ascents, self.number_of_days,
+            max_distance if max_distance > 0 else math.inf,
+            max_elevation if max_elevation > 0 else math.inf,
+        )
+        shortlist = [int(i) for i in order[:shortlist_size]]
+
+        self.candidate_routes = [routes[i][2] for i in shortlist]
+        self._full_resolution_routes = [routes[i][1] for i in shortlist]
+        self.candidate_bike_types = [routes[i][0] for i in shortlist]
+        self.candidate_days_needed = [int(days_needed[i]) for i in shortlist]
+
     def __check_consistency_number_of_days_number_of_steps(self) -> None | str:
         if not self.number_of_days:
             return 
@@ -252,45 +508,38 @@ class TripDescriptor(BaseModel):
             return "Error in RouteDescriptor.__check_consistency_number_of_days_number_of_steps()\nThe stepped_route is not set, please plan the stepped_route first\n"
 
         if len(self.stepped_route) > self.number_of_days:
-            return "Error in RouteDescriptor.__check_consistency_number_of_days_number_of_steps()\nThe number of steps in the route is greater than the number of days\n"
+            return f"Error in RouteDescriptor.__check_consistency_number_of_days_number_of_steps()\nThe number of steps in the route is greater than the number of days\nWith the current daily limits the route needs at least {len(self.stepped_route)} days, {self.number_of_days} were provided\n"
     
     def plan_steps(self, max_distance: float = 40000.0, max_elevation: float = 500.0) -> None | str:
-        """Plan the steps of the route based on the maximum distance"""
+        """Plan the steps of the route, balancing the effort across the days
+        Args:
+            - max_distance (float) : maximum distance in meters per day, 0 or less means no limit
+            - max_elevation (float) : maximum positive height difference in meters per day, 0 or less means no limit
+
+        When number_of_days is set the route is divided in exactly that many steps, otherwise in the minimum number of steps the limits allow
+        """
         if self.candidate_routes is None or len(self.candidate_routes) == 0:
             return "Error in RouteDescriptor.__plan_steps()\nThe candidate_routes is None, please fill the route descriptor with places first\n"
 
         if self.selected_route is None or self.selected_route < 0 or self.selected_route >= len(self.candidate_routes):
             return f"Error in RouteDescriptor.__plan_steps()\nThe selected_route is {self.selected_route}, it must be between 0 and {len(self.candidate_routes) - 1} (inclusive)\nPlease fill the route descriptor with a valid selected_route first\n"
         
-        self.stepped_route = []
-        self.length = 0.0
-        self.positive_height_difference = 0.0
-        choosen_raw_route = self.candidate_routes[self.selected_route]
-        current_step = [choosen_raw_route[0]]
-        lat_lon_distance = 0.0
-        positive_height_difference = 0.0
-        
-        for geopoint in choosen_raw_route[1:]:
-            lat_lon_distance_increment = DistanceCalculation.fcc_distance(current_step[-1], geopoint)
-            height_increment = DistanceCalculation.eucledian_distance(current_step[-1], geopoint)
-
-            if lat_lon_distance + lat_lon_distance_increment <= max_distance and positive_height_difference + height_increment <= max_elevation:
-                current_step.append(geopoint)
-                lat_lon_distance += lat_lon_distance_increment
-                positive_height_difference += height_increment 
-            else:
-                self.stepped_route.append(current_step)
-                self.length += lat_lon_distance
-                self.positive_height_difference += positive_height_difference
-                current_step = [self.stepped_route[-1][-1], geopoint]
-                lat_lon_distance = lat_lon_distance_increment
-                positive_height_difference = height_increment
-        
-        if self.stepped_route != []:
-            if current_step != self.stepped_route[-1]:
-                self.stepped_route.append(current_step)
+        self._description = None
+        max_distance = max_distance if max_distance > 0 else math.inf
+        max_elevation = max_elevation if max_elevation > 0 else math.inf
+
+        profile = self.__selected_profile()
+        cut_points = StepPlanner.balanced_cut_points(profile.cumulative_distance, profile.cumulative_ascent, self.number_of_days, max_distance, max_elevation)
+        if cut_points is None:
+            # The limits do not allow to ride the route in number_of_days, the steps of the shortest possible plan are kept
+            cut_points = StepPlanner.balanced_cut_points(profile.cumulative_distance, profile.cumulative_ascent, None, max_distance, max_elevation)
+
+        if len(cut_points) == 1:
+            self.stepped_route = [(0, 0)]
         else:
-            self.stepped_route.append(current_step)
+            self.stepped_route = list(zip(cut_points[:-1], cut_points[1:]))
+        self.length = float(profile.cumulative_distance[-1])
+        self.positive_height_difference = float(profile.cumulative_ascent[-1])
 
         ret = self.__check_consistency_number_of_days_number_of_steps()
         if ret is not None:
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+class UserChannel:
+    """Conversation with a user connected to the server, the agent asks and waits for the answer without blocking the event loop
+    Args:
+        send (Callable[[str], Awaitable[None]]): coroutine function delivering a message to the user, e.g. the send of a WebSocket
+
+    Examples:
+        ```python
+        channel = UserChannel(websocket.send)
+        answer = await channel.ask("Where does the trip start?")
+        ...
+        # on every message received from the user
+        channel.deliver(message)
+        ```
+    """
+    def __init__(self, send: Callable[[str], Awaitable[None]]) -> None:
+        self.__send = send
+        self.__answers: asyncio.Queue[str] = asyncio.Queue()
+        self.__waiting = 0
+
+    @property
+    def waiting(self) -> bool:
+        """True while the agent is waiting for an answer of the user"""
+        return self.__waiting > 0
+
+    async def ask(self, question: str) -> str:
+        """Send a question to the user and wait for the next message"""
+        await self.__send(question)
+        self.__waiting += 1
+        try:
+            return await self.__answers.get()
+        finally:
+            self.__waiting -= 1
+
+    def deliver(self, message: str) -> None:
+        """Hand a message received from the user to the agent"""
+        self.__answers.put_nowait(message)
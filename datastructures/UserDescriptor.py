@@ -8,6 +8,7 @@ class UserDescriptor(BaseModel):
         performance (PerformanceDescriptor): measure of the user cycling performance of the user
         preferences (PreferencesDescriptor): preferences of the user for the points of interest
         additional_note: a useful additional note about the user, that might fell off from performance and preferences
+        user_id (str | None): identifier of the user in the SnapshotStore, a user built only with its user_id is loaded from the store if it was saved
 
     Examples:
         ```python
@@ -23,18 +24,35 @@ class UserDescriptor(BaseModel):
         )
         user.set_additional_note("User prefers scenic routes.")
         performance = user.get_performance()
+        user.save()
+
+        same_user = UserDescriptor(user_id="mario")
         ```
     """
     performance: PerformanceDescriptor = PerformanceDescriptor() 
     preferences: PreferencesDescriptor = PreferencesDescriptor()
     additional_note: str = ""
+    user_id: str | None = None
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
-        # This is where you would typically load the user from a persistence system
-        # Check if the user exist in the persistance system
-        #   If yes, load his performance and preferences
-        #   If no, do nothing
+        # A user given only by its id is loaded from the persistence system, if it was saved before
+        if self.user_id is not None and kwargs.keys() == {"user_id"}:
+            from datastructures.SnapshotStore import SnapshotStore
+
+            saved = SnapshotStore.default().load_user(self.user_id)
+            if saved is not None:
+                self.performance = saved.performance
+                self.preferences = saved.preferences
+                self.additional_note = saved.additional_note
+
+    def save(self) -> None | str:
+        """Save the user in the SnapshotStore, so that it is loaded the next time it is built with its user_id"""
+        if self.user_id is None:
+            return "Error in UserDescriptor.save()\nThe user has no user_id, it can not be saved\n"
+        from datastructures.SnapshotStore import SnapshotStore
+
+        SnapshotStore.default().save_user(self.user_id, self)
 
     def get_performance(self) -> PerformanceDescriptor:
         """Get the performance descriptor of the user"""
@@ -49,7 +67,7 @@ class UserDescriptor(BaseModel):
         return self.additional_note
 
     def get_class_description(self) -> str:
-        """Get a string description of the class that represent the user"""
+        """Get a string description of the class that represent the user, it does not depend on the current values so it stays byte-stable"""
         return f"""# UserDescriptor:
 - performance: PerformanceDescriptor
 - preferences: PreferenceDescriptor
@@ -57,7 +75,8 @@ class UserDescriptor(BaseModel):
 {self.performance.get_class_description()}
 {self.preferences.get_class_description()}
 ## Additional note
-{self.additional_note}
+- additional_note: str = ""
+    - a useful note about the user that does not fit in performance and preferences
 """
 
     def get_description(self) -> str:
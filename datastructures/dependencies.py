@@ -1,11 +1,21 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from threading import RLock
 from datastructures.TripDescriptor import TripDescriptor
 from datastructures.UserDescriptor import UserDescriptor
 from datastructures.Recommendation import Recommendation
+from datastructures.UserChannel import UserChannel
 
 
 @dataclass
 class MyDeps:
     trip: TripDescriptor
     user: UserDescriptor
-    recommendation: Recommendation
\ No newline at end of file
+    recommendation: Recommendation
+    channel: UserChannel | None = None # set by the server, None when the user is on the terminal
+    # Held by the tools while they use the descriptors and by the server while it saves them, the tools run in worker threads
+    lock: RLock = field(default_factory=RLock, repr=False, compare=False)
+
+    def run_locked(self, function, *args, **kwargs):
+        """Run function holding the lock, to be called from a worker thread: it blocks until the lock is free"""
+        with self.lock:
+            return function(*args, **kwargs)
@@ -0,0 +1,22 @@
+import argparse
+
+from datastructures.OfflinePoiStore import OfflinePoiStore
+
+
+def ingest_pois():
+    """Fill the offline poi store with the pois of an OSM extract"""
+    parser = argparse.ArgumentParser(description="Store the points of interest of an OSM extract in a local, spatially indexed, SQLite file")
+    parser.add_argument("extract", help="an OSM PBF extract (.osm.pbf) or an Overpass JSON dump (.json)")
+    parser.add_argument("store", help="the SQLite file of the store, set OFFLINE_POI_STORE to its path to use it")
+    args = parser.parse_args()
+
+    store = OfflinePoiStore(args.store)
+    if args.extract.endswith(".pbf"):
+        count = store.ingest_pbf(args.extract)
+    else:
+        count = store.ingest_overpass_json(args.extract)
+    print(f"{count} points of interest stored in {args.store}")
+
+
+if __name__ == "__main__":
+    ingest_pois()
@@ -1,27 +1,32 @@
-import logfire
-from dotenv import load_dotenv
-
-from pydantic_ai import Agent
+import os
 
 from datastructures.TripDescriptor import TripDescriptor
 from datastructures.UserDescriptor import UserDescriptor
 from datastructures.Recommendation import Recommendation
 from datastructures.dependencies import MyDeps
 
-load_dotenv()
+from crew.route_planner_agent import configure_instrumentation, get_route_planner
 
-logfire.configure()
-logfire.instrument_pydantic_ai()
-Agent.instrument_all()
 
-from crew.route_planner_agent import route_planner
+def run_cycling_trip_agency():
+    """Main execution function for the director agent
+    The traces are sent to logfire unless INSTRUMENTATION is set to 0
+    With USER_ID set the user is loaded from the SnapshotStore, and saved there at the end of the conversation
+    """
+    from dotenv import load_dotenv
 
+    load_dotenv()
+    if os.environ.get("INSTRUMENTATION", "1") != "0":
+        configure_instrumentation()
 
-def run_cycling_trip_agency():
-    """Main execution function for the director agent"""
-    deps = MyDeps(TripDescriptor(), UserDescriptor(), Recommendation())
-    route_planner.run_sync(deps=deps)
+    user_id = os.environ.get("USER_ID") or None
+    deps = MyDeps(TripDescriptor(), UserDescriptor(user_id=user_id) if user_id is not None else UserDescriptor(), Recommendation())
+    try:
+        get_route_planner().run_sync(deps=deps)
+    finally:
+        if user_id is not None:
+            deps.user.save()
 
 
 if __name__ == "__main__":
-    run_cycling_trip_agency()
\ No newline at end of file
+    run_cycling_trip_agency()
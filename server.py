@@ -0,0 +1,158 @@
+"""Serve the route planner agent over WebSocket, every connection is a separate conversation with its own descriptors
+
+Run from the root of the project:
+    python server.py --host 127.0.0.1 --port 8765
+
+Every new conversation gets a session id generated by the server, sent to the client as its first message.
+A client connecting to ws://host:port/?session=<id> with that id resumes the saved session, without geocoding or routing again.
+The id is the only credential of the session: it is unguessable, an id the server did not issue starts a new session.
+The user of a new session is identified the same way: the server sends its user id, ?user=<id> starts the next session
+with the performance and the preferences saved for that user, which are saved again with the session.
+The session is saved in the SnapshotStore every time the user answers a question of the agent and when the connection ends.
+With TELEMETRY_EXPORT_PATH set, the metrics are exported there at the end of every session. INSTRUMENTATION=0 disables logfire.
+
+Messages are JSON objects:
+    - from the server: {"type": "session", "text": <id>} first, the id to resume the conversation later,
+      {"type": "user", "text": <id>} then, the id to start the next conversations with the same user,
+      {"type": "question", "text": ...} when the agent talks to the user,
+      {"type": "done", "text": ...} with the final answer of the agent, {"type": "error", "text": ...}
+    - from the client: {"type": "answer", "text": ...}, a plain text message is accepted too
+"""
+import argparse, asyncio, json, os, secrets
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from datastructures.TripDescriptor import TripDescriptor
+from datastructures.UserDescriptor import UserDescriptor
+from datastructures.Recommendation import Recommendation
+from datastructures.UserChannel import UserChannel
+from datastructures.dependencies import MyDeps
+from datastructures.SnapshotStore import SnapshotStore
+from datastructures.Telemetry import Telemetry
+
+from crew.route_planner_agent import configure_instrumentation, get_route_planner, log
+
+
+MAX_SESSIONS = 64
+TRY_AGAIN_LATER = 1013 # WebSocket close code sent when the server is full
+SESSION_ID_BYTES = 32 # random bytes of a session id and of a user id
+FINAL_SAVE_TIMEOUT = 60.0 # seconds a tool still running at disconnect is waited for before the session is saved
+
+
+def _read_answer(message: str | bytes) -> str:
+    """Get the text of a client message, either {"type": "answer", "text": ...} or plain text"""
+    if isinstance(message, bytes):
+        message = message.decode("utf-8")
+    try:
+        payload = json.loads(message)
+    except json.JSONDecodeError:
+        return message
+    if isinstance(payload, dict) and "text" in payload:
+        return str(payload["text"])
+    return message
+
+
+async def run_session(connection: ServerConnection) -> None:
+    """Run a conversation with the client until the agent is done or the client leaves"""
+    async def send(kind: str, text: str) -> None:
+        await connection.send(json.dumps({"type": kind, "text": text}))
+
+    channel = UserChannel(lambda question: send("question", question))
+    query = parse_qs(urlparse(connection.request.path).query) # pyright: ignore[reportOptionalMemberAccess]
+    requested_session = query.get("session", [None])[0]
+    requested_user = query.get("user", [None])[0]
+    store = SnapshotStore.default()
+
+    # Only a session the server saved is resumed, the client never chooses the id of a new one
+    deps = await asyncio.to_thread(store.load_session, requested_session) if requested_session is not None else None
+    session_id = requested_session if deps is not None else secrets.token_urlsafe(SESSION_ID_BYTES)
+    if deps is None:
+        # A new session starts from the saved user, if the client gave an id the server issued
+        user = await asyncio.to_thread(store.load_user, requested_user) if requested_user is not None else None
+        deps = MyDeps(TripDescriptor(), user or UserDescriptor(), Recommendation())
+    if deps.user.user_id is None:
+        deps.user.user_id = secrets.token_urlsafe(SESSION_ID_BYTES)
+    deps.channel = channel
+    await send("session", session_id)
+    await send("user", deps.user.user_id)
+    conversation = asyncio.create_task(get_route_planner().run(deps=deps))
+
+    def save_locked(timeout: float) -> bool:
+        if not deps.lock.acquire(timeout=timeout):
+            return False
+        try:
+            store.save_session(session_id, deps)
+            deps.user.save()
+        finally:
+            deps.lock.release()
+        return True
+
+    async def save(timeout: float = -1) -> None:
+        # The tools change the descriptors holding their lock, so the snapshot never catches a trip half updated
+        if not await asyncio.to_thread(save_locked, timeout):
+            log("warning", f"Session {session_id} not saved, a tool is still running: the last snapshot is kept")
+
+    async def receive() -> None:
+        async for message in connection:
+            # An answer to a question of the agent is a point worth resuming from, the other messages are just queued
+            if channel.waiting:
+                await save()
+            channel.deliver(_read_answer(message))
+
+    receiver = asyncio.create_task(receive())
+    try:
+        await asyncio.wait([conversation, receiver], return_when=asyncio.FIRST_COMPLETED)
+        if conversation.done():
+            if conversation.exception() is not None:
+                log("error", f"Session failed: {conversation.exception()}")
+                await send("error", "Something went wrong, the conversation is over.")
+            else:
+                await send("done", str(conversation.result().output))
+    except ConnectionClosed:
+        pass
+    finally:
+        # The client left or the agent is done, whatever is still running is stopped
+        for task in (conversation, receiver):
+            task.cancel()
+        await asyncio.gather(conversation, receiver, return_exceptions=True)
+        # Cancelling the conversation does not stop a tool already running in a worker thread, the save waits for it to finish, up to FINAL_SAVE_TIMEOUT
+        await save(FINAL_SAVE_TIMEOUT)
+        await asyncio.to_thread(Telemetry.default().export)
+
+
+async def serve_forever(host: str, port: int, max_sessions: int) -> None:
+    sessions = asyncio.Semaphore(max_sessions)
+
+    async def handler(connection: ServerConnection) -> None:
+        if sessions.locked():
+            await connection.close(TRY_AGAIN_LATER, "Too many conversations, try again later")
+            return
+        async with sessions:
+            await run_session(connection)
+
+    async with serve(handler, host, port) as server:
+        log("info", f"Route planner listening on ws://{host}:{port}")
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the route planner agent over WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS, help="conversations served at the same time")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if os.environ.get("INSTRUMENTATION", "1") != "0":
+        configure_instrumentation()
+    # Built before the first connection, so the first user does not wait for it
+    get_route_planner()
+    asyncio.run(serve_forever(args.host, args.port, args.max_sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# The modules are imported from the root of the project, as main.py and server.py do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,80 @@
+import types
+
+import pytest
+
+import datastructures.GeocodingCache as geocoding_cache_module
+from datastructures.GeocodingCache import GeocodingCache
+
+
+UDINE = {"display_name": "Udine, Friuli-Venezia Giulia, Italia", "lat": 46.06, "lon": 13.23}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock moved by hand, read by the cache instead of time.time"""
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(geocoding_cache_module, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_normalize():
+    assert GeocodingCache.normalize("  Udine ,Italy") == GeocodingCache.normalize("udine, italy") == "udine, italy"
+    assert GeocodingCache.normalize("Ｕｄｉｎｅ,, ") == "udine"
+
+
+def test_found_not_found_and_missing(tmp_path, clock):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite"))
+    cache.put("Udine", UDINE)
+    cache.put("Nowhere", None)
+
+    assert cache.get(" udine ") == (True, UDINE)
+    assert cache.get("Nowhere") == (True, None)
+    assert cache.get("Trieste") == (False, None)
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite"), ttl=100.0, negative_ttl=10.0)
+    cache.put("Udine", UDINE)
+    cache.put("Nowhere", None)
+
+    clock.now += 11.0
+    assert cache.get("Udine") == (True, UDINE)
+    assert cache.get("Nowhere") == (False, None)
+
+    clock.now += 90.0
+    assert cache.get("Udine") == (False, None)
+
+
+def test_entries_survive_the_process(tmp_path, clock):
+    GeocodingCache(str(tmp_path / "geocoding.sqlite")).put("Udine", UDINE)
+
+    assert GeocodingCache(str(tmp_path / "geocoding.sqlite")).get("Udine") == (True, UDINE)
+
+
+def test_the_memory_lru_falls_back_to_the_file(tmp_path, clock):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite"), memory_entries=2)
+    for index in range(5):
+        cache.put(f"place {index}", {"display_name": f"place {index}", "lat": 46.0, "lon": 13.0 + index})
+
+    for index in range(5):
+        assert cache.get(f"place {index}")[1]["lon"] == 13.0 + index
+
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = GeocodingCache(str(tmp_path / "geocoding.sqlite"), max_entries=3, memory_entries=1)
+    for name in ("a", "b", "c"):
+        clock.now += 1.0
+        cache.put(name, {"display_name": name, "lat": 46.0, "lon": 13.0})
+    clock.now += 1.0
+    cache.get("a") # read from the file, so a becomes the most recently used
+    clock.now += 1.0
+    cache.put("d", {"display_name": "d", "lat": 46.0, "lon": 13.0})
+
+    reopened = GeocodingCache(str(tmp_path / "geocoding.sqlite"))
+    assert [reopened.get(name)[0] for name in ("a", "b", "c", "d")] == [True, False, True, True]
+
+
+def test_default_is_disabled_by_an_empty_path(monkeypatch):
+    monkeypatch.setenv("GEOCODING_CACHE_PATH", "")
+
+    assert GeocodingCache.default() is None
@@ -0,0 +1,38 @@
+import os, subprocess, sys
+
+import pytest
+
+from benchmarks.import_time import BUDGETS, import_seconds
+
+
+# The budgets were measured on a developer machine, a shared CI runner is slower and noisier
+SCALE = float(os.environ.get("IMPORT_TIME_SCALE", "1.5"))
+REPETITIONS = 3
+
+
+@pytest.fixture(autouse=True)
+def project_root(monkeypatch):
+    """The fresh interpreters import the modules from the root of the project"""
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def imported_modules(module: str, candidates: list[str]) -> list[str]:
+    """The candidates that are in sys.modules after importing module in a fresh interpreter"""
+    statement = f"import sys, {module}; print(' '.join(name for name in {candidates!r} if name in sys.modules))"
+    return subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True, text=True).stdout.split()
+
+
+def test_the_agent_module_imports_nothing_heavy():
+    assert imported_modules("crew.route_planner_agent", ["pydantic_ai", "logfire", "yaml", "datastructures.TripDescriptor"]) == []
+
+
+def test_the_entry_point_does_not_import_the_agent():
+    assert imported_modules("main", ["pydantic_ai", "openai", "yaml"]) == []
+
+
+@pytest.mark.parametrize("module", BUDGETS)
+def test_the_module_imports_within_its_budget(module):
+    startup = import_seconds("pass", REPETITIONS)
+
+    seconds = import_seconds(f"import {module}", REPETITIONS) - startup
+
+    assert seconds <= BUDGETS[module] * SCALE, f"import {module} took {seconds * 1000:.1f} ms, the budget is {BUDGETS[module] * SCALE * 1000:.1f} ms"
@@ -0,0 +1,119 @@
+import json, types
+
+import numpy as np
+import pytest
+
+import datastructures.PoiCache as poi_cache_module
+import datastructures.Recommendation as recommendation_module
+from benchmarks.fake_services import FakeServices, synthetic_track
+from datastructures.PoiCache import PoiCache
+from datastructures.Recommendation import Recommendation
+from datastructures.Route import Route
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(poi_cache_module, "time", types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def reference_geohash(lon: float, lat: float, precision: int) -> str:
+    """The textbook geohash, by bisection of the longitude and latitude ranges"""
+    lon_range, lat_range = [-180.0, 180.0], [-90.0, 90.0]
+    bits = []
+    for i in range(5 * precision):
+        value, bounds = (lon, lon_range) if i % 2 == 0 else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits.append(int(value >= middle))
+        bounds[0 if value >= middle else 1] = middle
+    return "".join("0123456789bcdefghjkmnpqrstuvwxyz"[int("".join(map(str, bits[i:i + 5])), 2)] for i in range(0, len(bits), 5))
+
+
+def node(node_id: int, lon: float, lat: float) -> dict:
+    return {"type": "node", "id": node_id, "lon": lon, "lat": lat, "tags": {"amenity": "restaurant", "name": f"Trattoria {node_id}"}}
+
+
+@pytest.mark.parametrize("precision", [4, 5, 6])
+@pytest.mark.parametrize("lon, lat", [(13.23, 46.06), (-0.1276, 51.5072), (151.2093, -33.8688), (-179.99, -89.99)])
+def test_geohash_of_the_tile_of_a_point(precision, lon, lat):
+    cache = PoiCache(":memory:", precision=precision)
+
+    assert cache.geohash(cache.tile_of(lon, lat)) == reference_geohash(lon, lat, precision)
+
+
+def test_bounding_boxes_merge_the_consecutive_tiles_of_a_row():
+    cache = PoiCache(":memory:")
+    column, row = cache.tile_of(13.23, 46.06)
+
+    boxes = cache.bounding_boxes({(column, row), (column + 1, row), (column + 3, row), (column, row + 1)})
+
+    assert len(boxes) == 3
+    south, west, north, east = boxes[0]
+    assert south <= 46.06 < north and west <= 13.23 < east
+    assert east - west == pytest.approx(2 * (boxes[1][3] - boxes[1][1]))
+
+
+def test_tiles_around_cover_the_corridor():
+    cache = PoiCache(":memory:")
+    route = Route(synthetic_track((13.0, 46.0), (13.3, 46.2), 0))
+    radius = 3000.0
+
+    tiles = cache.tiles_around(route.coordinates, route.profile().cumulative_distance, radius)
+
+    # Every point within the radius of the route is in a tile: the route points and their offsets north, south, east and west
+    coordinates = route.coordinates
+    delta_lat = 0.95 * radius / 111132.0
+    delta_lon = 0.95 * radius / (111320.0 * np.cos(np.radians(coordinates[:, 1])))
+    for lon, lat in zip(np.concatenate([coordinates[:, 0], coordinates[:, 0], coordinates[:, 0] + delta_lon, coordinates[:, 0] - delta_lon]),
+                        np.concatenate([coordinates[:, 1] + delta_lat, coordinates[:, 1] - delta_lat, coordinates[:, 1], coordinates[:, 1]])):
+        assert cache.tile_of(lon, lat) in tiles
+
+
+def test_elements_are_stored_in_their_tile(tmp_path, clock):
+    cache = PoiCache(str(tmp_path / "pois.sqlite"))
+    inside, empty, outside = cache.tile_of(13.23, 46.06), cache.tile_of(13.33, 46.06), cache.tile_of(14.5, 46.06)
+
+    cache.put({inside, empty}, "amenity=restaurant", [node(1, 13.23, 46.06), node(2, 14.5, 46.06), {"type": "way", "id": 3}])
+
+    elements, missing = cache.get({inside, empty, outside}, "amenity=restaurant")
+    assert [element["id"] for element in elements] == [1]
+    assert missing == {outside}
+    assert cache.get({inside}, "amenity=cafe") == ([], {inside})
+    assert PoiCache(str(tmp_path / "pois.sqlite")).get({inside}, "amenity=restaurant")[0] == elements
+
+
+def test_tiles_expire_after_their_ttl(tmp_path, clock):
+    cache = PoiCache(str(tmp_path / "pois.sqlite"), ttl=100.0)
+    tile = cache.tile_of(13.23, 46.06)
+    cache.put({tile}, "amenity=restaurant", [node(1, 13.23, 46.06)])
+
+    clock.now += 99.0
+    assert cache.get({tile}, "amenity=restaurant")[1] == set()
+    clock.now += 2.0
+    assert cache.get({tile}, "amenity=restaurant") == ([], {tile})
+
+
+def test_an_overpass_answer_with_a_remark_is_not_cached(tmp_path, monkeypatch):
+    recordings = tmp_path / "recordings"
+    recordings.mkdir()
+    (recordings / "overpass.json").write_text(json.dumps({"version": 0.6, "remark": "runtime error: Query timed out", "elements": []}))
+    cache = PoiCache(str(tmp_path / "pois.sqlite"))
+    monkeypatch.setattr(PoiCache, "default", classmethod(lambda cls: cache))
+    monkeypatch.delenv("OFFLINE_POI_STORE", raising=False)
+    route = Route(synthetic_track((13.0, 46.0), (13.1, 46.05), 0))
+
+    with FakeServices(recordings=str(recordings), ports=(0, 0, 0)) as services:
+        monkeypatch.setattr(recommendation_module, "OVERPASS_URL", services.urls()["overpass"])
+        recommendation = Recommendation()
+        recommendation.find_route_recommendations(route, {"restaurant": []}, search_radius=2000)
+
+    tiles = cache.tiles_around(route.coordinates, route.profile().cumulative_distance, 2000)
+    assert recommendation.get_recommended_places() == []
+    assert cache.get(tiles, "amenity=restaurant")[1] == tiles
+
+
+def test_default_is_disabled_by_an_empty_path(monkeypatch):
+    monkeypatch.setenv("POI_CACHE_PATH", "")
+
+    assert PoiCache.default() is None
@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from benchmarks.synthetic import synthetic_route
+from datastructures.Route import Route
+
+
+def geojson_body(points: list[list[float]]) -> bytes:
+    """A BRouter-like answer, with properties before and messages after the coordinates"""
+    return json.dumps({
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {"creator": "BRouter", "track-length": "1234", "messages": [["Longitude", "Latitude"], ["13", "46"]]},
+            "geometry": {"type": "LineString", "coordinates": points},
+        }],
+    }).encode()
+
+
+def chunked(body: bytes, size: int) -> list[bytes]:
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 13, 64, 4096, 1 << 20])
+def test_from_geojson_does_not_depend_on_the_chunk_size(chunk_size):
+    points = synthetic_route(500).round(6).tolist()
+    points[3] = [-0.000012, 1e-05, -3.5] # negative numbers and exponents may be split between chunks too
+
+    route = Route.from_geojson(chunked(geojson_body(points), chunk_size))
+
+    np.testing.assert_array_equal(route.coordinates, np.array(points))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_from_geojson_without_elevation(chunk_size):
+    points = [[13.1, 46.1], [13.2, 46.2], [13.3, 46.3]]
+
+    route = Route.from_geojson(chunked(geojson_body(points), chunk_size))
+
+    np.testing.assert_array_equal(route.coordinates, [[13.1, 46.1, 0.0], [13.2, 46.2, 0.0], [13.3, 46.3, 0.0]])
+
+
+def test_from_geojson_without_coordinates():
+    with pytest.raises(ValueError):
+        Route.from_geojson(chunked(b'{"type": "FeatureCollection", "features": []}', 4))
+
+
+def test_from_geojson_with_empty_coordinates():
+    assert len(Route.from_geojson([geojson_body([])])) == 0
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_views_and_slices_share_the_buffer_and_keep_the_dtype(dtype):
+    route = Route(synthetic_route(100), dtype=dtype)
+
+    for step in (route.view(10, 60), route[60:], route[:10]):
+        assert step.dtype == dtype
+        assert np.shares_memory(np.asarray(step), np.asarray(route))
+    np.testing.assert_array_equal(route.view(10, 60).coordinates, route.coordinates[10:60])
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_simplify_and_concatenate_keep_the_dtype(dtype):
+    route = Route(synthetic_route(100), dtype=dtype)
+
+    assert route.simplify(2.0).dtype == dtype
+    assert route.simplify(0.0).dtype == dtype
+    assert Route.concatenate([route.view(0, 50), route.view(50, 100)]).dtype == dtype
+    assert Route.concatenate([route.view(0, 50), route.view(50, 100)]) == route
+
+
+def test_concatenate_of_mixed_dtypes_keeps_the_precision():
+    assert Route.concatenate([Route([[13.0, 46.0, 1.0]], dtype=np.float32), Route([[13.1, 46.1, 2.0]])]).dtype == np.float64
+
+
+def test_simplify_drops_the_aligned_points_and_keeps_the_ends():
+    route = Route([[13.0 + 0.001 * i, 46.0, 100.0] for i in range(11)])
+
+    simplified = route.simplify(1.0)
+
+    assert simplified.to_list() == [route[0], route[10]]
+
+
+def test_simplify_keeps_a_climb():
+    route = Route([[13.0 + 0.001 * i, 46.0, 100.0 + (50.0 if i == 5 else 0.0)] for i in range(11)])
+
+    assert route[5] in route.simplify(1.0).to_list()
+
+
+def test_the_array_of_a_route_is_read_only():
+    route = Route(synthetic_route(10))
+
+    with pytest.raises(ValueError):
+        np.asarray(route)[0, 0] = 0.0
+    with pytest.raises(ValueError):
+        route.coordinates[0, 0] = 0.0
+
+    copy = np.array(route)
+    copy[0, 0] = 0.0
+    assert route[0][0] != 0.0
+
+
+def test_serialization_in_a_model():
+    class Trip(BaseModel):
+        route: Route
+
+    trip = Trip(route=[[13.0, 46.0, 1.0], [13.1, 46.1, 2.0]])
+
+    assert isinstance(trip.route, Route)
+    assert trip.model_dump(mode="json") == {"route": [[13.0, 46.0, 1.0], [13.1, 46.1, 2.0]]}
+    assert Trip.model_validate_json(trip.model_dump_json()).route == trip.route
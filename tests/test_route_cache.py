@@ -0,0 +1,110 @@
+import types
+
+import numpy as np
+import pytest
+
+import datastructures.RouteCache as route_cache_module
+from benchmarks.synthetic import synthetic_route
+from datastructures.Route import Route
+from datastructures.RouteCache import RouteCache
+
+
+UDINE, TRIESTE = [46.06, 13.23], [45.65, 13.77]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(route_cache_module, "time", types.SimpleNamespace(time=lambda: clock.now, monotonic=lambda: clock.now))
+    return clock
+
+
+def leg(number_of_points: int = 200, seed: int = 0) -> Route:
+    return Route(synthetic_route(number_of_points, seed=seed))
+
+
+def test_a_leg_is_found_by_its_request(tmp_path, clock):
+    cache = RouteCache(str(tmp_path / "legs.sqlite"), "v1")
+    cache.put(UDINE, TRIESTE, "trekking", 0, leg())
+
+    assert cache.get(UDINE, TRIESTE, "trekking", 0) == leg()
+    assert cache.get([46.060001, 13.230001], TRIESTE, "trekking", 0) == leg() # the ends are rounded to ~1 m
+    assert cache.get(UDINE, TRIESTE, "trekking", 1) is None
+    assert cache.get(UDINE, TRIESTE, "fastbike", 0) is None
+    assert cache.get(TRIESTE, UDINE, "trekking", 0) is None
+    assert RouteCache(str(tmp_path / "legs.sqlite"), "v1").get(UDINE, TRIESTE, "trekking", 0) == leg()
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+
+
+def test_a_float32_leg_is_stored_without_loss(tmp_path, clock):
+    cache = RouteCache(str(tmp_path / "legs.sqlite"), "v1")
+    float32_leg = Route(synthetic_route(50), dtype=np.float32)
+    cache.put(UDINE, TRIESTE, "trekking", 0, float32_leg)
+
+    np.testing.assert_array_equal(cache.get(UDINE, TRIESTE, "trekking", 0).coordinates, float32_leg.coordinates.astype(np.float64))
+
+
+def test_processes_on_different_data_share_the_file(tmp_path, clock):
+    path = str(tmp_path / "legs.sqlite")
+    RouteCache(path, "v1").put(UDINE, TRIESTE, "trekking", 0, leg(seed=1))
+    RouteCache(path, "v2").put(UDINE, TRIESTE, "trekking", 0, leg(seed=2))
+
+    assert RouteCache(path, "v1").get(UDINE, TRIESTE, "trekking", 0) == leg(seed=1)
+    assert RouteCache(path, "v2").get(UDINE, TRIESTE, "trekking", 0) == leg(seed=2)
+    assert RouteCache(path, "v3").get(UDINE, TRIESTE, "trekking", 0) is None
+
+
+def test_the_least_recently_used_legs_are_evicted(tmp_path, clock):
+    cache = RouteCache(str(tmp_path / "legs.sqlite"), "v1", max_bytes=10**9)
+    for seed in range(4):
+        clock.now += 1.0
+        cache.put([46.0, 13.0 + seed], TRIESTE, "trekking", 0, leg(1000, seed))
+    clock.now += 1.0
+    assert cache.get([46.0, 13.0], TRIESTE, "trekking", 0) is not None
+
+    # Room for about two legs and a half, the eviction goes down to 90% of it: only the leg just read and the new one are kept
+    cache.max_bytes = int(cache.stats()["size"] * 0.6)
+    clock.now += 1.0
+    cache.put([46.0, 17.0], TRIESTE, "trekking", 0, leg(1000, 4))
+
+    found = [cache.get([46.0, 13.0 + seed], TRIESTE, "trekking", 0) is not None for seed in range(5)]
+    assert found == [True, False, False, False, True]
+    assert cache.stats()["size"] <= cache.max_bytes
+
+
+def test_data_version_follows_the_segments(tmp_path, monkeypatch):
+    monkeypatch.delenv("BROUTER_DATA_VERSION", raising=False)
+    monkeypatch.setenv("BROUTER_SEGMENTS_DIRECTORY", str(tmp_path))
+    (tmp_path / "E10_N45.rd5").write_bytes(b"segments")
+    version = RouteCache.data_version()
+
+    assert RouteCache.data_version() == version
+    (tmp_path / "E10_N45.rd5").write_bytes(b"new segments")
+    assert RouteCache.data_version() != version
+
+    monkeypatch.setenv("BROUTER_DATA_VERSION", "2025-06")
+    assert RouteCache.data_version() == "2025-06"
+
+
+def test_without_a_data_version_a_running_cache_expires_its_legs_every_period(tmp_path, monkeypatch, clock):
+    monkeypatch.delenv("BROUTER_DATA_VERSION", raising=False)
+    monkeypatch.delenv("BROUTER_SEGMENTS_DIRECTORY", raising=False)
+    period = route_cache_module.UNKNOWN_DATA_PERIOD
+    clock.now = 100 * period
+    cache = RouteCache(str(tmp_path / "legs.sqlite"), version=None)
+    cache.put(UDINE, TRIESTE, "trekking", 0, leg())
+
+    clock.now += period / 2
+    assert cache.get(UDINE, TRIESTE, "trekking", 0) == leg()
+    clock.now += period / 2
+    assert cache.get(UDINE, TRIESTE, "trekking", 0) is None
+
+    cache.put(UDINE, TRIESTE, "trekking", 0, leg())
+    clock.now += route_cache_module.VERSION_CHECK_INTERVAL + 1.0
+    assert cache.get(UDINE, TRIESTE, "trekking", 0) == leg()
+
+
+def test_default_is_disabled_by_an_empty_path(monkeypatch):
+    monkeypatch.setenv("BROUTER_CACHE_PATH", "")
+
+    assert RouteCache.default() is None
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_route
+from datastructures.Place import Place
+from datastructures.Recommendation import Recommendation
+from datastructures.Route import Route
+from datastructures.Snapshot import Snapshot
+from datastructures.SnapshotStore import SnapshotStore
+from datastructures.Transport import Transport
+from datastructures.TripDescriptor import TripDescriptor
+from datastructures.UserDescriptor import UserDescriptor
+from datastructures.dependencies import MyDeps
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """Loading a snapshot must not geocode or route anything"""
+    def no_network(cls):
+        raise AssertionError("A snapshot was loaded with a network call")
+
+    monkeypatch.setattr(Transport, "default", classmethod(no_network))
+    monkeypatch.delenv("DEM_DIRECTORY", raising=False)
+
+
+def trip() -> TripDescriptor:
+    trip = TripDescriptor(
+        bike_type="gravel",
+        number_of_days=3,
+        places=[Place(name="Udine", osm_name="Udine, Friuli-Venezia Giulia", lat=46.06, lon=13.23, elv=110.0), Place(name="Trieste", lat=45.65, lon=13.77)],
+        candidate_routes=[Route(synthetic_route(500, seed=seed)) for seed in range(3)],
+        selected_route=1,
+        stepped_route=[(0, 199), (199, 349), (349, 499)],
+        length=123456.0,
+    )
+    trip._full_resolution_routes = [Route(synthetic_route(2000, seed=seed)) for seed in range(3)]
+    return trip
+
+
+def user() -> UserDescriptor:
+    user = UserDescriptor(user_id="mario")
+    user.set_performance(kilometer_per_day=90, positive_height_difference_per_day=1200)
+    user.set_preferences(amenity={"restaurant": ["Osteria"]}, natural={"mountains": 5})
+    user.set_additional_note("Prefers gravel roads.")
+    return user
+
+
+def test_a_session_survives_the_round_trip():
+    recommendation = Recommendation(recommended_places=[Place(name="Osteria, Palmanova", lat=45.90, lon=13.31)])
+
+    loaded = Snapshot.loads(Snapshot.dumps(trip(), user(), recommendation))
+
+    assert loaded["trip"] == trip()
+    assert [loaded["trip"].get_full_resolution_route(i) for i in range(3)] == trip()._full_resolution_routes
+    assert [step.to_list() for step in loaded["trip"].get_stepped_route()] == [step.to_list() for step in trip().get_stepped_route()]
+    assert loaded["user"] == user()
+    assert loaded["recommendation"] == recommendation
+
+
+def test_the_routes_are_views_on_the_snapshot():
+    data = Snapshot.dumps(trip=trip())
+
+    route = Snapshot.loads(data)["trip"].candidate_routes[0]
+
+    assert np.shares_memory(np.asarray(route), np.frombuffer(data, dtype=np.uint8))
+    assert not np.asarray(route).flags.writeable
+
+
+def test_float32_routes_keep_their_dtype():
+    original = TripDescriptor(candidate_routes=[Route(synthetic_route(101), dtype=np.float32)])
+
+    route = Snapshot.loads(Snapshot.dumps(trip=original))["trip"].candidate_routes[0]
+
+    assert route.dtype == np.float32 and route == original.candidate_routes[0]
+
+
+def test_unresolved_places_are_not_geocoded_when_loaded():
+    with Place.deferred_resolution():
+        original = TripDescriptor(places=[Place(name="Palmanova")])
+
+    place = Snapshot.loads(Snapshot.dumps(trip=original))["trip"].places[0]
+
+    assert place.name == "Palmanova" and not place.is_resolved()
+
+
+def test_the_missing_descriptors_are_empty_in_a_session():
+    deps = Snapshot.load_session(Snapshot.dumps(user=user()))
+
+    assert deps.trip == TripDescriptor() and deps.recommendation == Recommendation()
+    assert deps.user == user()
+
+
+@pytest.mark.parametrize("data", [b"", b"CTAS", b"XXXX" + bytes(16)])
+def test_other_data_is_rejected(data):
+    with pytest.raises(ValueError):
+        Snapshot.loads(data)
+
+
+def test_a_newer_format_is_rejected():
+    data = bytearray(Snapshot.dumps(user=user()))
+    data[4:6] = (99).to_bytes(2, "little")
+
+    with pytest.raises(ValueError, match="format version 99"):
+        Snapshot.loads(bytes(data))
+
+
+def test_the_store_keeps_sessions_and_users(tmp_path):
+    path = str(tmp_path / "snapshots.sqlite")
+    store = SnapshotStore(path)
+    store.save_session("a1b2", MyDeps(trip(), user(), Recommendation()))
+    store.save_user("mario", user())
+
+    reopened = SnapshotStore(path)
+    assert reopened.load_session("a1b2").trip == trip()
+    assert reopened.load_user("mario") == user()
+    assert reopened.load_session("mario") is None and reopened.load_user("a1b2") is None
+
+    reopened.delete_session("a1b2")
+    assert reopened.load_session("a1b2") is None
+    assert reopened.load_user("mario") is not None
+
+
+def test_a_user_built_with_its_id_is_loaded(monkeypatch):
+    store = SnapshotStore(":memory:")
+    monkeypatch.setattr(SnapshotStore, "default", classmethod(lambda cls: store))
+
+    assert user().save() is None
+    assert UserDescriptor(user_id="mario") == user()
+    assert UserDescriptor(user_id="luigi") == UserDescriptor(user_id="luigi")
+    assert UserDescriptor().save().startswith("Error in UserDescriptor.save()")
@@ -0,0 +1,95 @@
+import itertools, math
+
+import numpy as np
+import pytest
+
+from datastructures.StepPlanner import StepPlanner
+
+
+def random_route(rng: np.random.Generator, number_of_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Cumulative distance and ascent of a route with uneven segments, flat ones and climbs"""
+    segments = rng.uniform(100.0, 5000.0, number_of_points - 1)
+    climbs = rng.uniform(0.0, 300.0, number_of_points - 1) * (rng.random(number_of_points - 1) < 0.5)
+    return np.concatenate([[0.0], np.cumsum(segments)]), np.concatenate([[0.0], np.cumsum(climbs)])
+
+
+def effort(cumulative_distance, cumulative_ascent, max_distance, max_elevation, first, last) -> float:
+    return max((cumulative_distance[last] - cumulative_distance[first]) / max_distance, (cumulative_ascent[last] - cumulative_ascent[first]) / max_elevation)
+
+
+def hardest_day(cut_points, *route_and_limits) -> float:
+    return max(effort(*route_and_limits, first, last) for first, last in zip(cut_points[:-1], cut_points[1:]))
+
+
+def optimal_hardest_day(number_of_days, *route_and_limits) -> float:
+    """The lowest effort of the hardest day over every way of cutting the route in number_of_days steps"""
+    last_index = len(route_and_limits[0]) - 1
+    return min(
+        hardest_day([0, *cuts, last_index], *route_and_limits)
+        for cuts in itertools.combinations(range(1, last_index), number_of_days - 1)
+    )
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_balanced_cut_points_minimize_the_hardest_day(seed):
+    rng = np.random.default_rng(seed)
+    cumulative_distance, cumulative_ascent = random_route(rng, int(rng.integers(4, 13)))
+    number_of_days = int(rng.integers(1, len(cumulative_distance)))
+    route_and_limits = (cumulative_distance, cumulative_ascent, 40000.0, 800.0)
+
+    cut_points = StepPlanner.balanced_cut_points(cumulative_distance, cumulative_ascent, number_of_days, 40000.0, 800.0)
+    optimum = optimal_hardest_day(number_of_days, *route_and_limits)
+
+    if optimum > 1.0:
+        assert cut_points is None
+        return
+    assert cut_points[0] == 0 and cut_points[-1] == len(cumulative_distance) - 1
+    assert len(cut_points) - 1 == number_of_days
+    assert all(first < last for first, last in zip(cut_points[:-1], cut_points[1:]))
+    assert hardest_day(cut_points, *route_and_limits) <= optimum + 1e-9
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_the_minimum_number_of_days_is_the_fewest_that_fit(seed):
+    rng = np.random.default_rng(seed)
+    cumulative_distance, cumulative_ascent = random_route(rng, 10)
+    route_and_limits = (cumulative_distance, cumulative_ascent, 15000.0, 600.0)
+
+    days = StepPlanner.minimum_number_of_days(*route_and_limits)
+
+    assert optimal_hardest_day(days, *route_and_limits) <= 1.0
+    assert days == 1 or optimal_hardest_day(days - 1, *route_and_limits) > 1.0
+    # Without number_of_days the route is planned in the minimum number of days
+    assert len(StepPlanner.balanced_cut_points(cumulative_distance, cumulative_ascent, max_distance=15000.0, max_elevation=600.0)) - 1 == days
+
+
+def test_without_limits_the_distance_is_shared_equally():
+    cumulative_distance = np.arange(0.0, 101.0) * 1000.0
+    cumulative_ascent = np.zeros(101)
+
+    cut_points = StepPlanner.balanced_cut_points(cumulative_distance, cumulative_ascent, 4)
+
+    assert cut_points == [0, 25, 50, 75, 100]
+
+
+def test_a_segment_longer_than_the_limits_is_still_ridden():
+    cumulative_distance = np.array([0.0, 1000.0, 90000.0, 91000.0])
+    cumulative_ascent = np.zeros(4)
+
+    assert StepPlanner.greedy_cut_points(cumulative_distance, cumulative_ascent, 40000.0, math.inf) == [0, 1, 2, 3]
+
+
+def test_a_route_of_a_single_point():
+    assert StepPlanner.balanced_cut_points(np.zeros(1), np.zeros(1), 3, 40000.0, 800.0) == [0]
+
+
+def test_rank_routes():
+    lengths = np.array([200000.0, 120000.0, 120000.0, 90000.0])
+    ascents = np.array([1000.0, 3000.0, 1000.0, 1000.0])
+
+    order, days_needed, daily_effort = StepPlanner.rank_routes(lengths, ascents, 3, max_distance=50000.0, max_elevation=1000.0)
+
+    # The route of 200 km needs 4 days and the one with 3000 m of climbing uses all of 3, the shortest of the others comes first
+    assert days_needed.tolist() == [4, 3, 3, 2]
+    assert order.tolist() == [3, 2, 1, 0]
+    assert daily_effort[0] > 1.0 and daily_effort[1] == pytest.approx(1.0)
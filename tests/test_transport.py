@@ -0,0 +1,131 @@
+import socket, types
+
+import pytest
+import requests
+
+import datastructures.Transport as transport_module
+from benchmarks.fake_services import FakeServices, FaultPolicy
+from datastructures.Transport import CircuitBreaker, CircuitOpenError, HostPolicy, TokenBucket, Transport
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock moved by hand, sleeping moves it"""
+    clock = types.SimpleNamespace(now=1000.0, slept=[])
+
+    def sleep(seconds):
+        clock.slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(transport_module, "time", types.SimpleNamespace(monotonic=lambda: clock.now, perf_counter=lambda: clock.now, sleep=sleep))
+    return clock
+
+
+def test_the_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10.0)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success() # a success resets the count
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_a_single_trial_request_after_the_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10.0)
+    breaker.record_failure()
+
+    clock.now += 10.0
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow() # the trial is running
+
+    breaker.record_failure() # the trial failed, the cooldown starts again
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_the_token_bucket_spaces_the_requests(clock):
+    bucket = TokenBucket(rate=2.0, burst=2)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits == [0.0, 0.0, pytest.approx(0.5), pytest.approx(0.5)]
+    clock.now += 10.0
+    assert bucket.acquire() == 0.0 and bucket.acquire() == 0.0 # the burst is refilled, not more
+
+
+@pytest.fixture
+def services():
+    faults = FaultPolicy()
+    with FakeServices(faults=faults, ports=(0, 0, 0)) as services:
+        yield services, faults
+
+
+def fast_transport(url: str, **policy) -> Transport:
+    transport = Transport(policies={})
+    transport.configure(requests.utils.urlparse(url).netloc, HostPolicy(backoff=0.0, **policy))
+    return transport
+
+
+def test_a_busy_host_is_retried(services):
+    services, faults = services
+    url = services.urls()["nominatim"]
+    transport = fast_transport(url, max_retries=2, failure_threshold=10)
+    faults.error_rate = 1.0
+
+    response = transport.get(url, params={"q": "Udine"})
+
+    host = requests.utils.urlparse(url).netloc
+    assert response.status_code == 503
+    assert transport.stats()[host]["requests"] == 3 and transport.stats()[host]["retries"] == 2
+
+    faults.error_rate = 0.0
+    assert transport.get(url, params={"q": "Udine"}).json()[0]["display_name"].startswith("Udine")
+
+
+def test_other_errors_are_returned_at_once(services):
+    services, faults = services
+    url = services.urls()["nominatim"]
+    transport = fast_transport(url, max_retries=2)
+    faults.error_rate, faults.error_status = 1.0, 500
+
+    assert transport.get(url, params={"q": "Udine"}).status_code == 500
+    assert transport.stats()[requests.utils.urlparse(url).netloc]["retries"] == 0
+
+
+def test_the_circuit_opens_on_a_failing_host(services):
+    services, faults = services
+    url = services.urls()["nominatim"]
+    host = requests.utils.urlparse(url).netloc
+    transport = fast_transport(url, max_retries=0, failure_threshold=2, cooldown=60.0)
+    faults.error_rate = 1.0
+
+    transport.get(url, params={"q": "Udine"})
+    transport.get(url, params={"q": "Udine"})
+    faults.error_rate = 0.0
+    with pytest.raises(CircuitOpenError):
+        transport.get(url, params={"q": "Udine"})
+
+    assert transport.stats()[host]["requests"] == 2
+    assert transport.stats()[host]["rejected"] == 1
+    assert transport.stats()[host]["circuit"] == "open"
+
+
+def test_a_connection_error_is_raised_after_the_retries():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{unused.getsockname()[1]}/search"
+    transport = fast_transport(url, max_retries=1, failure_threshold=10)
+
+    with pytest.raises(requests.ConnectionError):
+        transport.get(url)
+    assert transport.stats()[requests.utils.urlparse(url).netloc]["errors"] == 2
@@ -1,8 +1,12 @@
+import asyncio
+
 from pydantic_ai import RunContext
 from datastructures.dependencies import MyDeps
+from datastructures.Telemetry import Telemetry
 
 
-def fill_trip_description(ctx: RunContext[MyDeps], bike_type: None | str = None, places: None | list[str] = None, number_of_days: None | int = None, dates: None | list[str] = None, selected_route: None | int = None) -> None | str:
+@Telemetry.tool
+async def fill_trip_description(ctx: RunContext[MyDeps], bike_type: None | str = None, places: None | list[str] = None, number_of_days: None | int = None, dates: None | list[str] = None, selected_route: None | int = None) -> None | str:
     """A tool to fill the trip description
     Args:
         - bike_type (str) : is the type to bike, either road, gravel or mtb.
@@ -21,10 +25,12 @@ def fill_trip_description(ctx: RunContext[MyDeps], bike_type: None | str = None,
         fill_trip_description(places=["Pordenone", "Palmanova"], number_of_days=4)
         ```
     """
-    ret = ctx.deps.trip.fill(bike_type, places, number_of_days, dates, selected_route)
+    # The places are geocoded in a thread, so the other conversations of the server are not blocked
+    ret = await asyncio.to_thread(ctx.deps.run_locked, ctx.deps.trip.fill, bike_type, places, number_of_days, dates, selected_route)
     if ret is not None:
         return ret
 
+@Telemetry.tool
 def fill_user_preferences_deprecated(ctx: RunContext[MyDeps], amenity: None | dict = None, tourism: None | dict = None, natural: None | dict = None, historic: None | dict = None, building: None | dict = None, water: None | dict = None, leisure: None | dict = None, man_made: None | dict = None) -> None | str:
     """A tool to fill the preferences description
     Args:
@@ -41,10 +47,12 @@ def fill_user_preferences_deprecated(ctx: RunContext[MyDeps], amenity: None | di
         fill_user_preferences(amenity = {"restaurant": ["Italian", "Chinese"]}, tourism = {"museums": ["Louvre"]}, natural = {"coastline": ["beach"]}, historic = {"castles": ["Neuschwanstein"]}, building = {"skyscrapers": ["Burj Khalifa"]}, leisure = {"parks": ["Central Park"]}, man_made = {"bridges": ["Golden Gate Bridge"]})
         ```
     """
-    res = ctx.deps.user.preferences.fill(amenity, tourism, natural, historic, building, leisure, man_made)
+    with ctx.deps.lock:
+        res = ctx.deps.user.preferences.fill(amenity, tourism, natural, historic, building, leisure, man_made)
     if res is not None:
         return res
 
+@Telemetry.tool
 def fill_user_performance(ctx: RunContext[MyDeps], kilometer_per_day: None | int = None, positive_height_difference_per_day: None | int = None) -> None | str:
     """A tool to fill the performance description
     Args:
@@ -56,10 +64,12 @@ def fill_user_performance(ctx: RunContext[MyDeps], kilometer_per_day: None | int
         fill_user_performance(positive_height_difference_per_day=100, kilometer_per_day=40)
         ```
     """
-    res = ctx.deps.user.performance.fill(kilometer_per_day, positive_height_difference_per_day)
+    with ctx.deps.lock:
+        res = ctx.deps.user.performance.fill(kilometer_per_day, positive_height_difference_per_day)
     if res is not None:
         return res
     
+@Telemetry.tool
 def fill_user_additional_note(ctx: RunContext[MyDeps], additional_note: str) -> None | str:
     """A tool to fill the additional note description
     Args:
@@ -69,10 +79,12 @@ def fill_user_additional_note(ctx: RunContext[MyDeps], additional_note: str) ->
         fill_user_additional_note(additional_note="User prefers scenic routes")
         ```
     """
-    res = ctx.deps.user.set_additional_note(additional_note)
+    with ctx.deps.lock:
+        res = ctx.deps.user.set_additional_note(additional_note)
     if res is not None:
         return res
 
+@Telemetry.tool
 def fill_user_preferences(ctx: RunContext[MyDeps], cathegory: str, preference_type: str, preference_detail: list[str]) -> None | str:
     """A tool to fill the user preferences
     Args:
@@ -84,6 +96,7 @@ def fill_user_preferences(ctx: RunContext[MyDeps], cathegory: str, preference_ty
         fill_user_preferences(cathegory="amenity", preference_type="restaurant", preference_detail=["Italian", "Chinese"])
         ```
     """
-    res = ctx.deps.user.preferences.add_preference(cathegory, preference_type, preference_detail)
+    with ctx.deps.lock:
+        res = ctx.deps.user.preferences.add_preference(cathegory, preference_type, preference_detail)
     if res is not None:
         return res
\ No newline at end of file
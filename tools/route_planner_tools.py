@@ -1,16 +1,23 @@
+import asyncio
 from datetime import date
 from enum import Enum
 
 from pydantic_ai import RunContext
 
 from datastructures.dependencies import MyDeps
+from datastructures.Telemetry import Telemetry
 from datastructures.TripDescriptor import Place
 
 
+MAX_TOOL_RESPONSE_TOKENS = 2000
+CHARACTERS_PER_TOKEN = 4 # rough estimate, good enough to bound the size of the responses
+
+
 # TODO  Make the tools used by the agent handle exceptions
 #       They catch the exceptions and return a user-friendly error message.
 
-def say_to_the_user(question: str) -> str:
+@Telemetry.tool
+async def say_to_the_user(ctx: RunContext[MyDeps], question: str) -> str:
     """Ask a question to the user and return the answer.
     Args:
         question (str): The question to ask the user.
@@ -21,19 +28,33 @@ def say_to_the_user(question: str) -> str:
         answer = say_to_the_user("What is your favorite color?")
         ```
     """
-    return input(f"{question}\n")
+    if ctx.deps.channel is not None:
+        return await ctx.deps.channel.ask(question)
+    return await asyncio.to_thread(input, f"{question}\n")
+
+def _within_token_budget(text: str | None, fallback: str | None = None) -> str | None:
+    """Keep a tool response within MAX_TOOL_RESPONSE_TOKENS, using the fallback (e.g. the same text without polylines) and then truncating"""
+    if text is None or len(text) <= MAX_TOOL_RESPONSE_TOKENS * CHARACTERS_PER_TOKEN:
+        return text
+    if fallback is not None and len(fallback) <= MAX_TOOL_RESPONSE_TOKENS * CHARACTERS_PER_TOKEN:
+        return fallback + "(polylines omitted to keep the response short)\n"
+    text = fallback if fallback is not None else text
+    return text[:MAX_TOOL_RESPONSE_TOKENS * CHARACTERS_PER_TOKEN] + "\n(response truncated to keep it short)\n"
 
-def get_trip_information(ctx: RunContext[MyDeps], trip_info: str) -> str | None:
+@Telemetry.tool
+def get_trip_information(ctx: RunContext[MyDeps], trip_info: str, include_polyline: bool = False) -> str | None:
     """A tool to get an information about the trip.
     Args:
         trip_info (str): The name of the trip information to retrieve from the TripDescriptor.
+        include_polyline (bool): Only for candidate_routes and stepped_route, add a coarse encoded polyline of each route or step to its summary.
     Returns:
-        - str: The requested trip information.
+        - str: The requested trip information. Routes and steps are summarized (length, positive height difference, start, end and bounding box) instead of listing their points.
         - None: If the requested trip information is not available or was not set yet.
     Examples:
         ```python
         bike_type = get_trip_information("bike_type")
         places = get_trip_information("places")
+        candidate_routes = get_trip_information("candidate_routes", include_polyline=True)
         ```
     """
     match trip_info:
@@ -46,16 +67,17 @@ def get_trip_information(ctx: RunContext[MyDeps], trip_info: str) -> str | None:
         case "dates":
             return str(ctx.deps.trip.get_dates())
         case "candidate_routes":
-            return str(ctx.deps.trip.get_candidate_routes())
+            return _within_token_budget(ctx.deps.trip.get_candidate_routes_summary(include_polyline), ctx.deps.trip.get_candidate_routes_summary() if include_polyline else None)
         case "selected_route":
             return str(ctx.deps.trip.get_selected_route())
         case "stepped_route":
-            return str(ctx.deps.trip.get_stepped_route())
+            return _within_token_budget(ctx.deps.trip.get_stepped_route_summary(include_polyline), ctx.deps.trip.get_stepped_route_summary() if include_polyline else None)
         case "length":
             return str(ctx.deps.trip.get_length())
         case "positive_height_difference":
             return str(ctx.deps.trip.get_positive_height_difference())
 
+@Telemetry.tool
 def get_user_information(ctx: RunContext[MyDeps], user_info: str) -> str | None:
     """A tool to get an information about the user.
     Args:
@@ -93,6 +115,7 @@ def get_user_information(ctx: RunContext[MyDeps], user_info: str) -> str | None:
         case "additional_note":
             return str(ctx.deps.user.get_additional_note())
         
+@Telemetry.tool
 def get_recommendations(ctx: RunContext[MyDeps]) -> str | None:
     """A tool to get the founded recommendations for the trip.
     Returns:
@@ -107,7 +130,8 @@ def get_recommendations(ctx: RunContext[MyDeps]) -> str | None:
     if recommendations is not None or len(recommendations) > 0:
         return "".join(f"{r}\n" for r in recommendations)
 
-def generate_the_candidate_routes(ctx: RunContext[MyDeps]) -> str | None:
+@Telemetry.tool
+async def generate_the_candidate_routes(ctx: RunContext[MyDeps]) -> str | None:
     """A tool to plan the candidate routes for the trip.
     Returns:
         - str: an error message if something went wrong.
@@ -117,8 +141,30 @@ def generate_the_candidate_routes(ctx: RunContext[MyDeps]) -> str | None:
         error = generate_the_candidate_routes()
         ```
     """
-    return ctx.deps.trip.plan_candidate_routes()
+    # The routing requests run in a thread, so the other conversations of the server are not blocked
+    return await asyncio.to_thread(ctx.deps.run_locked, ctx.deps.trip.plan_candidate_routes)
+
+@Telemetry.tool
+async def generate_the_candidate_routes_for_every_bike_type(ctx: RunContext[MyDeps]) -> str | None:
+    """A tool to plan the candidate routes of every bike type (road, gravel and mtb) at once, when the user has not chosen the bike type.
+    The routes that best fit the daily kilometers and height difference of the user are kept, selecting one of them sets the bike type.
+    Returns:
+        - str: an error message if something went wrong.
+        - None: if everything went right.
+    Examples:
+        ```python
+        error = generate_the_candidate_routes_for_every_bike_type()
+        ```
+    """
+    performance = ctx.deps.user.get_performance()
+    return await asyncio.to_thread(
+        ctx.deps.run_locked,
+        ctx.deps.trip.plan_candidate_routes_for_every_bike_type,
+        max_distance=performance.get_kilometer_per_day() * 1000,
+        max_elevation=performance.get_positive_height_difference_per_day(),
+    )
 
+@Telemetry.tool
 def divide_the_route_in_steps(ctx: RunContext[MyDeps]) -> str | None:
     """A tool to plan the steps for the selected route.
     Returns:
@@ -129,9 +175,11 @@ def divide_the_route_in_steps(ctx: RunContext[MyDeps]) -> str | None:
         error = divide_the_route_in_steps()
         ```
     """
-    return ctx.deps.trip.plan_steps(max_distance=ctx.deps.user.get_performance().get_kilometer_per_day(), max_elevation=ctx.deps.user.get_performance().get_positive_height_difference_per_day())
+    with ctx.deps.lock:
+        return ctx.deps.trip.plan_steps(max_distance=ctx.deps.user.get_performance().get_kilometer_per_day() * 1000, max_elevation=ctx.deps.user.get_performance().get_positive_height_difference_per_day())
 
-def find_the_recommendations(ctx: RunContext[MyDeps]) -> str | None:
+@Telemetry.tool
+async def find_the_recommendations(ctx: RunContext[MyDeps]) -> str | None:
     """A tool to plan the recommendations for the trip.
     Returns:
         - str: an error message if something went wrong.
@@ -148,6 +196,6 @@ def find_the_recommendations(ctx: RunContext[MyDeps]) -> str | None:
     if candidate_routes and selected_route and amenityes:
         route = candidate_routes[selected_route]
 
-        ctx.deps.recommendation.find_route_recommendations(route, amenityes)
+        await asyncio.to_thread(ctx.deps.run_locked, ctx.deps.recommendation.find_route_recommendations, route, amenityes)
     else:
         return "No candidate routes or selected route found."